@@ -0,0 +1,144 @@
+"""
+ASGI middleware guarding the API against oversized request bodies and
+recording request metrics.
+"""
+import json
+import os
+import time
+from contextlib import nullcontext
+from typing import Optional
+
+from ..services import metrics
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies larger than ``max_body_size`` with a 413.
+
+    Requests with a Content-Length over the limit are refused before any of
+    the body is read; chunked bodies are counted as they stream in.
+    """
+
+    def __init__(self, app, max_body_size: Optional[int] = None):
+        """
+        Wrap an ASGI application.
+
+        Args:
+            app: The ASGI application to protect
+            max_body_size: Largest accepted body in bytes
+                (default: MAX_UPLOAD_SIZE plus 1 MiB for multipart framing)
+        """
+        self.app = app
+        if max_body_size is None:
+            max_body_size = int(os.getenv("MAX_UPLOAD_SIZE", str(100 * 1024 * 1024))) + 1024 * 1024
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    too_large = int(value) > self.max_body_size
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+            await self._reject(send)
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": f"Request body exceeds {self.max_body_size} bytes"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class _BodyTooLarge(Exception):
+    """Internal signal raised from ``receive`` once the body passes the limit."""
+
+
+class MetricsMiddleware:
+    """
+    Time every request into pdfqa_request_seconds and, on request, trace it.
+
+    With tracing allowed, a request sent with ``X-Debug-Trace: 1`` gets its
+    stage timings back in a ``Server-Timing`` header. Streamed responses
+    report the stages finished before the first byte.
+    """
+
+    def __init__(self, app, allow_trace: Optional[bool] = None):
+        """
+        Wrap an ASGI application.
+
+        Args:
+            app: The ASGI application to instrument
+            allow_trace: Honour X-Debug-Trace (default: DEBUG_TRACE is true)
+        """
+        self.app = app
+        if allow_trace is None:
+            allow_trace = os.getenv("DEBUG_TRACE", "false").lower() in ("1", "true", "yes")
+        self.allow_trace = allow_trace
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traced = self.allow_trace and (dict(scope.get("headers", [])).get(b"x-debug-trace", b"")
+                                       in (b"1", b"true", b"yes"))
+        if not traced and not metrics.enabled():
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def instrumented_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"server-timing", trace.server_timing().encode("ascii")),
+                    ])
+            await send(message)
+
+        try:
+            with metrics.traced() if traced else nullcontext() as trace:
+                await self.app(scope, receive, instrumented_send)
+        finally:
+            route = scope.get("route")
+            # The route template, not the raw path, so job ids don't each get a series
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                            route=getattr(route, "path", "unmatched"), status=str(status))
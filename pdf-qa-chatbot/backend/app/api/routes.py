@@ -1,44 +1,213 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import Dict
-from pydantic import BaseModel
-from ..services.pdf_processor import PDFProcessor
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+from pydantic import BaseModel, Field
+import json
+import os
+from ..services import metrics
+from ..services.answer_cache import AnswerCache
+from ..services.ingestion import IngestionQueue, IngestionQueueFullError
+from ..services.pdf_processor import PDFProcessor, UploadTooLargeError
 from ..services.qa_service import QAService
+from ..services.reranker import create_reranker
+from ..services.serving import IngestionInbox, SharedServing, serving_mode
+from ..services.sharding import ShardedVectorStore, create_sharded_store
+from ..services.vector_store import VectorStore
 
 router = APIRouter()
 pdf_processor = PDFProcessor()
-qa_service = QAService()
+_vector_store: Optional[VectorStore] = None
+_qa_service: Optional[QAService] = None
+_ingestion_queue: Optional[Union[IngestionQueue, IngestionInbox]] = None
+# The writer process's own queue, fed from the inbox, with shared serving
+_writer_queue: Optional[IngestionQueue] = None
+_serving: Optional[SharedServing] = None
+
+
+def get_serving() -> Optional[SharedServing]:
+    """Return this process's shared-serving role, or None when SERVING_MODE is single."""
+    global _serving
+    if _serving is None and serving_mode() == "shared":
+        _serving = SharedServing()
+    return _serving
+
+
+def get_vector_store() -> VectorStore:
+    """Return the shared VectorStore, creating it on first use."""
+    global _vector_store
+    if _vector_store is None:
+        serving = get_serving()
+        if serving is not None:
+            _vector_store = serving.create_vector_store()
+        elif os.getenv("VECTOR_SHARDS"):
+            _vector_store = create_sharded_store()
+        else:
+            _vector_store = VectorStore()
+    return _vector_store
+
+
+def get_qa_service() -> QAService:
+    """Return the shared QAService, creating it on first use."""
+    global _qa_service
+    if _qa_service is None:
+        answer_cache = AnswerCache() if int(os.getenv("ANSWER_CACHE_SIZE", "1000")) > 0 else None
+        _qa_service = QAService(get_vector_store(), answer_cache=answer_cache, reranker=create_reranker())
+    return _qa_service
+
+
+def get_ingestion_queue() -> Union[IngestionQueue, IngestionInbox]:
+    """
+    Return where uploads are submitted, creating it on first use.
+    
+    That is the IngestionQueue, or with shared serving the inbox feeding the
+    writer process's queue.
+    """
+    global _ingestion_queue, _writer_queue
+    if _ingestion_queue is None:
+        serving = get_serving()
+        if serving is None:
+            _ingestion_queue = IngestionQueue(pdf_processor, get_vector_store())
+        else:
+            if serving.is_writer:
+                _writer_queue = IngestionQueue(pdf_processor, get_vector_store())
+            _ingestion_queue = serving.create_inbox(get_vector_store(), _writer_queue)
+    return _ingestion_queue
+
+
+def start_services() -> None:
+    """With shared serving, elect the writer and open the store before the first request."""
+    if get_serving() is not None:
+        get_ingestion_queue()
+
+
+def shutdown_services() -> None:
+    """Drain the ingestion workers and release the processor's worker pool."""
+    if _serving is not None:
+        _serving.stop()
+    for ingestion_queue in (_ingestion_queue, _writer_queue):
+        if isinstance(ingestion_queue, IngestionQueue):
+            ingestion_queue.shutdown()
+    if _serving is not None:
+        if _serving.is_writer and _vector_store is not None:
+            # Publish what the last jobs indexed before another process can take over
+            _vector_store.save_snapshot()
+        _serving.release()
+    if isinstance(_vector_store, ShardedVectorStore):
+        _vector_store.close()
+    pdf_processor.close()
+
+
+def collect_metrics() -> None:
+    """Sample the gauges and cache counters of the services started so far."""
+    if _vector_store is not None:
+        for kind, value in _vector_store.stats().items():
+            metrics.INDEX_SIZE.set(value, kind=kind)
+        embedding_stats = _vector_store.cache.stats()
+        metrics.CACHE_LOOKUPS.set_total(embedding_stats["hits"] + embedding_stats["disk_hits"],
+                                        cache="embedding", result="hit")
+        metrics.CACHE_LOOKUPS.set_total(embedding_stats["misses"], cache="embedding", result="miss")
+        metrics.CACHE_HIT_RATE.set(embedding_stats["hit_rate"], cache="embedding")
+    if _qa_service is not None and _qa_service.answer_cache is not None:
+        answer_stats = _qa_service.answer_cache.stats()
+        metrics.CACHE_LOOKUPS.set_total(answer_stats["exact_hits"] + answer_stats["semantic_hits"],
+                                        cache="answer", result="hit")
+        metrics.CACHE_LOOKUPS.set_total(answer_stats["misses"], cache="answer", result="miss")
+        metrics.CACHE_HIT_RATE.set(answer_stats["hit_rate"], cache="answer")
+    if _qa_service is not None and _qa_service.reranker is not None:
+        rerank_stats = _qa_service.reranker.stats()
+        metrics.CACHE_LOOKUPS.set_total(rerank_stats["hits"], cache="rerank", result="hit")
+        metrics.CACHE_LOOKUPS.set_total(rerank_stats["misses"], cache="rerank", result="miss")
+        metrics.CACHE_HIT_RATE.set(rerank_stats["hit_rate"], cache="rerank")
+        metrics.RERANK_FALLBACKS.set_total(rerank_stats["fallbacks"])
+    if _ingestion_queue is not None:
+        metrics.QUEUE_DEPTH.set(_ingestion_queue.pending())
 
 class QuestionRequest(BaseModel):
     question: str
     document_id: str
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=int(os.getenv("BATCH_MAX_QUESTIONS", "500")))
+    document_id: str
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    stream: bool = False
+
 # PUBLIC_INTERFACE
-@router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)) -> Dict[str, str]:
+@router.post("/upload", status_code=202)
+async def upload_pdf(response: Response, file: UploadFile = File(...)) -> Dict[str, Any]:
     """
-    Upload and process a PDF file.
+    Upload a PDF file and queue it for background processing.
+    
+    A file whose content was already indexed is not processed again: the
+    response is a 200 with the existing document's id and a completed job.
     
     Args:
         file (UploadFile): The PDF file to be uploaded and processed
         
     Returns:
-        Dict[str, str]: A dictionary containing the status of the upload and processing
+        Dict[str, Any]: The job's id and the id the document is indexed under
         
     Raises:
-        HTTPException: If the file is not a PDF or if there's an error in processing
+        HTTPException: If the file is not a PDF, is too large, the ingestion
+            queue is full, or the upload cannot be saved
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
     try:
-        # Process the PDF file
-        result = await pdf_processor.process_file(file)
-        return {"status": "success", "message": "PDF processed successfully", "file_id": result}
+        # Save the upload to disk; extraction and indexing happen in the background
+        path, content_hash = await pdf_processor.save_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        job = get_ingestion_queue().submit(path, file.filename, content_hash=content_hash)
+    except IngestionQueueFullError as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if job.duplicate:
+        response.status_code = 200
+        return {"status": "completed", "message": "PDF already processed", "duplicate": True,
+                "job_id": job.job_id, "file_id": job.document_id}
+    return {"status": "queued", "message": "PDF queued for processing", "duplicate": False,
+            "job_id": job.job_id, "file_id": job.document_id}
+
+# PUBLIC_INTERFACE
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    Report the progress of an ingestion job.
+    
+    Args:
+        job_id (str): The id returned by /upload
+        
+    Returns:
+        Dict[str, Any]: Overall status, per-stage progress and any error
+        
+    Raises:
+        HTTPException: If the job is unknown
+    """
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+# PUBLIC_INTERFACE
+@router.get("/metrics")
+async def get_metrics() -> Response:
+    """
+    Export latency, token, cache, index and queue metrics for Prometheus.
+    
+    Returns:
+        Response: The metrics in the Prometheus text exposition format
+    """
+    collect_metrics()
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @router.post("/question")
-async def ask_question(request: QuestionRequest) -> Dict[str, str]:
+async def ask_question(request: QuestionRequest) -> Dict[str, Any]:
     """
     Process a question about a previously uploaded document.
     
@@ -46,7 +215,7 @@ async def ask_question(request: QuestionRequest) -> Dict[str, str]:
         request (QuestionRequest): The question and document ID
         
     Returns:
-        Dict[str, str]: A dictionary containing the answer
+        Dict[str, Any]: A dictionary containing the answer
         
     Raises:
         HTTPException: If the question is empty, document not found, or no context available
@@ -55,10 +224,123 @@ async def ask_question(request: QuestionRequest) -> Dict[str, str]:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
     try:
-        answer = await qa_service.get_answer(request.question, request.document_id)
+        answer = await get_qa_service().get_answer(request.question, document_id=request.document_id)
         return {"answer": answer}
     except Exception as e:
         error_msg = str(e)
         if "Document not found" in error_msg or "No context available" in error_msg:
             raise HTTPException(status_code=404, detail=error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """Format one answer event as a Server-Sent Events message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+# PUBLIC_INTERFACE
+@router.post("/question/stream")
+async def ask_question_stream(request: QuestionRequest) -> StreamingResponse:
+    """
+    Answer a question as a Server-Sent Events stream.
+    
+    The first event carries the context citations; answer tokens follow as
+    they are generated, then a final ``done`` event with the full answer.
+    Errors after the stream has started are sent as an ``error`` event.
+    
+    Args:
+        request (QuestionRequest): The question and document ID
+        
+    Returns:
+        StreamingResponse: A ``text/event-stream`` response
+        
+    Raises:
+        HTTPException: If the question is empty or the document is not found
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    events = get_qa_service().stream_answer(request.question, document_id=request.document_id)
+    try:
+        # Retrieve the context before committing to a 200 so lookup errors get a status code
+        first = await events.__anext__()
+    except Exception as e:
+        await events.aclose()
+        error_msg = str(e)
+        if "Document not found" in error_msg:
+            raise HTTPException(status_code=404, detail=error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+    
+    async def stream() -> AsyncIterator[str]:
+        try:
+            yield _sse(first)
+            async for event in events:
+                yield _sse(event)
+        except Exception as e:
+            yield _sse({"type": "error", "detail": str(e)})
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# PUBLIC_INTERFACE
+@router.post("/questions/batch", response_model=None)
+async def ask_questions_batch(request: BatchQuestionRequest):
+    """
+    Answer a checklist of questions about one document.
+    
+    The questions share one embedding request and one index search. Without
+    ``stream`` the answers come back together in request order; with it they
+    are sent as Server-Sent Events ``answer`` messages, each tagged with its
+    question's ``index``, as they complete, followed by a ``done`` event.
+    
+    Args:
+        request (BatchQuestionRequest): The questions, document ID, optional cap
+            on concurrent completions and whether to stream
+        
+    Returns:
+        Dict[str, Any] | StreamingResponse: ``{"answers": [...]}`` in request
+        order, or a ``text/event-stream`` response
+        
+    Raises:
+        HTTPException: If a question is empty or the document is not found
+    """
+    if any(not question.strip() for question in request.questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    
+    qa_service = get_qa_service()
+    if not request.stream:
+        try:
+            answers = await qa_service.get_answers(request.questions, document_id=request.document_id,
+                                                   max_concurrency=request.max_concurrency)
+            return {"answers": answers}
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e.args[0]))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    results = qa_service.stream_answers(request.questions, document_id=request.document_id,
+                                        max_concurrency=request.max_concurrency)
+    try:
+        # Run retrieval before committing to a 200 so lookup errors get a status code
+        first = await results.__anext__()
+    except KeyError as e:
+        await results.aclose()
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        await results.aclose()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def stream() -> AsyncIterator[str]:
+        try:
+            yield _sse({"type": "answer", **first})
+            async for result in results:
+                yield _sse({"type": "answer", **result})
+            yield _sse({"type": "done", "count": len(request.questions)})
+        except Exception as e:
+            yield _sse({"type": "error", "detail": str(e)})
+        finally:
+            await results.aclose()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
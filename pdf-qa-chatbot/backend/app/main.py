@@ -1,7 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-app = FastAPI(title="PDF QA Chatbot")
+from .api.middleware import MetricsMiddleware, UploadSizeLimitMiddleware
+from .api.routes import router, shutdown_services, start_services
+from .services.openai_client import close_async_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_services()
+    yield
+    shutdown_services()
+    await close_async_client()
+
+
+app = FastAPI(title="PDF QA Chatbot", lifespan=lifespan)
+app.add_middleware(UploadSizeLimitMiddleware)
+# Outermost, so rejected uploads are timed too
+app.add_middleware(MetricsMiddleware)
+app.include_router(router)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to PDF QA Chatbot API"}
\ No newline at end of file
+    return {"message": "Welcome to PDF QA Chatbot API"}
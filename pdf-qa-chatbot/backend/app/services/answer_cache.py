@@ -0,0 +1,215 @@
+"""
+Two-level cache of generated answers, keyed by question and document.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+class _Entry:
+    """A cached answer and what it was computed from."""
+
+    __slots__ = ("answer", "embedding", "version", "expires_at")
+
+    def __init__(self, answer: Dict[str, Any], embedding: Optional[np.ndarray],
+                 version: Optional[int], expires_at: float):
+        self.answer = answer
+        self.embedding = embedding
+        self.version = version
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Caches answers so repeated questions skip retrieval and generation.
+
+    Level one matches the normalized question text exactly. Level two matches
+    a question whose embedding is within ``similarity_threshold`` cosine
+    similarity of a cached question about the same document. Entries are
+    evicted least-recently-used beyond ``max_items``, expire after ``ttl``
+    seconds, and are ignored once the document's version changes.
+    """
+
+    def __init__(self, max_items: Optional[int] = None, ttl: Optional[float] = None,
+                 similarity_threshold: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_items: Capacity (default: ANSWER_CACHE_SIZE or 1000)
+            ttl: Seconds an answer stays valid (default: ANSWER_CACHE_TTL or 3600)
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+                (default: ANSWER_CACHE_THRESHOLD or 0.95)
+        """
+        self.max_items = max_items or int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+        self.ttl = ttl or float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        self.similarity_threshold = similarity_threshold or float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        self._entries: "OrderedDict[Tuple[Optional[str], str], _Entry]" = OrderedDict()
+        # doc_id -> keys of its entries, so semantic lookups only scan one document
+        self._by_document: Dict[Optional[str], set] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """
+        Normalize a question for exact matching.
+
+        Case, repeated whitespace and trailing punctuation are ignored.
+
+        Args:
+            question: The question text
+
+        Returns:
+            str: The normalized question
+        """
+        return _PUNCTUATION.sub("", " ".join(question.lower().split()))
+
+    # PUBLIC_INTERFACE
+    def get_exact(self, question: str, document_id: Optional[str],
+                  version: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Look up an answer to the same question about the same document.
+
+        Does not count a miss, since a semantic lookup usually follows.
+
+        Args:
+            question: The question text
+            document_id: The document the question is about (None for all documents)
+            version: The document's current version
+
+        Returns:
+            Optional[Dict]: The cached answer, or None
+        """
+        key = (document_id, self.normalize(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or entry.expires_at <= now:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.answer
+
+    # PUBLIC_INTERFACE
+    def get_similar(self, embedding: np.ndarray, document_id: Optional[str],
+                    version: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Look up an answer to a semantically equivalent question.
+
+        Args:
+            embedding: Embedding of the new question
+            document_id: The document the question is about (None for all documents)
+            version: The document's current version
+
+        Returns:
+            Optional[Dict]: The answer of the most similar cached question above
+            the threshold, or None
+        """
+        query = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            keys = []
+            for key in list(self._by_document.get(document_id, ())):
+                entry = self._entries[key]
+                if entry.version != version or entry.expires_at <= now:
+                    self._remove(key)
+                elif entry.embedding is not None:
+                    keys.append(key)
+            if keys:
+                similarities = np.stack([self._entries[key].embedding for key in keys]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    return self._entries[keys[best]].answer
+            self.misses += 1
+            return None
+
+    # PUBLIC_INTERFACE
+    def put(self, question: str, document_id: Optional[str], version: Optional[int],
+            answer: Dict[str, Any], embedding: Optional[np.ndarray] = None) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            question: The question text
+            document_id: The document the question is about (None for all documents)
+            version: The document's version the answer was computed from
+            answer: The answer to cache
+            embedding: Embedding of the question, enabling semantic matches
+        """
+        key = (document_id, self.normalize(question))
+        entry = _Entry(answer, None if embedding is None else self._unit(embedding),
+                       version, time.time() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_document.setdefault(document_id, set()).add(key)
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+
+    # PUBLIC_INTERFACE
+    def invalidate(self, document_id: Optional[str] = None) -> None:
+        """
+        Drop every cached answer about a document.
+
+        Args:
+            document_id: The changed document (default: drop everything)
+        """
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+                self._by_document.clear()
+                return
+            for key in list(self._by_document.get(document_id, ())):
+                self._remove(key)
+            # Answers drawn from all documents may have used this one too
+            for key in list(self._by_document.get(None, ())):
+                self._remove(key)
+
+    def _remove(self, key: Tuple[Optional[str], str]) -> None:
+        """Remove one entry. Caller holds the lock."""
+        self._entries.pop(key, None)
+        keys = self._by_document.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_document[key[0]]
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        """Scale a vector to unit length so dot products are cosine similarities."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # PUBLIC_INTERFACE
+    def stats(self) -> Dict[str, float]:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            Dict[str, float]: Exact hits, semantic hits, misses, hit rate and cached entries
+        """
+        with self._lock:
+            total = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+                "items": len(self._entries),
+            }
@@ -0,0 +1,332 @@
+"""
+Compact chunk storage: FAISS id -> (document, position) lookup and chunk text
+held in flat NumPy arrays and a single UTF-8 arena instead of per-chunk
+Python objects.
+"""
+import mmap
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+
+def _grown(array: np.ndarray, size: int, fill) -> np.ndarray:
+    """Copy of ``array`` resized to ``size`` entries, the new ones set to ``fill``."""
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ChunkStore(Mapping):
+    """
+    Chunks addressed by their FAISS id.
+
+    Reads like the dict it replaces, ``id -> (doc_id, chunk_idx)``, but keeps
+    one int32 document number and one int32 position per id, with document
+    ids interned to those numbers. Chunk text lives in one UTF-8 arena sliced
+    by an int64 offsets array, also indexed by id. Ids are assigned in
+    increasing order and never reused, so the arrays only ever grow at the
+    end; deleted chunks keep their slot until ``compact``.
+
+    The arena has a read-only head, which may be a memory-mapped snapshot
+    file, and an in-memory tail that new chunks are appended to.
+    """
+
+    def __init__(self, head: Buffer = b""):
+        """
+        Create an empty store.
+
+        Args:
+            head: Read-only start of the text arena, e.g. a memory-mapped file
+        """
+        self._documents: List[str] = []  # Document number -> doc_id
+        self._numbers: Dict[str, int] = {}  # doc_id -> document number
+        self._doc_numbers = np.full(0, -1, dtype=np.int32)  # Per id; -1 marks an absent chunk
+        self._positions = np.zeros(0, dtype=np.int32)  # Per id: index of the chunk in its document
+        self._offsets = np.zeros(1, dtype=np.int64)  # Per id + 1: arena offset where its text starts
+        self._head = head
+        self._tail = bytearray()
+        self._size = 0  # Ids covered by the arrays
+        self._live = 0
+        self._removed = 0  # Chunks removed since the last compaction
+        self._dead_bytes = 0
+
+    def __getitem__(self, vector_id: int) -> Tuple[str, int]:
+        vector_id = int(vector_id)
+        if not 0 <= vector_id < self._size or self._doc_numbers[vector_id] < 0:
+            raise KeyError(vector_id)
+        return self._documents[self._doc_numbers[vector_id]], int(self._positions[vector_id])
+
+    def __contains__(self, vector_id) -> bool:
+        try:
+            vector_id = int(vector_id)
+        except (TypeError, ValueError):
+            return False
+        return 0 <= vector_id < self._size and self._doc_numbers[vector_id] >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids().tolist())
+
+    def __len__(self) -> int:
+        return self._live
+
+    # PUBLIC_INTERFACE
+    def ids(self) -> np.ndarray:
+        """
+        Ids of all live chunks, in increasing order.
+
+        Returns:
+            np.ndarray: int64 ids
+        """
+        return np.flatnonzero(self._doc_numbers[:self._size] >= 0).astype(np.int64)
+
+    # PUBLIC_INTERFACE
+    def add(self, doc_id: str, start_id: int, texts: Sequence[str]) -> None:
+        """
+        Store a document's chunks under consecutive ids.
+
+        Args:
+            doc_id: The document the chunks belong to
+            start_id: Id of the first chunk
+            texts: Chunk texts in document order
+
+        Raises:
+            ValueError: If the ids were already assigned
+        """
+        if start_id < self._size:
+            raise ValueError(f"Chunk ids must increase: {start_id} is below {self._size}")
+        end_id = start_id + len(texts)
+        if end_id > len(self._doc_numbers):
+            # Double the capacity to amortize growth
+            capacity = max(end_id, 2 * len(self._doc_numbers), 16)
+            self._offsets = _grown(self._offsets, capacity + 1, 0)
+            self._doc_numbers = _grown(self._doc_numbers, capacity, -1)
+            self._positions = _grown(self._positions, capacity, 0)
+        # Ids skipped since the last add get empty text
+        self._offsets[self._size + 1:start_id + 1] = self._offsets[self._size]
+        encoded = [text.encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        np.cumsum(lengths, out=self._offsets[start_id + 1:end_id + 1])
+        self._offsets[start_id + 1:end_id + 1] += self._offsets[start_id]
+        self._tail += b"".join(encoded)
+        self._doc_numbers[start_id:end_id] = self._intern(doc_id)
+        self._positions[start_id:end_id] = np.arange(len(texts), dtype=np.int32)
+        self._size = end_id
+        self._live += len(texts)
+
+    # PUBLIC_INTERFACE
+    def remove(self, vector_ids: np.ndarray) -> None:
+        """
+        Drop chunks. Their text stays in the arena until ``compact``.
+
+        Args:
+            vector_ids: Ids of the chunks to drop
+        """
+        vector_ids = np.asarray(vector_ids, dtype=np.int64)
+        vector_ids = vector_ids[(vector_ids >= 0) & (vector_ids < self._size)]
+        vector_ids = vector_ids[self._doc_numbers[vector_ids] >= 0]
+        self._doc_numbers[vector_ids] = -1
+        self._live -= len(vector_ids)
+        self._removed += len(vector_ids)
+        self._dead_bytes += int((self._offsets[vector_ids + 1] - self._offsets[vector_ids]).sum())
+
+    # PUBLIC_INTERFACE
+    def text(self, vector_id: int) -> str:
+        """
+        Text of one chunk.
+
+        Args:
+            vector_id: The chunk's id
+
+        Returns:
+            str: The chunk text
+
+        Raises:
+            KeyError: If there is no such chunk
+        """
+        if vector_id not in self:
+            raise KeyError(vector_id)
+        return self._slice(int(self._offsets[vector_id]), int(self._offsets[vector_id + 1])).decode("utf-8")
+
+    # PUBLIC_INTERFACE
+    def texts(self, vector_ids: Sequence[int]) -> List[str]:
+        """
+        Texts of several chunks.
+
+        Args:
+            vector_ids: Ids of live chunks
+
+        Returns:
+            List[str]: The chunk texts, in the order of ``vector_ids``
+        """
+        return [self.text(vector_id) for vector_id in vector_ids]
+
+    def _slice(self, start: int, end: int) -> bytes:
+        """Arena bytes between two offsets; no chunk straddles the head and tail."""
+        head = len(self._head)
+        if end <= head:
+            return self._head[start:end]
+        return self._tail[start - head:end - head]
+
+    def _intern(self, doc_id: str) -> int:
+        """Small integer standing in for a document id."""
+        number = self._numbers.get(doc_id)
+        if number is None:
+            number = self._numbers[doc_id] = len(self._documents)
+            self._documents.append(doc_id)
+        return number
+
+    @property
+    def dead_bytes(self) -> int:
+        """Arena bytes still held by removed chunks."""
+        return self._dead_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays and the in-memory part of the arena."""
+        arrays = self._doc_numbers.nbytes + self._positions.nbytes + self._offsets.nbytes
+        head = 0 if isinstance(self._head, mmap.mmap) else len(self._head)
+        return arrays + head + len(self._tail)
+
+    # PUBLIC_INTERFACE
+    def compact(self) -> None:
+        """
+        Rewrite the arena without the text of removed chunks and forget
+        document ids that no longer have chunks. The result lives in memory,
+        even if the arena was memory-mapped.
+        """
+        if not self._removed:
+            return
+        numbers = self._doc_numbers[:self._size]
+        live = numbers >= 0
+        lengths = np.diff(self._offsets[:self._size + 1])
+        self._tail = bytearray(self._live_text())
+        self._head = b""
+        np.cumsum(np.where(live, lengths, 0), out=self._offsets[1:self._size + 1])
+        self._dead_bytes = 0
+        self._removed = 0
+
+        used = np.unique(numbers[live])
+        remap = np.full(len(self._documents), -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        self._documents = [self._documents[number] for number in used.tolist()]
+        self._numbers = {doc_id: number for number, doc_id in enumerate(self._documents)}
+        numbers[live] = remap[numbers[live]]
+
+    # PUBLIC_INTERFACE
+    def export(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, bytes]:
+        """
+        Live chunks as flat rows, in id order, for writing a snapshot.
+
+        Returns:
+            Tuple: Document ids in order of their first chunk, then per row the
+            chunk id, the index of its document in that list and the start
+            offset of its text (plus a final end offset), and the concatenated
+            UTF-8 text
+        """
+        ids = self.ids()
+        numbers = self._doc_numbers[ids]
+        # Documents are listed in the order their chunks first appear, so rows stay grouped
+        used, first, inverse = np.unique(numbers, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        doc_numbers = rank[inverse.reshape(-1)]
+        documents = [self._documents[number] for number in used[order].tolist()]
+        lengths = self._offsets[ids + 1] - self._offsets[ids]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return documents, ids, doc_numbers.astype(np.int32), offsets, self._live_text()
+
+    def _live_text(self) -> bytes:
+        """The arena's bytes with the text of removed chunks cut out."""
+        if not self._removed and not len(self._head):
+            return bytes(self._tail)
+        parts = [np.frombuffer(part, dtype=np.uint8) for part in (self._head, self._tail) if len(part)]
+        arena = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint8)
+        if not self._removed:
+            return arena.tobytes()
+        live = self._doc_numbers[:self._size] >= 0
+        return arena[np.repeat(live, np.diff(self._offsets[:self._size + 1]))].tobytes()
+
+    # PUBLIC_INTERFACE
+    @classmethod
+    def from_rows(cls, documents: List[str], vector_ids: np.ndarray, doc_numbers: np.ndarray,
+                  offsets: np.ndarray, text: Buffer) -> "ChunkStore":
+        """
+        Rebuild a store from snapshot rows without copying the text.
+
+        Args:
+            documents: Document ids
+            vector_ids: Chunk id of each row, increasing
+            doc_numbers: Index into ``documents`` of each row's document
+            offsets: Start offset of each row's text in ``text``, plus the end
+            text: Concatenated UTF-8 chunk text; kept as the arena's read-only head
+
+        Returns:
+            ChunkStore: The restored store
+        """
+        store = cls(head=text)
+        store._documents = list(documents)
+        store._numbers = {doc_id: number for number, doc_id in enumerate(store._documents)}
+        vector_ids = np.asarray(vector_ids, dtype=np.int64)
+        if not len(vector_ids):
+            return store
+        size = int(vector_ids[-1]) + 1
+        store._doc_numbers = np.full(size, -1, dtype=np.int32)
+        store._doc_numbers[vector_ids] = doc_numbers
+        # A document's chunks are consecutive rows, in chunk order
+        starts = np.flatnonzero(np.r_[True, doc_numbers[1:] != doc_numbers[:-1]])
+        run_starts = np.repeat(starts, np.diff(np.r_[starts, len(vector_ids)]))
+        store._positions = np.zeros(size, dtype=np.int32)
+        store._positions[vector_ids] = np.arange(len(vector_ids)) - run_starts
+        lengths = np.zeros(size, dtype=np.int64)
+        lengths[vector_ids] = np.diff(offsets)
+        store._offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=store._offsets[1:])
+        store._size = size
+        store._live = len(vector_ids)
+        return store
+
+
+class DocumentChunks(Mapping):
+    """Read-only ``doc_id -> chunk texts`` view over a ChunkStore."""
+
+    def __init__(self, chunks: ChunkStore, doc_vector_ids: Dict[str, np.ndarray]):
+        self._chunks = chunks
+        self._doc_vector_ids = doc_vector_ids
+
+    def __getitem__(self, doc_id: str) -> List[str]:
+        return self._chunks.texts(self._doc_vector_ids[doc_id].tolist())
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._doc_vector_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._doc_vector_ids)
+
+    def __len__(self) -> int:
+        return len(self._doc_vector_ids)
+
+
+def open_arena(path: str, use_mmap: bool) -> Buffer:
+    """
+    Load a text arena file, memory-mapping it read-only if asked to.
+
+    Args:
+        path: The arena file
+        use_mmap: Map the file instead of reading it
+
+    Returns:
+        Buffer: The arena bytes
+    """
+    with open(path, "rb") as arena_file:
+        if use_mmap:
+            try:
+                return mmap.mmap(arena_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return b""
+        return arena_file.read()
@@ -0,0 +1,300 @@
+"""
+Structure-aware text chunking with overlap and page/character provenance.
+
+Text is segmented once into sentence units, with paragraph ends and section
+headings marked. Chunk boundaries are then picked over cumulative unit sizes
+with binary search, and each chunk is a single slice of the source text, so
+chunking is linear in the input rather than quadratic in chunk size.
+"""
+import os
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .tokens import count_tokens_batch
+
+# Inserted between pages so a page break also ends a paragraph
+PAGE_SEPARATOR = "\n\n"
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_KEYWORD = r"(?i:section|article|chapter|part|schedule|annex|appendix)"
+# A line that is a markdown-style, numbered ("4.2 Payment Terms", "Section 3. Fees")
+# or all-caps heading. Starting on a literal newline keeps the scan fast, and
+# (?=(?P<x>...))(?P=x) acts as an atomic group so body lines fail without backtracking.
+_HEADING_LINE = re.compile(
+    r"\n[ \t]*(?P<heading>"
+    r"#{1,6}[ \t]+\S[^\n]*"
+    rf"|(?:{_KEYWORD}[ \t]+)?\d+(?:\.\d+)*\.?[ \t]+[A-Z](?=(?P<title>[^.!?:;\n]*))(?P=title)"
+    rf"|{_KEYWORD}[ \t]+[\dIVXLC]+(?:\.\d+)*\.?(?=(?P<name>[^.!?\n]*))(?P=name)"
+    r"|[A-Z](?=(?P<caps>[A-Z0-9 ,&'()\-]*))(?P=caps)"
+    r")(?=\n|$)"
+)
+_HEADING_MAX_LENGTH = 80
+_ABBREVIATIONS = (
+    "etc vs cf al fig figs art arts sec secs para paras pp vol ch approx dept "
+    "mr mrs ms dr prof jr sr inc ltd corp"
+).split()
+# Lookbehinds must be fixed width, so abbreviations are grouped by length
+_ABBREVIATION_LOOKBEHINDS = "".join(
+    rf"(?<!\b(?i:{'|'.join(word for word in _ABBREVIATIONS if len(word) == length)})\.)"
+    for length in sorted({len(word) for word in _ABBREVIATIONS})
+)
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by whitespace
+# and something that does not start in lowercase. Abbreviations ("Dr. Smith"),
+# initialisms ("e.g. A", "U.S. Code") and initials ("J. Doe") do not end one.
+_SENTENCE_END = re.compile(
+    r"[.!?]" + _ABBREVIATION_LOOKBEHINDS
+    + r"(?<!\bNo\.)(?<!\b[A-Za-z]\.[A-Za-z]\.)(?<!\b[A-Z]\.)"
+    r"[\"')\]]*(?P<gap>\s+)(?=[^\sa-z])"
+)
+_NON_SPACE = re.compile(r"\S")
+
+# Unit flags
+_PARAGRAPH_END = 1
+_HEADING_UNIT = 2
+
+
+class Chunk(NamedTuple):
+    """A chunk of document text and where it came from."""
+
+    text: str
+    page_start: int
+    page_end: int
+    char_start: int
+    char_end: int
+
+
+class Chunker:
+    """
+    Splits document text into overlapping chunks along sentence, paragraph and
+    section boundaries.
+
+    Chunks are sized in characters or tokens. A chunk ends at the last
+    paragraph break that keeps it at least ``min_fill`` full, otherwise at the
+    last sentence that fits; a heading always starts a new chunk. Consecutive
+    chunks within a section share up to ``overlap`` of trailing sentences.
+    """
+
+    def __init__(self, size: Optional[int] = None, overlap: Optional[int] = None,
+                 unit: Optional[str] = None, min_fill: float = 0.5):
+        """
+        Initialize the chunker.
+
+        Args:
+            size: Maximum chunk size (default: CHUNK_SIZE or 1000)
+            overlap: Size of the sentences repeated from the previous chunk
+                (default: CHUNK_OVERLAP or 150)
+            unit: "chars" or "tokens" (default: CHUNK_UNIT or "chars")
+            min_fill: Fraction of ``size`` a chunk must reach before a paragraph
+                break is preferred over a sentence break
+
+        Raises:
+            ValueError: If the unit is unknown or the overlap is not smaller than the size
+        """
+        self.size = size or int(os.getenv("CHUNK_SIZE", "1000"))
+        self.overlap = int(os.getenv("CHUNK_OVERLAP", "150")) if overlap is None else overlap
+        self.unit = unit or os.getenv("CHUNK_UNIT", "chars")
+        if self.unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk unit: {self.unit} (expected chars or tokens)")
+        if not 0 <= self.overlap < self.size:
+            raise ValueError("Chunk overlap must be at least 0 and smaller than the chunk size")
+        self.min_fill = min_fill
+
+    # PUBLIC_INTERFACE
+    def chunk_text(self, text: str) -> List[Chunk]:
+        """
+        Chunk a single text, reported as page 1.
+
+        Args:
+            text: The text to chunk
+
+        Returns:
+            List[Chunk]: The chunks in document order
+        """
+        return self.chunk_pages([(1, text)])
+
+    # PUBLIC_INTERFACE
+    def chunk_pages(self, pages: List[Tuple[int, str]]) -> List[Chunk]:
+        """
+        Chunk a document given page by page.
+
+        Character offsets refer to the pages joined with ``PAGE_SEPARATOR``.
+
+        Args:
+            pages: (page number, text) pairs in page order
+
+        Returns:
+            List[Chunk]: The chunks in document order
+        """
+        if not pages:
+            return []
+        text = PAGE_SEPARATOR.join(page_text for _, page_text in pages)
+        page_numbers = np.array([page_number for page_number, _ in pages], dtype=np.int64)
+        page_lengths = np.array([len(page_text) + len(PAGE_SEPARATOR) for _, page_text in pages], dtype=np.int64)
+        page_starts = np.concatenate(([0], np.cumsum(page_lengths)[:-1]))
+
+        starts, ends, flags = self._units(text)
+        if not len(starts):
+            return []
+        spans = self._pack(text, starts, ends, flags)
+        if not spans:
+            return []
+
+        chunk_starts = np.array([start for start, _ in spans], dtype=np.int64)
+        chunk_ends = np.array([end for _, end in spans], dtype=np.int64)
+        first_pages = page_numbers[np.searchsorted(page_starts, chunk_starts, side="right") - 1]
+        last_pages = page_numbers[np.searchsorted(page_starts, chunk_ends - 1, side="right") - 1]
+        return [
+            Chunk(text[start:end].replace("\n", " "), first, last, start, end)
+            for start, end, first, last in zip(chunk_starts.tolist(), chunk_ends.tolist(),
+                                               first_pages.tolist(), last_pages.tolist())
+        ]
+
+    def _units(self, text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Segment text into sentence and heading units.
+
+        Sentence ends, heading lines and paragraph breaks are each found in one
+        regex pass over the whole text; the cuts are then merged with NumPy.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Start offsets, end offsets
+            and flags of each unit, in text order
+        """
+        first = _NON_SPACE.search(text)
+        if first is None:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.int8)
+
+        # Each cut is (end of the text before it, start of the text after it)
+        sentence_gaps = [match.span("gap") for match in _SENTENCE_END.finditer(text)]
+        cut_ends: List[int] = [end for end, _ in sentence_gaps]
+        cut_starts: List[int] = [start for _, start in sentence_gaps]
+        heading_starts = []
+        # Match the first line too, as if the text started after a newline
+        for match in _HEADING_LINE.finditer("\n" + text):
+            heading_start = match.start("heading") - 1
+            heading_end = self._content_end(text, match.end("heading") - 1)
+            if not 3 <= heading_end - heading_start <= _HEADING_MAX_LENGTH:
+                continue
+            heading_starts.append(heading_start)
+            cut_ends.extend((self._content_end(text, heading_start), heading_end))
+            following = _NON_SPACE.search(text, heading_end)
+            cut_starts.extend((heading_start, following.start() if following else len(text)))
+        paragraph_breaks = []
+        for match in _PARAGRAPH_BREAK.finditer(text):
+            content_end = self._content_end(text, match.start())
+            paragraph_breaks.append(content_end)
+            cut_ends.append(content_end)
+            cut_starts.append(match.end())
+        cut_ends.append(len(text.rstrip()))
+        cut_starts.append(len(text))
+
+        cut_ends = np.array(cut_ends, dtype=np.int64)
+        order = np.argsort(cut_ends, kind="stable")
+        ends = cut_ends[order]
+        # A unit starts where the furthest-reaching earlier cut's whitespace ends
+        reach = np.maximum.accumulate(np.array(cut_starts, dtype=np.int64)[order])
+        starts = np.concatenate(([first.start()], reach[:-1]))
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+
+        flags = np.zeros(len(starts), dtype=np.int8)
+        flags[np.isin(starts, heading_starts)] |= _HEADING_UNIT
+        # A paragraph break belongs to the last unit ending at or before it
+        paragraph_units = np.searchsorted(ends, np.array(paragraph_breaks, dtype=np.int64), side="right") - 1
+        flags[paragraph_units[paragraph_units >= 0]] |= _PARAGRAPH_END
+        flags[-1] |= _PARAGRAPH_END
+        return self._split_long_units(text, starts, ends, flags)
+
+    @staticmethod
+    def _content_end(text: str, position: int) -> int:
+        """Offset just past the last non-whitespace character before ``position``."""
+        while position > 0 and text[position - 1].isspace():
+            position -= 1
+        return position
+
+    def _split_long_units(self, text: str, starts: np.ndarray, ends: np.ndarray,
+                          flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Cut units that alone exceed the chunk size into pieces at whitespace."""
+        limit = self.size if self.unit == "chars" else self.size * 3  # ~4 chars per token, with headroom
+        long_units = np.flatnonzero(ends - starts > limit)
+        if not len(long_units):
+            return starts, ends, flags
+        pieces_starts, pieces_ends, pieces_flags = [], [], []
+        previous = 0
+        for unit in long_units.tolist():
+            pieces_starts.append(starts[previous:unit])
+            pieces_ends.append(ends[previous:unit])
+            pieces_flags.append(flags[previous:unit])
+            start, end = int(starts[unit]), int(ends[unit])
+            unit_starts, unit_ends = [], []
+            while end - start > limit:
+                cut = text.rfind(" ", start + 1, start + limit)
+                if cut <= start:
+                    cut = start + limit
+                unit_starts.append(start)
+                unit_ends.append(cut)
+                start = _NON_SPACE.search(text, cut, end).start()
+            unit_starts.append(start)
+            unit_ends.append(end)
+            unit_flags = np.zeros(len(unit_starts), dtype=np.int8)
+            unit_flags[-1] = flags[unit]
+            pieces_starts.append(np.array(unit_starts, dtype=np.int64))
+            pieces_ends.append(np.array(unit_ends, dtype=np.int64))
+            pieces_flags.append(unit_flags)
+            previous = unit + 1
+        pieces_starts.append(starts[previous:])
+        pieces_ends.append(ends[previous:])
+        pieces_flags.append(flags[previous:])
+        return np.concatenate(pieces_starts), np.concatenate(pieces_ends), np.concatenate(pieces_flags)
+
+    def _pack(self, text: str, starts: np.ndarray, ends: np.ndarray, flags: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Group consecutive units into chunks.
+
+        Returns:
+            List[Tuple[int, int]]: (start, end) character offsets of each chunk
+        """
+        if self.unit == "chars":
+            # Measured by span, so the whitespace between units counts too
+            unit_starts, unit_ends = starts.tolist(), ends.tolist()
+        else:
+            sizes = count_tokens_batch([text[start:end] for start, end in zip(starts.tolist(), ends.tolist())])
+            cumulative = np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+            unit_starts, unit_ends = cumulative[:-1].tolist(), cumulative[1:].tolist()
+        headings = np.flatnonzero(flags & _HEADING_UNIT).tolist()
+        paragraph_ends = np.flatnonzero(flags & _PARAGRAPH_END).tolist()
+        is_heading = (flags & _HEADING_UNIT).astype(bool).tolist()
+        char_starts, char_ends = starts.tolist(), ends.tolist()
+        count = len(unit_starts)
+        min_size = self.min_fill * self.size
+
+        # Binary searches over the cumulative unit sizes; no text is concatenated
+        spans = []
+        first = 0
+        while first < count:
+            # Furthest unit that keeps the chunk within size; always take at least one
+            stop = max(bisect_right(unit_ends, unit_starts[first] + self.size), first + 1)
+            # A heading starts a new chunk
+            next_heading = bisect_right(headings, first)
+            section_break = next_heading < len(headings) and headings[next_heading] < stop
+            if section_break:
+                stop = headings[next_heading]
+            elif stop < count:
+                # Prefer ending on a paragraph break if the chunk is still reasonably full
+                last_paragraph = bisect_right(paragraph_ends, stop - 1) - 1
+                if last_paragraph >= 0:
+                    end_unit = paragraph_ends[last_paragraph]
+                    if end_unit >= first and unit_ends[end_unit] - unit_starts[first] >= min_size:
+                        stop = end_unit + 1
+            spans.append((char_starts[first], char_ends[stop - 1]))
+            if stop >= count or section_break or not self.overlap or is_heading[stop]:
+                first = stop
+            else:
+                # Restart on the earliest sentence within the overlap, but always move forward
+                overlap_start = bisect_left(unit_starts, unit_ends[stop - 1] - self.overlap)
+                first = min(max(overlap_start, first + 1), stop)
+        return spans
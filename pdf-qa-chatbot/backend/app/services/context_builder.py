@@ -0,0 +1,138 @@
+"""
+Assembles retrieved chunks into prompt context that fits a token budget.
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+from .tokens import DEFAULT_MODEL, TOKENS_PER_MESSAGE, context_window, count_tokens
+
+_WORD = re.compile(r"\w+")
+
+
+class ContextBuilder:
+    """
+    Picks the most relevant chunks that fit in the prompt's token budget.
+
+    The budget is the model's context window minus the answer's ``max_tokens``
+    and the rest of the prompt, capped at ``max_context_tokens``. Near-duplicate
+    chunks are skipped and chunks that were adjacent in their document are
+    merged back into one passage, with the text the chunker repeated between
+    them kept once.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, max_answer_tokens: int = 500,
+                 max_context_tokens: Optional[int] = None, duplicate_threshold: float = 0.8):
+        """
+        Initialize the builder.
+
+        Args:
+            model: Chat model the prompt is for
+            max_answer_tokens: Tokens reserved for the completion
+            max_context_tokens: Upper bound on context tokens even when the window
+                allows more (default: CONTEXT_MAX_TOKENS or 3000)
+            duplicate_threshold: Word-shingle Jaccard similarity above which a
+                chunk counts as a duplicate of one already chosen
+        """
+        self.model = model
+        self.max_answer_tokens = max_answer_tokens
+        self.max_context_tokens = max_context_tokens or int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+        self.duplicate_threshold = duplicate_threshold
+
+    # PUBLIC_INTERFACE
+    def budget(self, prompt_tokens: int) -> int:
+        """
+        Tokens available for context.
+
+        Args:
+            prompt_tokens: Tokens used by everything in the prompt except the context
+
+        Returns:
+            int: The context token budget
+        """
+        available = context_window(self.model) - self.max_answer_tokens - prompt_tokens - 2 * TOKENS_PER_MESSAGE
+        return max(0, min(available, self.max_context_tokens))
+
+    # PUBLIC_INTERFACE
+    def build(self, chunks: List[Dict], budget: int) -> List[Dict]:
+        """
+        Select and merge chunks into context passages.
+
+        Args:
+            chunks: Search results ordered by relevance, with ``doc_id``, ``chunk``
+                and ``distance`` and optionally ``chunk_index``, ``tokens`` and the
+                ``char_start`` and ``char_end`` offsets of the chunk in its document
+            budget: Maximum total tokens of the selected chunks
+
+        Returns:
+            List[Dict]: Passages with ``doc_id``, ``chunk`` (the passage text),
+            ``distance`` (of its best chunk) and ``tokens``, most relevant first
+        """
+        selected = []
+        shingles = []
+        used = 0
+        for chunk in chunks:
+            tokens = chunk.get("tokens")
+            if tokens is None:
+                tokens = count_tokens(chunk["chunk"], self.model)
+            if used + tokens > budget:
+                # A smaller, less relevant chunk may still fit
+                continue
+            chunk_shingles = self._shingles(chunk["chunk"])
+            if any(self._jaccard(chunk_shingles, other) >= self.duplicate_threshold for other in shingles):
+                continue
+            selected.append(dict(chunk, tokens=tokens))
+            shingles.append(chunk_shingles)
+            used += tokens
+        return self._merge_adjacent(selected)
+
+    def _merge_adjacent(self, chunks: List[Dict]) -> List[Dict]:
+        """Join chunks that follow each other in the same document into one passage."""
+        passages = []
+        # Passages keep the rank of their best chunk; keyword matches have no distance to sort by
+        ranked = [dict(chunk, rank=rank) for rank, chunk in enumerate(chunks)]
+        positioned = sorted((c for c in ranked if "chunk_index" in c), key=lambda c: (c["doc_id"], c["chunk_index"]))
+        for chunk in positioned:
+            previous = passages[-1] if passages else None
+            if (previous is not None and previous["doc_id"] == chunk["doc_id"]
+                    and previous["last_index"] + 1 == chunk["chunk_index"]):
+                # Overlapping chunks start with the end of the previous one; keep it once
+                overlap = 0
+                if "char_end" in previous and "char_start" in chunk:
+                    overlap = max(0, previous["char_end"] - chunk["char_start"])
+                    previous["char_end"] = max(previous["char_end"], chunk["char_end"])
+                if overlap:
+                    rest = chunk["chunk"][overlap:].strip()
+                    if rest:
+                        previous["chunk"] += " " + rest
+                    previous["tokens"] = count_tokens(previous["chunk"], self.model)
+                else:
+                    previous["chunk"] += " " + chunk["chunk"]
+                    previous["tokens"] += chunk["tokens"]
+                distances = [d for d in (previous["distance"], chunk["distance"]) if d is not None]
+                previous["distance"] = min(distances) if distances else None
+                previous["rank"] = min(previous["rank"], chunk["rank"])
+                previous["last_index"] = chunk["chunk_index"]
+            else:
+                passages.append(dict(chunk, last_index=chunk["chunk_index"]))
+        passages.extend(c for c in ranked if "chunk_index" not in c)
+        passages.sort(key=lambda p: p["rank"])
+        for passage in passages:
+            passage.pop("last_index", None)
+            del passage["rank"]
+        return passages
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> frozenset:
+        """Word n-grams of a text, used to spot near-duplicate chunks."""
+        words = _WORD.findall(text.lower())
+        if len(words) < size:
+            return frozenset(words)
+        return frozenset(zip(*(words[i:] for i in range(size))))
+
+    @staticmethod
+    def _jaccard(a: frozenset, b: frozenset) -> float:
+        """Jaccard similarity of two sets."""
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
@@ -0,0 +1,189 @@
+"""
+Content-addressed embedding cache with an in-memory LRU tier and a sqlite tier.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Caches embeddings keyed by a hash of (model, normalized text).
+
+    Lookups check a bounded in-memory LRU first and fall back to an optional
+    sqlite database, so repeated chunks and re-uploaded documents survive
+    process restarts without another embedding request.
+    """
+
+    # Keep sqlite "IN (...)" lists well under the default variable limit
+    _SQL_BATCH = 500
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 50_000):
+        """
+        Initialize the cache.
+
+        Args:
+            path: sqlite file for the persistent tier (memory-only if None)
+            max_memory_items: Capacity of the in-memory LRU tier
+        """
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """
+        Build the cache key for a text embedded with a given model.
+
+        Whitespace is collapsed so that reflowed copies of the same chunk share a key.
+
+        Args:
+            model: Name of the embedding model
+            text: The text being embedded
+
+        Returns:
+            bytes: SHA-256 digest of the model name and normalized text
+        """
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).digest()
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        """Insert into the LRU tier, evicting the least recently used entry."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    # PUBLIC_INTERFACE
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for several texts.
+
+        Args:
+            model: Name of the embedding model
+            texts: The texts to look up
+
+        Returns:
+            List[Optional[np.ndarray]]: One entry per text, None on a miss
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            pending: Dict[bytes, List[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            if pending and self._db is not None:
+                pending_keys = list(pending)
+                for start in range(0, len(pending_keys), self._SQL_BATCH):
+                    batch = pending_keys[start:start + self._SQL_BATCH]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in pending.pop(key):
+                            results[i] = vector
+                            self.disk_hits += 1
+
+            self.misses += sum(len(positions) for positions in pending.values())
+        return results
+
+    # PUBLIC_INTERFACE
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Look up the embedding for a single text.
+
+        Args:
+            model: Name of the embedding model
+            text: The text to look up
+
+        Returns:
+            Optional[np.ndarray]: The cached embedding, or None on a miss
+        """
+        return self.get_many(model, [text])[0]
+
+    # PUBLIC_INTERFACE
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Store embeddings for several texts in both tiers.
+
+        Args:
+            model: Name of the embedding model
+            texts: The embedded texts
+            vectors: Matrix of embeddings, one row per text
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in zip(keys, vectors)],
+                )
+                self._db.commit()
+
+    # PUBLIC_INTERFACE
+    def put(self, model: str, text: str, vector: np.ndarray) -> None:
+        """
+        Store the embedding for a single text.
+
+        Args:
+            model: Name of the embedding model
+            text: The embedded text
+            vector: The embedding vector
+        """
+        self.put_many(model, [text], np.asarray(vector).reshape(1, -1))
+
+    # PUBLIC_INTERFACE
+    def stats(self) -> Dict[str, float]:
+        """
+        Report hit/miss counters.
+
+        Returns:
+            Dict[str, float]: Memory hits, disk hits, misses, hit rate and LRU size
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Close the sqlite connection, if any."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
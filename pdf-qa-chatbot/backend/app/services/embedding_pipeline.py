@@ -0,0 +1,117 @@
+"""
+Batched, concurrent embedding pipeline used during document ingest.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import backoff
+import numpy as np
+
+from .embeddings import EmbeddingBackend
+
+
+class EmbeddingPipeline:
+    """
+    Packs texts into size-bounded batches and embeds several batches at once.
+
+    Each batch is retried independently with exponential backoff, so a single
+    rate-limited request does not restart the whole document.
+    """
+
+    def __init__(self, backend: EmbeddingBackend, max_batch_size: int = 128,
+                 max_batch_chars: int = 200_000, max_concurrency: Optional[int] = None,
+                 max_retries: int = 5, max_backoff: float = 30.0):
+        """
+        Initialize the pipeline.
+
+        Args:
+            backend: Backend used to embed each batch
+            max_batch_size: Maximum number of texts per request
+            max_batch_chars: Maximum total characters per request
+            max_concurrency: Maximum number of requests in flight (default: backend's hint)
+            max_retries: Attempts per batch before giving up
+            max_backoff: Upper bound in seconds for a single backoff wait
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.max_concurrency = max_concurrency or backend.max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+
+    def _make_batches(self, texts: List[str]) -> List[range]:
+        """
+        Split texts into consecutive batches bounded by count and size.
+
+        Args:
+            texts: The texts to split
+
+        Returns:
+            List[range]: Index ranges into ``texts``, one per batch
+        """
+        batches = []
+        start = 0
+        batch_chars = 0
+        for i, text in enumerate(texts):
+            full = i - start >= self.max_batch_size
+            too_big = i > start and batch_chars + len(text) > self.max_batch_chars
+            if full or too_big:
+                batches.append(range(start, i))
+                start = i
+                batch_chars = 0
+            batch_chars += len(text)
+        if start < len(texts):
+            batches.append(range(start, len(texts)))
+        return batches
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed one batch, retrying transient failures with exponential backoff.
+
+        Args:
+            texts: The texts in the batch
+
+        Returns:
+            numpy.ndarray: The batch embeddings
+        """
+        embed = backoff.on_exception(
+            backoff.expo,
+            self.backend.retryable_exceptions,
+            max_tries=self.max_retries,
+            max_value=self.max_backoff,
+            jitter=backoff.full_jitter,
+        )(self.backend.embed)
+        return embed(texts)
+
+    # PUBLIC_INTERFACE
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for all texts, preserving input order.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix
+
+        Raises:
+            Exception: The last error of a batch that exhausted its retries
+        """
+        embeddings = np.empty((len(texts), self.backend.dimension), dtype=np.float32)
+        batches = self._make_batches(texts)
+        if not batches:
+            return embeddings
+
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            for batch in batches:
+                embeddings[batch.start:batch.stop] = self._embed_batch(texts[batch.start:batch.stop])
+            return embeddings
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [
+                (batch, executor.submit(self._embed_batch, texts[batch.start:batch.stop]))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                embeddings[batch.start:batch.stop] = future.result()
+        return embeddings
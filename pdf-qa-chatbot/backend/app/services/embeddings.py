@@ -0,0 +1,345 @@
+"""
+Embedding backends used by the vector store.
+
+A backend turns a batch of texts into a float32 matrix. Keeping this behind a
+small interface lets the ingest pipeline batch and retry requests without
+knowing which provider produced the vectors.
+"""
+import asyncio
+import os
+import time
+import hashlib
+from typing import List, Optional, Tuple, Type
+
+import numpy as np
+import openai
+from fastapi.concurrency import run_in_threadpool
+
+from .openai_client import get_async_client, request_timeout
+
+
+class EmbeddingBackend:
+    """
+    Base class for embedding providers.
+
+    Subclasses must set ``model_name`` and ``dimension`` and implement ``embed``.
+    """
+
+    model_name: str = ""
+    dimension: int = 0
+    # Exceptions that are worth retrying (rate limits, timeouts, transient 5xx)
+    retryable_exceptions: Tuple[Type[BaseException], ...] = (Exception,)
+    # Number of batches the ingest pipeline should send at once
+    max_concurrency: int = 4
+
+    # PUBLIC_INTERFACE
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        raise NotImplementedError
+
+    # PUBLIC_INTERFACE
+    def embed_one(self, text: str) -> np.ndarray:
+        """
+        Generate the embedding for a single text.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            numpy.ndarray: The embedding vector
+        """
+        return self.embed([text])[0]
+
+    # PUBLIC_INTERFACE
+    async def aembed_one(self, text: str) -> np.ndarray:
+        """
+        Generate the embedding for a single text without blocking the event loop.
+
+        Backends without a native async client run ``embed_one`` in a worker thread.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            numpy.ndarray: The embedding vector
+        """
+        return await run_in_threadpool(self.embed_one, text)
+
+    # PUBLIC_INTERFACE
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts without blocking the event loop.
+
+        Backends without a native async client run ``embed`` in a worker thread.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        return await run_in_threadpool(self.embed, texts)
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    Embedding backend using OpenAI's embeddings API.
+    """
+
+    retryable_exceptions = (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+    def __init__(self, model_name: str = "text-embedding-ada-002", dimension: int = 1536,
+                 async_client: Optional[openai.AsyncOpenAI] = None,
+                 max_concurrent_requests: Optional[int] = None):
+        """
+        Initialize the OpenAI client.
+
+        Args:
+            model_name: OpenAI embedding model to use
+            dimension: Dimension of the vectors produced by the model
+            async_client: Client for async calls (default: the shared pooled client)
+            max_concurrent_requests: Cap on async requests in flight
+                (default: OPENAI_MAX_CONCURRENCY or 32)
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self._async_client = async_client
+        self._async_semaphore = asyncio.Semaphore(
+            max_concurrent_requests or int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+        )
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """The client used for async calls."""
+        if self._async_client is None:
+            self._async_client = get_async_client()
+        return self._async_client
+
+    # PUBLIC_INTERFACE
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts with a single API request.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        response = self.client.embeddings.create(
+            model=self.model_name,
+            input=texts
+        )
+        # The API tags each item with its input position; don't rely on ordering
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+
+    # PUBLIC_INTERFACE
+    def embed_one(self, text: str) -> np.ndarray:
+        """
+        Generate the embedding for a single text.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            numpy.ndarray: The embedding vector
+        """
+        response = self.client.embeddings.create(
+            model=self.model_name,
+            input=text
+        )
+        return np.array(response.data[0].embedding, dtype=np.float32)
+
+    # PUBLIC_INTERFACE
+    async def aembed_one(self, text: str) -> np.ndarray:
+        """
+        Generate the embedding for a single text with the async client.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            numpy.ndarray: The embedding vector
+        """
+        async with self._async_semaphore:
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=text,
+                timeout=request_timeout()
+            )
+        return np.array(response.data[0].embedding, dtype=np.float32)
+
+    # PUBLIC_INTERFACE
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts with a single async API request.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        async with self._async_semaphore:
+            response = await self.async_client.embeddings.create(
+                model=self.model_name,
+                input=texts,
+                timeout=request_timeout()
+            )
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Local embedding backend running a sentence-transformers model on CPU.
+
+    Avoids per-chunk network latency, API cost and rate limits, and lets the
+    whole ingest path run offline.
+    """
+
+    # Local inference has no transient failures worth retrying
+    retryable_exceptions = ()
+    # torch already parallelizes each batch across the configured threads
+    max_concurrency = 1
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 batch_size: int = 64, num_threads: Optional[int] = None,
+                 normalize: bool = True, device: str = "cpu"):
+        """
+        Load the model.
+
+        Args:
+            model_name: sentence-transformers model name or local path
+            batch_size: Number of texts per forward pass
+            num_threads: torch intra-op thread count (default: torch's choice)
+            normalize: Whether to L2-normalize the output vectors
+            device: Device to run inference on
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    # PUBLIC_INTERFACE
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts with batched CPU inference.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False,
+        )
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.dimension)
+
+
+class FakeEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic offline backend for tests and benchmarks.
+
+    Vectors are derived from a hash of the text, so equal texts always map to
+    equal unit vectors. Optional sleeps simulate the latency of a remote API.
+    """
+
+    def __init__(self, dimension: int = 1536, latency: float = 0.0,
+                 per_item_latency: float = 0.0, model_name: str = "fake-embedding"):
+        """
+        Initialize the fake backend.
+
+        Args:
+            dimension: Dimension of the generated vectors
+            latency: Seconds to sleep per request (simulated round-trip)
+            per_item_latency: Additional seconds to sleep per text in a request
+            model_name: Name reported to callers (e.g. for cache keys)
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.calls = 0
+
+    # PUBLIC_INTERFACE
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate deterministic embeddings for a batch of texts.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix of unit vectors
+        """
+        self.calls += 1
+        delay = self.latency + self.per_item_latency * len(texts)
+        if delay > 0:
+            time.sleep(delay)
+
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+# PUBLIC_INTERFACE
+def create_embedding_backend(kind: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Build the embedding backend selected by the environment.
+
+    Reads EMBEDDING_BACKEND ("openai", "local" or "fake"), EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE and EMBEDDING_THREADS.
+
+    Args:
+        kind: Backend to build, overriding EMBEDDING_BACKEND
+
+    Returns:
+        EmbeddingBackend: The configured backend
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    kind = (kind or os.getenv("EMBEDDING_BACKEND", "openai")).lower()
+    model_name = os.getenv("EMBEDDING_MODEL")
+    if kind == "openai":
+        return OpenAIEmbeddingBackend(**({"model_name": model_name} if model_name else {}))
+    if kind == "local":
+        threads = os.getenv("EMBEDDING_THREADS")
+        return SentenceTransformerBackend(
+            **({"model_name": model_name} if model_name else {}),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+            num_threads=int(threads) if threads else None,
+        )
+    if kind == "fake":
+        return FakeEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {kind}")
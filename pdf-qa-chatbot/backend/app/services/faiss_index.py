@@ -0,0 +1,245 @@
+"""
+Helpers for building and querying the FAISS index types supported by VectorStore.
+"""
+from typing import Optional
+
+import faiss
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# How vector components are stored: as is, as half floats, or as 8-bit codes
+VECTOR_STORAGE = {
+    "float32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+REDUCTIONS = ("pca", "truncate")
+# Vectors used to learn the per-component ranges of an 8-bit scalar quantizer
+_SQ_TRAINING_SIZE = 1000
+
+
+# PUBLIC_INTERFACE
+def build_index(index_type: str, dimension: int, nlist: int = 1024, pq_m: int = 16,
+                pq_bits: int = 8, hnsw_m: int = 32, ef_construction: int = 200,
+                storage: str = "float32", reduce_dim: Optional[int] = None,
+                reduction: str = "pca") -> faiss.Index:
+    """
+    Create an empty FAISS index of the requested type.
+
+    Args:
+        index_type: One of "flat", "hnsw", "ivf_flat" or "ivf_pq"
+        dimension: Vector dimension
+        nlist: Number of IVF cells
+        pq_m: Number of PQ sub-quantizers (must divide the dimension)
+        pq_bits: Bits per PQ code
+        hnsw_m: Number of HNSW neighbours per node
+        ef_construction: HNSW build-time candidate list size
+        storage: "float32", or "fp16" / "sq8" to scalar-quantize the stored
+            vectors (not combinable with "ivf_pq", which is already compressed)
+        reduce_dim: Index vectors in this many dimensions instead of ``dimension``
+        reduction: How to reduce dimensions: "pca" (learned projection) or
+            "truncate" (keep the leading components, for Matryoshka-trained embeddings)
+
+    Returns:
+        faiss.Index: The (possibly untrained) index
+
+    Raises:
+        ValueError: If the index type or its parameters are invalid
+    """
+    if storage not in VECTOR_STORAGE:
+        raise ValueError(f"Unknown vector storage: {storage} (expected one of {', '.join(VECTOR_STORAGE)})")
+    if reduce_dim is None:
+        return _build_core(index_type, dimension, nlist, pq_m, pq_bits, hnsw_m, ef_construction, storage)
+    if not 0 < reduce_dim < dimension:
+        raise ValueError(f"reduce_dim={reduce_dim} must be between 1 and the dimension {dimension}")
+    if reduction == "pca":
+        transform = faiss.PCAMatrix(dimension, reduce_dim)
+    elif reduction == "truncate":
+        transform = faiss.RemapDimensionsTransform(dimension, reduce_dim, False)
+    else:
+        raise ValueError(f"Unknown reduction: {reduction} (expected one of {', '.join(REDUCTIONS)})")
+    core = _build_core(index_type, reduce_dim, nlist, pq_m, pq_bits, hnsw_m, ef_construction, storage)
+    return faiss.IndexPreTransform(transform, core)
+
+
+def _build_core(index_type: str, dimension: int, nlist: int, pq_m: int, pq_bits: int,
+                hnsw_m: int, ef_construction: int, storage: str) -> faiss.Index:
+    """Build the searchable index for ``build_index``, before any dimension reduction."""
+    qtype = VECTOR_STORAGE[storage]
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension) if qtype is None else faiss.IndexScalarQuantizer(dimension, qtype)
+    if index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, qtype, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if index_type == "ivf_flat":
+        if qtype is None:
+            return faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+        return faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dimension), dimension, nlist, qtype)
+    if index_type == "ivf_pq":
+        if qtype is not None:
+            raise ValueError("ivf_pq already compresses vectors; use storage='float32'")
+        if dimension % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the dimension {dimension}")
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, pq_m, pq_bits)
+    raise ValueError(f"Unknown index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+
+# PUBLIC_INTERFACE
+def base_index(index: faiss.Index) -> faiss.Index:
+    """
+    Return the index wrapped by an ID map, or the index itself.
+
+    Args:
+        index: A FAISS index, possibly an IndexIDMap/IndexIDMap2
+
+    Returns:
+        faiss.Index: The underlying index, downcast to its concrete type
+    """
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+# PUBLIC_INTERFACE
+def core_index(index: faiss.Index) -> faiss.Index:
+    """
+    Return the index that holds the vectors, past any ID map and dimension reduction.
+
+    Args:
+        index: A FAISS index, possibly id-mapped and/or an IndexPreTransform
+
+    Returns:
+        faiss.Index: The innermost index, downcast to its concrete type
+    """
+    index = base_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+# PUBLIC_INTERFACE
+def id_mapped(index: faiss.Index) -> faiss.IndexIDMap2:
+    """
+    Wrap an index so vectors are addressed by caller-assigned, stable ids.
+
+    IVF indexes get a direct map so vectors can be reconstructed by id.
+
+    Args:
+        index: An empty (trained) index
+
+    Returns:
+        faiss.IndexIDMap2: The id-mapped index
+    """
+    core = core_index(index)
+    if isinstance(core, faiss.IndexIVF) and core.is_trained:
+        core.make_direct_map()
+    return faiss.IndexIDMap2(index)
+
+
+# PUBLIC_INTERFACE
+def empty_copy(index: faiss.Index) -> faiss.IndexIDMap2:
+    """
+    Create an empty id-mapped index with the same type, training and settings.
+
+    Args:
+        index: An id-mapped index to copy
+
+    Returns:
+        faiss.IndexIDMap2: An empty index ready for ``add_with_ids``
+    """
+    copy = faiss.clone_index(base_index(index))
+    copy.reset()
+    return id_mapped(copy)
+
+
+# PUBLIC_INTERFACE
+def stores_exact_vectors(index: faiss.Index) -> bool:
+    """
+    Whether vectors reconstructed from an index equal the vectors that were added.
+
+    Args:
+        index: A FAISS index, possibly id-mapped
+
+    Returns:
+        bool: False for indexes that store compressed codes (PQ, scalar
+        quantizers) or reduced dimensions
+    """
+    return isinstance(base_index(index), (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+
+# PUBLIC_INTERFACE
+def min_training_size(index: faiss.Index) -> int:
+    """
+    Number of vectors needed before an index can be trained well.
+
+    Uses FAISS's rule of thumb of ~39 training points per centroid.
+
+    Args:
+        index: The untrained index
+
+    Returns:
+        int: Minimum number of vectors (0 if the index needs no training)
+    """
+    if isinstance(index, faiss.IndexPreTransform):
+        core = min_training_size(faiss.downcast_index(index.index))
+        transforms_trained = all(index.chain.at(i).is_trained for i in range(index.chain.size()))
+        # PCA needs at least as many points as input dimensions
+        return core if transforms_trained else max(core, index.d)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 39 * max(index.nlist, index.pq.ksub)
+    if isinstance(index, faiss.IndexIVF):
+        return 39 * index.nlist
+    if not index.is_trained:
+        # Scalar quantizers learn the range of each component
+        return _SQ_TRAINING_SIZE
+    return 0
+
+
+# PUBLIC_INTERFACE
+def set_default_search_parameters(index: faiss.Index, nprobe: int, ef_search: int) -> None:
+    """
+    Apply default query-time parameters to an index.
+
+    Args:
+        index: The index to configure
+        nprobe: IVF cells to visit per query
+        ef_search: HNSW candidate list size per query
+    """
+    index = core_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+
+# PUBLIC_INTERFACE
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None,
+                      sel: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Build per-query search parameters appropriate for the index type.
+
+    Args:
+        index: The index that will be searched
+        nprobe: IVF cells to visit (ignored for non-IVF indexes)
+        ef_search: HNSW candidate list size (ignored for non-HNSW indexes)
+        sel: Restrict the search to the ids accepted by this selector
+
+    Returns:
+        Optional[faiss.SearchParameters]: Parameters for ``index.search``, or None for defaults
+    """
+    index = core_index(index)
+    if isinstance(index, faiss.IndexIVF) and (nprobe is not None or sel is not None):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or index.nprobe)
+    elif isinstance(index, faiss.IndexHNSW) and (ef_search is not None or sel is not None):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch)
+    elif sel is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if sel is not None:
+        params.sel = sel
+    return params
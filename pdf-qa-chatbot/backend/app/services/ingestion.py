@@ -0,0 +1,372 @@
+"""
+Background ingestion of uploaded PDFs: extract -> chunk -> embed -> index.
+
+Uploads are queued as jobs and processed by a pool of worker threads, so the
+``/upload`` request returns as soon as the file is on disk. The queue is
+bounded; when it is full new uploads are refused instead of piling up.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .pdf_processor import PDFProcessor
+from .vector_store import VectorStore
+
+STAGES = ("extract", "chunk", "embed", "index")
+
+
+class IngestionQueueFullError(Exception):
+    """Raised when a job is submitted while the ingestion queue is full."""
+
+
+class IngestionJob:
+    """
+    Progress of one uploaded document through the ingestion stages.
+    """
+
+    def __init__(self, document_id: str, filename: str, path: str,
+                 content_hash: Optional[str] = None, job_id: Optional[str] = None):
+        """
+        Create a queued job.
+
+        Args:
+            document_id: Id the document will be indexed under
+            filename: Original name of the uploaded file
+            path: Temporary file holding the upload
+            content_hash: SHA-256 hex digest of the uploaded bytes
+            job_id: Id to track the job under (default: a new UUID)
+        """
+        self.job_id = job_id or str(uuid.uuid4())
+        self.document_id = document_id
+        self.filename = filename
+        self.path = path
+        self.content_hash = content_hash
+        # Set when the upload matched an already indexed document
+        self.duplicate = False
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Any]] = {
+            stage: {"status": "pending", "done": 0, "total": None} for stage in STAGES
+        }
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_stage(self, stage: str, total: Optional[int] = None) -> None:
+        """Mark a stage as running with the given amount of work."""
+        with self._lock:
+            self.stages[stage].update(status="running", total=total)
+
+    def advance(self, stage: str, done: int) -> None:
+        """Record how much of a stage's work is finished."""
+        with self._lock:
+            self.stages[stage]["done"] = done
+
+    def finish_stage(self, stage: str) -> None:
+        """Mark a stage as completed."""
+        with self._lock:
+            info = self.stages[stage]
+            info["status"] = "completed"
+            if info["total"] is not None:
+                info["done"] = info["total"]
+
+    def fail(self, stage: str, error: Exception) -> None:
+        """Mark a stage, and with it the job, as failed."""
+        with self._lock:
+            self.stages[stage]["status"] = "failed"
+            self.error = f"{stage} failed: {error}"
+            self.status = "failed"
+
+    def complete_as_duplicate(self) -> None:
+        """Mark the job completed without running it, because its content is already indexed."""
+        self.duplicate = True
+        for stage in STAGES:
+            self.finish_stage(stage)
+        self.status = "completed"
+        self.started_at = self.finished_at = self.created_at
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has completed or failed."""
+        return self.status in ("completed", "failed")
+
+    # PUBLIC_INTERFACE
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Snapshot the job's state for the status endpoint.
+
+        Returns:
+            Dict[str, Any]: Job id, document id, overall status, per-stage progress and timings
+        """
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "file_id": self.document_id,
+                "filename": self.filename,
+                "status": self.status,
+                "duplicate": self.duplicate,
+                "error": self.error,
+                "stages": {stage: dict(info) for stage, info in self.stages.items()},
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+    # PUBLIC_INTERFACE
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        """
+        Rebuild a job from its ``to_dict`` form, e.g. status published by another process.
+
+        Args:
+            data: A dictionary produced by ``to_dict``
+
+        Returns:
+            IngestionJob: A job reporting the same state
+        """
+        job = cls(data["file_id"], data["filename"], "", job_id=data["job_id"])
+        job.status = data["status"]
+        job.duplicate = data["duplicate"]
+        job.error = data["error"]
+        job.stages = {stage: dict(info) for stage, info in data["stages"].items()}
+        job.created_at = data["created_at"]
+        job.started_at = data["started_at"]
+        job.finished_at = data["finished_at"]
+        return job
+
+
+class IngestionQueue:
+    """
+    Bounded job queue drained by a pool of ingestion worker threads.
+    """
+
+    def __init__(self, pdf_processor: PDFProcessor, vector_store: VectorStore,
+                 num_workers: Optional[int] = None, max_queue_size: Optional[int] = None,
+                 embed_batch_size: int = 256, max_finished_jobs: int = 1000):
+        """
+        Initialize the queue. Workers start on the first submission.
+
+        Args:
+            pdf_processor: Processor used to extract and chunk PDFs
+            vector_store: Store the chunks are embedded into and indexed by
+            num_workers: Number of worker threads (default: INGEST_WORKERS or 2)
+            max_queue_size: Jobs allowed to wait for a worker (default: INGEST_QUEUE_SIZE or 32)
+            embed_batch_size: Chunks embedded between progress updates
+            max_finished_jobs: Completed/failed jobs kept for status lookups
+        """
+        self.pdf_processor = pdf_processor
+        self.vector_store = vector_store
+        self.num_workers = num_workers or int(os.getenv("INGEST_WORKERS", "2"))
+        self.max_queue_size = max_queue_size or int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+        self.embed_batch_size = embed_batch_size
+        self.max_finished_jobs = max_finished_jobs
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue(maxsize=self.max_queue_size)
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        # Map of content hash -> queued or running job, so concurrent duplicates share one job
+        self._jobs_by_hash: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    def _start(self) -> None:
+        """Start the worker threads if they are not running yet."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._work, name=f"ingest-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    # PUBLIC_INTERFACE
+    def submit(self, path: str, filename: str, document_id: Optional[str] = None,
+               content_hash: Optional[str] = None, job_id: Optional[str] = None) -> IngestionJob:
+        """
+        Queue a saved upload for ingestion.
+
+        The queue takes ownership of the file at ``path`` and deletes it once
+        the job finishes. An upload whose content hash matches an indexed
+        document gets an already completed job for that document, and one
+        matching a job still in progress gets that job.
+
+        Args:
+            path: Temporary file holding the PDF
+            filename: Original name of the uploaded file
+            document_id: Id to index the document under (default: a new UUID)
+            content_hash: SHA-256 hex digest of the file, used to detect duplicates
+            job_id: Id to track the job under (default: a new UUID)
+
+        Returns:
+            IngestionJob: The queued job, or the job that already covers this content
+
+        Raises:
+            IngestionQueueFullError: If the queue is full
+        """
+        if content_hash is not None:
+            existing = self._find_duplicate(content_hash, filename)
+            if existing is not None:
+                self._discard(path)
+                return existing
+
+        self._start()
+        job = IngestionJob(document_id or str(uuid.uuid4()), filename, path, content_hash, job_id)
+        if content_hash is not None:
+            # Registered before queueing so a fast worker cannot finish the job first
+            with self._lock:
+                self._jobs_by_hash[content_hash] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._forget_hash(job)
+            raise IngestionQueueFullError(
+                f"Ingestion queue is full ({self.max_queue_size} jobs waiting)"
+            ) from None
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune_jobs()
+        return job
+
+    def _find_duplicate(self, content_hash: str, filename: str) -> Optional[IngestionJob]:
+        """
+        Job covering an upload with this content, if there is one.
+
+        Args:
+            content_hash: SHA-256 hex digest of the upload
+            filename: Name of the new upload, recorded on a completed duplicate job
+
+        Returns:
+            Optional[IngestionJob]: An in-progress job for the same content, a new
+            completed job pointing at the indexed document, or None
+        """
+        with self._lock:
+            pending = self._jobs_by_hash.get(content_hash)
+            if pending is not None:
+                return pending
+        document_id = self.vector_store.find_by_content_hash(content_hash)
+        if document_id is None:
+            return None
+        job = IngestionJob(document_id, filename, "", content_hash)
+        job.complete_as_duplicate()
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune_jobs()
+        return job
+
+    def _forget_hash(self, job: IngestionJob) -> None:
+        """Stop routing uploads with the job's content hash to it."""
+        with self._lock:
+            if job.content_hash is not None and self._jobs_by_hash.get(job.content_hash) is job:
+                del self._jobs_by_hash[job.content_hash]
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        """Delete an upload's temporary file, ignoring one that is already gone."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # PUBLIC_INTERFACE
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Look up a job.
+
+        Args:
+            job_id: The job id returned by submit
+
+        Returns:
+            Optional[IngestionJob]: The job, or None if it is unknown or was pruned
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # PUBLIC_INTERFACE
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def _prune_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond max_finished_jobs."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _work(self) -> None:
+        """Worker loop: run jobs until a shutdown sentinel arrives."""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: IngestionJob) -> None:
+        """
+        Run one job through every stage, recording progress and failures.
+
+        Args:
+            job: The job to run
+        """
+        job.status = "running"
+        job.started_at = time.time()
+        stage = STAGES[0]
+        try:
+            job.start_stage(stage)
+            pages = self.pdf_processor.extract_pages(job.path)
+            job.finish_stage(stage)
+
+            stage = "chunk"
+            job.start_stage(stage, total=len(pages))
+            chunks = self.pdf_processor.process_pages(job.document_id, pages)
+            job.finish_stage(stage)
+
+            stage = "embed"
+            job.start_stage(stage, total=len(chunks))
+            batches = []
+            for start in range(0, len(chunks), self.embed_batch_size):
+                batch = chunks[start:start + self.embed_batch_size]
+                batches.append(self.vector_store.embed_texts(batch))
+                job.advance(stage, start + len(batch))
+            job.finish_stage(stage)
+
+            stage = "index"
+            job.start_stage(stage, total=len(chunks))
+            if chunks:
+                records = self.pdf_processor.get_chunk_records(job.document_id)
+                self.vector_store.add_document(job.document_id, chunks, embeddings=np.concatenate(batches),
+                                               content_hash=job.content_hash,
+                                               char_spans=[(record.char_start, record.char_end) for record in records])
+            job.finish_stage(stage)
+            job.status = "completed"
+        except Exception as e:
+            job.fail(stage, e)
+        finally:
+            # The vector store holds the chunk text now, or the job failed; either way don't keep it
+            self.pdf_processor.release_chunks(job.document_id)
+            job.finished_at = time.time()
+            self._forget_hash(job)
+            self._discard(job.path)
+
+    # PUBLIC_INTERFACE
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the workers after the jobs already queued have run.
+
+        Args:
+            wait: Block until the workers have exited
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,339 @@
+"""
+In-process BM25 inverted index over chunk text, plus reciprocal-rank fusion.
+"""
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Words, keeping dotted/dashed identifiers such as "4.2.1" or "AB-1234" whole
+_TOKEN = re.compile(r"\w+(?:[.\-/]\w+)*")
+_SEPARATOR = re.compile(r"[.\-/]")
+_DIGIT = re.compile(r"\d")
+
+
+# PUBLIC_INTERFACE
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms.
+
+    Compound identifiers are indexed whole and also by their parts, so
+    "AB-1234" matches queries for "ab-1234", "ab" and "1234".
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List[str]: The terms, in order
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        if _SEPARATOR.search(token):
+            terms.extend(part for part in _SEPARATOR.split(token) if part)
+    return terms
+
+
+# PUBLIC_INTERFACE
+def identifier_terms(query: str) -> List[str]:
+    """
+    The terms of a query that are numbers or dotted/dashed codes.
+
+    Args:
+        query: The query text
+
+    Returns:
+        List[str]: The identifier terms, lowercased and whole, in order
+    """
+    return [token for token in _TOKEN.findall(query.lower()) if _DIGIT.search(token) or _SEPARATOR.search(token)]
+
+
+# PUBLIC_INTERFACE
+def is_identifier_query(query: str, max_terms: int = 4) -> bool:
+    """
+    Whether a query looks like a lookup of an exact identifier.
+
+    Short queries containing a number or a dotted/dashed code (clause numbers,
+    part numbers) are better served by exact term matching than by embeddings.
+
+    Args:
+        query: The query text
+        max_terms: Longest query still treated as a lookup
+
+    Returns:
+        bool: True for identifier-like queries
+    """
+    if len(_TOKEN.findall(query)) > max_terms:
+        return False
+    return bool(identifier_terms(query))
+
+
+# PUBLIC_INTERFACE
+def combine_statistics(statistics: Iterable[Tuple[int, int, Dict[str, int]]]) -> Tuple[int, int, Dict[str, int]]:
+    """
+    Sum the ``BM25Index.statistics`` of several indexes, as if they were one.
+
+    Args:
+        statistics: Each index's (live chunks, total length, term document frequencies)
+
+    Returns:
+        Tuple[int, int, Dict[str, int]]: The combined statistics
+    """
+    live, total_length, frequencies = 0, 0, Counter()
+    for index_live, index_length, index_frequencies in statistics:
+        live += index_live
+        total_length += index_length
+        frequencies.update(index_frequencies)
+    return live, total_length, dict(frequencies)
+
+
+# PUBLIC_INTERFACE
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Merge ranked id lists by summing 1 / (k + rank) for every list an id appears in.
+
+    Args:
+        rankings: Id lists, each ordered best first
+        k: Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        List[Tuple[int, float]]: (id, fused score), best first
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunks addressed by the same ids as the vector index.
+
+    Each term's posting list is a pair of compact typed arrays (chunk ids and
+    term frequencies) that grow by appending. Removed chunks are masked out
+    at query time and dropped from the posting lists by ``compact``.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1: Term frequency saturation
+            b: Strength of document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Indexed by chunk id; a length of 0 marks an absent or removed chunk
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._live = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    # PUBLIC_INTERFACE
+    def add(self, ids: Sequence[int], texts: Sequence[str]) -> None:
+        """
+        Index chunks.
+
+        Ids are never reused, matching the vector store's id assignment.
+
+        Args:
+            ids: New chunk ids, one per text
+            texts: The chunk texts
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        if max(ids) >= len(self._lengths):
+            grown = np.zeros(max(max(ids) + 1, 2 * len(self._lengths)), dtype=np.int32)
+            grown[:len(self._lengths)] = self._lengths
+            self._lengths = grown
+        for chunk_id, text in zip(ids, texts):
+            terms = tokenize(text)
+            # Chunks with no terms still count as present
+            length = max(len(terms), 1)
+            self._lengths[chunk_id] = length
+            self._live += 1
+            self._total_length += length
+            for term, frequency in Counter(terms).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("q"), array("I"))
+                postings[0].append(chunk_id)
+                postings[1].append(frequency)
+
+    # PUBLIC_INTERFACE
+    def remove(self, ids: Iterable[int]) -> None:
+        """
+        Remove chunks from search results.
+
+        Args:
+            ids: Chunk ids to remove
+        """
+        for chunk_id in ids:
+            chunk_id = int(chunk_id)
+            if chunk_id < len(self._lengths) and self._lengths[chunk_id]:
+                self._total_length -= int(self._lengths[chunk_id])
+                self._lengths[chunk_id] = 0
+                self._live -= 1
+
+    # PUBLIC_INTERFACE
+    def compact(self) -> None:
+        """Drop removed chunks from the posting lists."""
+        for term in list(self._postings):
+            ids, frequencies = self._arrays(term)
+            keep = self._lengths[ids] > 0
+            if keep.all():
+                continue
+            if not keep.any():
+                del self._postings[term]
+                continue
+            self._postings[term] = (array("q", ids[keep].tobytes()), array("I", frequencies[keep].tobytes()))
+
+    # PUBLIC_INTERFACE
+    def export(self) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The live postings as flat arrays, for writing a snapshot.
+
+        Returns:
+            Tuple: The terms, the start of each term's postings in the posting
+            arrays (plus a final end offset), the chunk id and term frequency of
+            every posting, and each chunk's length by id (0 if absent or removed)
+        """
+        terms, ids, frequencies = [], [], []
+        for term in self._postings:
+            term_ids, term_frequencies = self._arrays(term)
+            keep = self._lengths[term_ids] > 0
+            if keep.any():
+                terms.append(term)
+                ids.append(term_ids[keep])
+                frequencies.append(term_frequencies[keep])
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term_ids) for term_ids in ids], out=offsets[1:])
+        return (terms, offsets, np.concatenate(ids or [np.empty(0, np.int64)]),
+                np.concatenate(frequencies or [np.empty(0, np.uint32)]), self._lengths.copy())
+
+    # PUBLIC_INTERFACE
+    @classmethod
+    def from_arrays(cls, terms: List[str], offsets: np.ndarray, ids: np.ndarray, frequencies: np.ndarray,
+                    lengths: np.ndarray, k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Rebuild an index from ``export`` arrays without re-tokenizing any text.
+
+        Args:
+            terms: The terms
+            offsets: Start of each term's postings, plus the end
+            ids: Chunk id of every posting
+            frequencies: Term frequency of every posting
+            lengths: Length of each chunk by id
+            k1: Term frequency saturation
+            b: Strength of document length normalization
+
+        Returns:
+            BM25Index: The restored index
+        """
+        index = cls(k1, b)
+        index._lengths = np.array(lengths, dtype=np.int32)
+        index._live = int(np.count_nonzero(index._lengths))
+        index._total_length = int(index._lengths.sum())
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        frequencies = np.ascontiguousarray(frequencies, dtype=np.uint32)
+        bounds = np.asarray(offsets).tolist()
+        for term, start, end in zip(terms, bounds, bounds[1:]):
+            index._postings[term] = (array("q", ids[start:end].tobytes()), array("I", frequencies[start:end].tobytes()))
+        return index
+
+    # PUBLIC_INTERFACE
+    def statistics(self, terms: Iterable[str]) -> Tuple[int, int, Dict[str, int]]:
+        """
+        The collection statistics BM25 scores depend on.
+
+        Indexes holding parts of one collection combine theirs with
+        ``combine_statistics`` and pass the result to ``search``, so every part
+        scores a chunk as an index over the whole collection would.
+
+        Args:
+            terms: Terms whose document frequency is wanted
+
+        Returns:
+            Tuple[int, int, Dict[str, int]]: Live chunks, their total length and
+            the live chunks containing each of the terms that occur
+        """
+        frequencies = {}
+        for term in set(terms):
+            if term in self._postings:
+                ids, _ = self._arrays(term)
+                frequencies[term] = int(np.count_nonzero(self._lengths[ids]))
+        return self._live, self._total_length, frequencies
+
+    def _arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy numpy views of a term's posting list."""
+        ids, frequencies = self._postings[term]
+        return np.frombuffer(ids, dtype=np.int64), np.frombuffer(frequencies, dtype=np.uint32)
+
+    # PUBLIC_INTERFACE
+    def search(self, query: str, k: int, allowed_ids: Optional[np.ndarray] = None,
+               required_terms: Optional[Sequence[str]] = None,
+               statistics: Optional[Tuple[int, int, Dict[str, int]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank chunks by BM25 score for the query.
+
+        Args:
+            query: The query text
+            k: Number of results to return
+            allowed_ids: Only consider these chunk ids (default: all chunks)
+            required_terms: Return nothing unless one of these terms occurs in a
+                chunk being considered (default: any query term will do)
+            statistics: Collection statistics to score with, from
+                ``combine_statistics`` (default: this index's own)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk ids, scores), best first; empty
+            if no chunk contains a query term, or a required term
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not terms or not self._live:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Cleared once a required term is found in a considered chunk
+        unmatched = None if required_terms is None else set(required_terms)
+
+        collection_size, total_length, document_frequencies = statistics or (self._live, self._total_length, None)
+        average_length = total_length / collection_size
+        all_ids, all_scores = [], []
+        for term in terms:
+            ids, frequencies = self._arrays(term)
+            lengths = self._lengths[ids]
+            live = lengths > 0
+            if allowed_ids is not None:
+                live &= np.isin(ids, allowed_ids)
+            if not live.any():
+                continue
+            if unmatched is not None and term in unmatched:
+                unmatched = None
+            if document_frequencies is None:
+                document_frequency = int(np.count_nonzero(lengths))
+            else:
+                document_frequency = document_frequencies.get(term, 0)
+            idf = math.log(1 + (collection_size - document_frequency + 0.5) / (document_frequency + 0.5))
+            tf = frequencies[live].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths[live] / average_length)
+            all_ids.append(ids[live])
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not all_ids or unmatched is not None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        unique_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return unique_ids[top], scores[top]
@@ -0,0 +1,308 @@
+"""
+Hot-path latency and usage metrics, exported in the Prometheus text format.
+
+Services time their stages with ``stage("name")``: each timing is observed
+in the ``pdfqa_stage_seconds`` histogram and, when the current request asked
+for one, added to its trace, which the API returns as a Server-Timing
+header. With METRICS_ENABLED=false and no trace, ``stage`` returns a shared
+no-op context manager and the metrics ignore updates, so instrumentation
+costs a flag check.
+
+Metrics are kept per process. With several workers, each scrape of
+``/metrics`` reports the worker that served it.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+_enabled = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+# PUBLIC_INTERFACE
+def enabled() -> bool:
+    """Whether metrics are being recorded."""
+    return _enabled
+
+
+# PUBLIC_INTERFACE
+def set_enabled(value: bool) -> None:
+    """
+    Turn metric recording on or off for this process.
+
+    Args:
+        value: True to record metrics
+    """
+    global _enabled
+    _enabled = value
+
+
+class _Metric:
+    """A named family of samples, one per combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 registry: Optional[List["_Metric"]] = None):
+        """
+        Args:
+            name: Metric name
+            description: The HELP text
+            labels: Label names; every update gives a value for each
+            registry: Where ``render`` finds the metric (default: REGISTRY)
+        """
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def reset(self) -> None:
+        """Forget every sample."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    """A total that only goes up."""
+
+    kind = "counter"
+
+    # PUBLIC_INTERFACE
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Add to the total for a set of label values.
+
+        Args:
+            amount: Non-negative increment
+            **labels: A value for each of the metric's labels
+        """
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    # PUBLIC_INTERFACE
+    def set_total(self, total: float, **labels: str) -> None:
+        """
+        Copy a total counted elsewhere, such as a cache's own hit counter.
+
+        Args:
+            total: The current total
+            **labels: A value for each of the metric's labels
+        """
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = total
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, set when metrics are collected."""
+
+    kind = "gauge"
+
+    # PUBLIC_INTERFACE
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Set the value for a set of label values.
+
+        Args:
+            value: The current value
+            **labels: A value for each of the metric's labels
+        """
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional[List[_Metric]] = None):
+        super().__init__(name, description, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    # PUBLIC_INTERFACE
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value: The observed value, e.g. seconds or tokens
+            **labels: A value for each of the metric's labels
+        """
+        if not _enabled:
+            return
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[position] += 1
+            state[-1] += value
+
+    def _samples(self, key: Tuple[str, ...], state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(state[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram("pdfqa_stage_seconds", "Time spent in each processing stage.", ["stage"])
+REQUEST_SECONDS = Histogram("pdfqa_request_seconds", "HTTP request latency by route and status.",
+                            ["method", "route", "status"])
+TOKENS = Histogram("pdfqa_completion_tokens", "Tokens per chat completion, by prompt and completion.",
+                   ["kind"], buckets=TOKEN_BUCKETS)
+CACHE_LOOKUPS = Counter("pdfqa_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+CACHE_HIT_RATE = Gauge("pdfqa_cache_hit_ratio", "Share of cache lookups that hit.", ["cache"])
+INDEX_SIZE = Gauge("pdfqa_index_size", "Indexed documents, live chunks and stored vectors.", ["kind"])
+QUEUE_DEPTH = Gauge("pdfqa_ingestion_queue_depth", "Ingestion jobs waiting or running.")
+RERANK_FALLBACKS = Counter("pdfqa_rerank_fallbacks_total",
+                           "Re-rankings that ran out of time and kept the search order.")
+
+
+# PUBLIC_INTERFACE
+def render(registry: Optional[List[_Metric]] = None) -> str:
+    """
+    Format metrics in the Prometheus text exposition format.
+
+    Args:
+        registry: The metrics to format (default: REGISTRY)
+
+    Returns:
+        str: The exposition, ending in a newline
+    """
+    return "\n".join(line for metric in (REGISTRY if registry is None else registry)
+                     for line in metric.render()) + "\n"
+
+
+class Trace:
+    """Stage timings of one request, in the order the stages finished."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        # list.append is atomic, so stages finishing in worker threads can record too
+        self.spans.append((name, seconds))
+
+    # PUBLIC_INTERFACE
+    def server_timing(self) -> str:
+        """
+        Format the spans as a Server-Timing header value, ending with the total so far.
+
+        Returns:
+            str: E.g. ``query_embed;dur=12.1, search;dur=0.8, total;dur=13.4``
+        """
+        spans = self.spans + [("total", time.perf_counter() - self.started)]
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans)
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("pdfqa_trace", default=None)
+
+
+# PUBLIC_INTERFACE
+@contextmanager
+def traced() -> Iterator[Trace]:
+    """
+    Collect the stages run inside the block, including in worker threads it starts.
+
+    Yields:
+        Trace: The trace the stages are added to
+    """
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class _StageTimer:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str, trace: Optional[Trace]):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self) -> "_StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        if self.trace is not None:
+            self.trace.add(self.name, elapsed)
+
+
+_NOT_TIMED = nullcontext()
+
+
+# PUBLIC_INTERFACE
+def stage(name: str):
+    """
+    Time a block as one stage of the current request or job.
+
+    Args:
+        name: Stage name, the ``stage`` label of pdfqa_stage_seconds
+
+    Returns:
+        A context manager; a shared no-op one when nothing would record the timing
+    """
+    trace = _trace.get()
+    if not _enabled and trace is None:
+        return _NOT_TIMED
+    return _StageTimer(name, trace)
@@ -0,0 +1,66 @@
+"""
+Process-wide async OpenAI client with a shared HTTP connection pool.
+
+Every async caller (question answering, query embeddings) goes through the
+same client, so keep-alive connections are reused instead of each service
+opening its own pool.
+"""
+import os
+import threading
+from typing import Optional
+
+import httpx
+import openai
+
+_client: Optional[openai.AsyncOpenAI] = None
+_client_lock = threading.Lock()
+
+
+# PUBLIC_INTERFACE
+def request_timeout() -> float:
+    """
+    Per-request timeout in seconds for OpenAI calls.
+
+    Returns:
+        float: OPENAI_TIMEOUT, or 30 seconds
+    """
+    return float(os.getenv("OPENAI_TIMEOUT", "30"))
+
+
+# PUBLIC_INTERFACE
+def get_async_client() -> openai.AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client, creating it on first use.
+
+    Reads OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_TIMEOUT,
+    OPENAI_MAX_CONNECTIONS and OPENAI_MAX_RETRIES.
+
+    Returns:
+        openai.AsyncOpenAI: The shared client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(request_timeout(), connect=5.0),
+            )
+            _client = openai.AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+                http_client=http_client,
+            )
+        return _client
+
+
+# PUBLIC_INTERFACE
+async def close_async_client() -> None:
+    """Close the shared client and its connection pool, if one was created."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.close()
@@ -1,19 +1,89 @@
 import PyPDF2
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+import os
+import hashlib
+import tempfile
+import threading
 import uuid
-from typing import List, Dict
+from typing import BinaryIO, Iterator, List, Dict, Optional, Tuple, Union
 import io
+from .chunker import Chunk, Chunker
+from .metrics import stage
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop) in a worker process.
+    
+    Args:
+        source: Path to the PDF, or its raw bytes
+        start: Index of the first page to extract
+        stop: Index one past the last page to extract
+        
+    Returns:
+        List[str]: Text of each page in the range, in page order
+    """
+    if isinstance(source, bytes):
+        reader = PyPDF2.PdfReader(io.BytesIO(source))
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+    # Read from the open file rather than letting PyPDF2 load it all into memory
+    with open(source, "rb") as pdf_file:
+        reader = PyPDF2.PdfReader(pdf_file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
 
 class PDFProcessor:
-    def __init__(self):
-        self.chunk_size = 1000  # Default chunk size in characters
+    def __init__(self, parallel_page_threshold: int = 64, pages_per_task: Optional[int] = None,
+                 max_workers: Optional[int] = None, max_upload_size: Optional[int] = None,
+                 spool_max_size: int = 8 * 1024 * 1024, read_chunk_size: int = 1024 * 1024,
+                 chunker: Optional[Chunker] = None):
+        """
+        Initialize the processor.
+        
+        Args:
+            parallel_page_threshold: PDFs with at least this many pages are extracted
+                in a process pool
+            pages_per_task: Pages handed to a worker process at a time
+                (default: split each PDF into two ranges per worker)
+            max_workers: Size of the extraction process pool (default: CPU count)
+            max_upload_size: Largest accepted upload in bytes
+                (default: MAX_UPLOAD_SIZE or 100 MiB)
+            spool_max_size: Uploads larger than this are spooled to a temp file
+                instead of memory
+            read_chunk_size: Bytes read from the upload at a time
+            chunker: Splits extracted text into chunks (default: configured from
+                CHUNK_SIZE, CHUNK_OVERLAP and CHUNK_UNIT)
+        """
+        self.chunker = chunker or Chunker()
         self.processed_files: Dict[str, List[str]] = {}
+        # Map of file_id -> chunk records with page numbers and character offsets
+        self.chunk_records: Dict[str, List[Chunk]] = {}
+        # Map of SHA-256 of the uploaded bytes -> file_id, so re-uploads are not processed again
+        self.files_by_hash: Dict[str, str] = {}
+        self.parallel_page_threshold = parallel_page_threshold
+        self.pages_per_task = pages_per_task
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Ingestion workers extract concurrently; only one of them may start the pool
+        self._executor_lock = threading.Lock()
+        self.max_upload_size = max_upload_size or int(os.getenv("MAX_UPLOAD_SIZE", str(100 * 1024 * 1024)))
+        self.spool_max_size = spool_max_size
+        self.read_chunk_size = read_chunk_size
 
     # PUBLIC_INTERFACE
     async def process_file(self, file: UploadFile) -> str:
         """
         Process an uploaded PDF file by extracting text and chunking it.
         
+        Uploading the same bytes again returns the id of the earlier upload
+        without extracting it a second time.
+        
         Args:
             file (UploadFile): The uploaded PDF file to process
             
@@ -21,29 +91,136 @@ class PDFProcessor:
             str: A unique identifier for the processed file
             
         Raises:
+            UploadTooLargeError: If the file exceeds max_upload_size
             Exception: If there's an error processing the PDF
         """
+        # Reject early when the size is already known
+        size = getattr(file, "size", None)
+        if isinstance(size, int) and size > self.max_upload_size:
+            raise UploadTooLargeError(f"File exceeds the maximum upload size of {self.max_upload_size} bytes")
+        
+        pdf_file = None
         try:
-            # Read the uploaded file into memory
-            content = await file.read()
-            pdf_file = io.BytesIO(content)
-            
-            # Extract text from PDF
-            text = self._extract_text(pdf_file)
+            # Stream the upload into a bounded spool instead of one big bytes object
+            pdf_file, content_hash = await self._spool_upload(file)
+            known = self.files_by_hash.get(content_hash)
+            if known in self.processed_files:
+                return known
             
-            # Chunk the extracted text
-            chunks = self._chunk_text(text)
+            # Extract text from PDF off the event loop
+            pages = await run_in_threadpool(self.extract_pages, pdf_file)
             
-            # Generate a unique ID for this file
+            # Generate a unique ID for this file and chunk the extracted text
             file_id = str(uuid.uuid4())
-            
-            # Store the chunks
-            self.processed_files[file_id] = chunks
+            self.process_pages(file_id, pages)
+            self.files_by_hash[content_hash] = file_id
             
             return file_id
             
+        except UploadTooLargeError:
+            raise
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
+        finally:
+            if pdf_file is not None:
+                pdf_file.close()
+
+    # PUBLIC_INTERFACE
+    async def save_upload(self, file: UploadFile) -> Tuple[str, str]:
+        """
+        Stream an upload to a temporary file that outlives the request.
+        
+        The caller owns the file and must delete it once it has been processed.
+        
+        Args:
+            file (UploadFile): The uploaded file
+            
+        Returns:
+            Tuple[str, str]: Path of the saved file and the SHA-256 hex digest of its content
+            
+        Raises:
+            UploadTooLargeError: If the file exceeds max_upload_size
+        """
+        size = getattr(file, "size", None)
+        if isinstance(size, int) and size > self.max_upload_size:
+            raise UploadTooLargeError(f"File exceeds the maximum upload size of {self.max_upload_size} bytes")
+        
+        saved, content_hash = await self._spool_upload(file, delete=False)
+        saved.close()
+        return saved.name, content_hash
+
+    # PUBLIC_INTERFACE
+    def process_pages(self, file_id: str, pages: List[Tuple[int, str]]) -> List[str]:
+        """
+        Chunk extracted pages and store the result under file_id.
+        
+        Args:
+            file_id (str): Identifier to store the chunks under
+            pages: (page number, text) pairs in page order
+            
+        Returns:
+            List[str]: The text chunks
+        """
+        with stage("chunk"):
+            records = self.chunker.chunk_pages(pages)
+        chunks = [record.text for record in records]
+        
+        # Store the chunks and their records
+        self.processed_files[file_id] = chunks
+        self.chunk_records[file_id] = records
+        return chunks
+
+    @property
+    def chunk_size(self) -> int:
+        """Maximum chunk size, in the chunker's unit."""
+        return self.chunker.size
+
+    async def _spool_upload(self, file: UploadFile, delete: bool = True) -> Tuple[BinaryIO, str]:
+        """
+        Copy an upload in fixed-size chunks into memory or, past spool_max_size,
+        a named temporary file that extraction workers can open by path.
+        
+        The content is hashed as it streams in, so duplicates can be detected
+        without reading the file a second time.
+        
+        Args:
+            file (UploadFile): The uploaded file
+            delete: Remove the temporary file when it is closed; if False the
+                upload always goes to disk
+            
+        Returns:
+            Tuple[BinaryIO, str]: The spooled file, positioned at the start, and
+            the SHA-256 hex digest of its content
+            
+        Raises:
+            UploadTooLargeError: If the upload exceeds max_upload_size
+        """
+        spool: BinaryIO = io.BytesIO() if delete else tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            while True:
+                chunk = await file.read(self.read_chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_upload_size:
+                    raise UploadTooLargeError(
+                        f"File exceeds the maximum upload size of {self.max_upload_size} bytes"
+                    )
+                if isinstance(spool, io.BytesIO) and size > self.spool_max_size:
+                    on_disk = tempfile.NamedTemporaryFile(suffix=".pdf")
+                    on_disk.write(spool.getbuffer())
+                    spool = on_disk
+                spool.write(chunk)
+                digest.update(chunk)
+        except BaseException:
+            spool.close()
+            if not delete:
+                os.remove(spool.name)
+            raise
+        spool.seek(0)
+        return spool, digest.hexdigest()
 
     def _extract_text(self, pdf_file: io.BytesIO) -> str:
         """
@@ -55,44 +232,111 @@ class PDFProcessor:
         Returns:
             str: The extracted text
         """
+        return "".join(page_text for _, page_text in self.extract_pages(pdf_file))
+
+    # PUBLIC_INTERFACE
+    def iter_pages(self, pdf_file: BinaryIO) -> Iterator[Tuple[int, str]]:
+        """
+        Lazily extract a PDF one page at a time.
+        
+        Args:
+            pdf_file: The PDF file (in memory or on disk)
+            
+        Yields:
+            Tuple[int, str]: The 1-based page number and the page's text
+            
+        Raises:
+            Exception: If the PDF cannot be read
+        """
         try:
             reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            return text
+            for page_number, page in enumerate(reader.pages, start=1):
+                yield page_number, page.extract_text() or ""
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
 
-    def _chunk_text(self, text: str) -> List[str]:
+    # PUBLIC_INTERFACE
+    def extract_pages(self, pdf_file: Union[BinaryIO, str]) -> List[Tuple[int, str]]:
         """
-        Split text into chunks of approximately equal size.
+        Extract every page of a PDF, fanning large documents out to a process pool.
         
         Args:
-            text (str): The text to chunk
+            pdf_file: The PDF file object, or a path to it
             
         Returns:
-            List[str]: List of text chunks
+            List[Tuple[int, str]]: (1-based page number, text) for each page, in page order
+            
+        Raises:
+            Exception: If the PDF cannot be read
         """
-        chunks = []
-        current_chunk = ""
-        
-        # Split by sentences (simple approach)
-        sentences = text.replace('\n', ' ').split('.')
+        with stage("extract"):
+            if isinstance(pdf_file, str):
+                with open(pdf_file, "rb") as handle:
+                    return self._extract_pages(handle, pdf_file)
+            path = getattr(pdf_file, "name", None)
+            return self._extract_pages(pdf_file, path if isinstance(path, str) and os.path.exists(path) else None)
+
+    def _extract_pages(self, pdf_file: BinaryIO, path: Optional[str]) -> List[Tuple[int, str]]:
+        """
+        Extract every page from an open PDF.
         
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= self.chunk_size:
-                current_chunk += sentence + '.'
+        Args:
+            pdf_file: The open PDF file
+            path: Path of the same file on disk, if any, for worker processes
+            
+        Returns:
+            List[Tuple[int, str]]: (1-based page number, text) for each page, in page order
+        """
+        try:
+            reader = PyPDF2.PdfReader(pdf_file)
+            page_count = len(reader.pages)
+            if page_count < self.parallel_page_threshold or self.max_workers <= 1:
+                return [(i + 1, page.extract_text() or "") for i, page in enumerate(reader.pages)]
+            
+            # Workers re-open the file themselves; hand them a path if we have one
+            if path is not None:
+                source = path
             else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + '.'
-                
-        # Add the last chunk if it's not empty
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+                pdf_file.seek(0)
+                source = pdf_file.read()
             
-        return chunks
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                executor = self._executor
+            # Each task re-parses the PDF, so keep tasks few and large
+            per_task = self.pages_per_task or -(-page_count // (2 * self.max_workers))
+            ranges = [(start, min(start + per_task, page_count))
+                      for start in range(0, page_count, per_task)]
+            futures = [executor.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+            
+            pages = []
+            for (start, _), future in zip(ranges, futures):
+                pages.extend((start + offset + 1, page_text) for offset, page_text in enumerate(future.result()))
+            return pages
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Shut down the extraction process pool, if one was started."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _chunk_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks along sentence, paragraph and heading boundaries.
+        
+        Args:
+            text (str): The text to chunk
+            
+        Returns:
+            List[str]: List of text chunks
+        """
+        with stage("chunk"):
+            return [record.text for record in self.chunker.chunk_text(text)]
 
     # PUBLIC_INTERFACE
     def get_chunks(self, file_id: str) -> List[str]:
@@ -110,4 +354,33 @@ class PDFProcessor:
         """
         if file_id not in self.processed_files:
             raise KeyError(f"No processed file found with ID: {file_id}")
-        return self.processed_files[file_id]
\ No newline at end of file
+        return self.processed_files[file_id]
+
+    # PUBLIC_INTERFACE
+    def get_chunk_records(self, file_id: str) -> List[Chunk]:
+        """
+        Retrieve the chunks of a processed file with their page numbers and offsets.
+        
+        Args:
+            file_id (str): The unique identifier of the processed file
+            
+        Returns:
+            List[Chunk]: Chunk records in document order
+            
+        Raises:
+            KeyError: If the file_id is not found
+        """
+        if file_id not in self.chunk_records:
+            raise KeyError(f"No processed file found with ID: {file_id}")
+        return self.chunk_records[file_id]
+
+    # PUBLIC_INTERFACE
+    def release_chunks(self, file_id: str) -> None:
+        """
+        Drop the chunk text kept for a file once another store owns it.
+        
+        Args:
+            file_id (str): The unique identifier of the processed file
+        """
+        self.processed_files.pop(file_id, None)
+        self.chunk_records.pop(file_id, None)
@@ -0,0 +1,392 @@
+"""
+On-disk persistence for VectorStore: generation snapshots plus a write-ahead log.
+
+Layout of the storage directory::
+
+    CURRENT                  name of the live snapshot generation
+    snapshot-<gen>/          index.faiss, chunks.npz, text.bin, lexical.npz,
+                             meta.json, and vectors.npy / vector_ids.npy for
+                             float32 re-ranking
+    wal-<gen>.log            mutations applied since snapshot <gen>
+
+A snapshot is written to a fresh generation directory and only becomes live
+when CURRENT is atomically replaced, so a crash mid-snapshot leaves the
+previous generation and its WAL intact. Other processes can open the
+directory read-only and follow CURRENT to new generations. The generation
+before CURRENT is kept until the next snapshot, so a reader that was still
+loading it when CURRENT moved can finish, and files of an older generation a
+reader still has mapped stay readable until it lets go of them.
+"""
+import json
+import os
+import shutil
+import struct
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .chunk_store import ChunkStore, open_arena
+from .lexical_index import BM25Index
+from .vector_archive import VectorArchive
+
+# Record header: payload length, vector bytes length, CRC32 of both
+_RECORD_HEADER = struct.Struct("<IQI")
+
+
+class WriteAheadLog:
+    """
+    Append-only log of store mutations.
+
+    Each record is a JSON payload plus an optional float32 matrix, guarded by
+    a CRC so a torn write at the tail is detected and ignored on replay.
+    """
+
+    def __init__(self, path: str, sync: bool = True):
+        """
+        Open the log for appending.
+
+        Args:
+            path: Log file path
+            sync: fsync after every record (durable against power loss)
+        """
+        self.path = path
+        self.sync = sync
+        self._file = open(path, "ab")
+
+    # PUBLIC_INTERFACE
+    def append(self, payload: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> None:
+        """
+        Durably append one mutation.
+
+        Args:
+            payload: JSON-serializable description of the mutation
+            vectors: Optional float32 matrix attached to the record
+        """
+        body = json.dumps(payload).encode("utf-8")
+        blob = b"" if vectors is None else np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+        crc = zlib.crc32(blob, zlib.crc32(body))
+        self._file.write(_RECORD_HEADER.pack(len(body), len(blob), crc) + body + blob)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    # PUBLIC_INTERFACE
+    @staticmethod
+    def replay(path: str) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        Read back the valid records of a log.
+
+        Args:
+            path: Log file path
+
+        Yields:
+            Tuple[Dict, Optional[bytes]]: The payload and raw vector bytes of each record
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as log:
+            while True:
+                header = log.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                body_len, blob_len, crc = _RECORD_HEADER.unpack(header)
+                body = log.read(body_len)
+                blob = log.read(blob_len)
+                if len(body) < body_len or len(blob) < blob_len or zlib.crc32(blob, zlib.crc32(body)) != crc:
+                    # Torn write from a crash; everything before it is intact
+                    return
+                yield json.loads(body), (blob or None)
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Close the log file."""
+        self._file.close()
+
+
+class StorePersistence:
+    """
+    Reads and writes VectorStore snapshots and owns the active write-ahead log.
+    """
+
+    def __init__(self, directory: str, wal_sync: bool = True, mmap: bool = True,
+                 read_only: bool = False):
+        """
+        Open (or create) a storage directory.
+
+        Args:
+            directory: Directory holding snapshots and logs
+            wal_sync: fsync the WAL after every record
+            mmap: Memory-map the index, flat vector codes included, and the chunk
+                text on load instead of reading them into RAM. A mapped index
+                can't be modified; the store reads it into memory on first write
+            read_only: Open for reading another process's snapshots: no WAL is
+                opened, and snapshots are never written
+        """
+        self.directory = directory
+        self.wal_sync = wal_sync
+        self.mmap = mmap
+        self.read_only = read_only
+        os.makedirs(directory, exist_ok=True)
+        self.generation = self._read_current()
+        self.wal = None if read_only else WriteAheadLog(self._wal_path(self.generation), sync=wal_sync)
+
+    def _read_current(self) -> int:
+        """Return the live generation number, 0 if nothing was ever snapshotted."""
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as current:
+                return int(current.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    # PUBLIC_INTERFACE
+    def current_generation(self) -> int:
+        """
+        Re-read CURRENT, which another process may have advanced.
+
+        Returns:
+            int: The generation that is live on disk now
+        """
+        return self._read_current()
+
+    # PUBLIC_INTERFACE
+    def reopen(self, generation: int) -> "StorePersistence":
+        """
+        Open a read-only view of a given generation of the same directory.
+
+        Args:
+            generation: Generation to load, e.g. from ``current_generation``
+
+        Returns:
+            StorePersistence: A read-only persistence positioned at ``generation``
+        """
+        view = StorePersistence(self.directory, wal_sync=self.wal_sync, mmap=self.mmap, read_only=True)
+        view.generation = generation
+        return view
+
+    def _snapshot_dir(self, generation: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{generation}")
+
+    def _wal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"wal-{generation}.log")
+
+    @property
+    def index_path(self) -> str:
+        """Path of the live snapshot's index file."""
+        return os.path.join(self._snapshot_dir(self.generation), "index.faiss")
+
+    # PUBLIC_INTERFACE
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the live snapshot.
+
+        Returns:
+            Optional[Dict]: ``index``, ``meta``, the ``chunks`` ChunkStore and the
+            ``doc_vector_ids`` mapping, plus ``doc_token_counts``,
+            ``doc_char_spans``, the ``vectors`` archive and the
+            ``lexical_index`` if the snapshot has them, or None if no snapshot
+            exists yet
+        """
+        if self.generation == 0:
+            return None
+        snapshot = self._snapshot_dir(self.generation)
+        with open(os.path.join(snapshot, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        # IO_FLAG_MMAP alone leaves flat and HNSW codes in RAM; _IFC maps them too
+        flags = faiss.IO_FLAG_MMAP_IFC if self.mmap else 0
+        index = faiss.read_index(os.path.join(snapshot, "index.faiss"), flags)
+
+        arrays = np.load(os.path.join(snapshot, "chunks.npz"))
+        vector_ids, doc_numbers, offsets = arrays["vector_ids"], arrays["doc_numbers"], arrays["offsets"]
+        documents = meta["documents"]
+        # Rows are grouped by document in ``documents`` order and, within a
+        # document, by increasing id, so rows and ids increase together
+        bounds = np.searchsorted(doc_numbers, np.arange(len(documents) + 1))
+        text = open_arena(os.path.join(snapshot, "text.bin"), self.mmap)
+        if np.all(np.diff(vector_ids) > 0):
+            chunks = ChunkStore.from_rows(documents, vector_ids, doc_numbers, offsets, text)
+        else:
+            # Older snapshots could list documents out of id order
+            chunks = ChunkStore()
+            for n in np.argsort(vector_ids[bounds[:-1]], kind="stable").tolist():
+                chunks.add(documents[n], int(vector_ids[bounds[n]]),
+                           [bytes(text[offsets[row]:offsets[row + 1]]).decode("utf-8")
+                            for row in range(bounds[n], bounds[n + 1])])
+        state = {
+            "index": index,
+            "meta": meta,
+            "chunks": chunks,
+            "doc_vector_ids": {
+                doc_id: vector_ids[bounds[n]:bounds[n + 1]].astype(np.int64) for n, doc_id in enumerate(documents)
+            },
+        }
+        vectors = self.load_vectors()
+        if vectors is not None:
+            state["vectors"] = vectors
+        lexical_path = os.path.join(snapshot, "lexical.npz")
+        if os.path.exists(lexical_path):
+            lexical = np.load(lexical_path)
+            # Terms never contain a newline, so they are stored newline-joined
+            terms = lexical["terms"].tobytes().decode("utf-8").split("\n") if len(lexical["offsets"]) > 1 else []
+            state["lexical_index"] = BM25Index.from_arrays(terms, lexical["offsets"], lexical["ids"],
+                                                           lexical["frequencies"], lexical["lengths"])
+        if "token_counts" in arrays.files:
+            token_counts = arrays["token_counts"]
+            # Rows are grouped by document in ``documents`` order
+            state["doc_token_counts"] = {
+                doc_id: token_counts[bounds[n]:bounds[n + 1]] for n, doc_id in enumerate(documents)
+            }
+        if "char_spans" in arrays.files:
+            char_spans = arrays["char_spans"]
+            # Documents stored without offsets have rows of -1
+            state["doc_char_spans"] = {
+                doc_id: char_spans[bounds[n]:bounds[n + 1]] for n, doc_id in enumerate(documents)
+                if bounds[n] == bounds[n + 1] or char_spans[bounds[n], 0] >= 0
+            }
+        return state
+
+    # PUBLIC_INTERFACE
+    def load_vectors(self) -> Optional[VectorArchive]:
+        """
+        Open the live snapshot's float32 vector archive, memory-mapped if configured.
+
+        Returns:
+            Optional[VectorArchive]: The archive, or None if the snapshot has none
+        """
+        snapshot = self._snapshot_dir(self.generation)
+        path = os.path.join(snapshot, "vectors.npy")
+        if self.generation == 0 or not os.path.exists(path):
+            return None
+        vectors = np.load(path, mmap_mode="r" if self.mmap else None)
+        return VectorArchive(vectors.shape[1], head=vectors,
+                             head_ids=np.load(os.path.join(snapshot, "vector_ids.npy")))
+
+    # PUBLIC_INTERFACE
+    def replay_wal(self) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+        """
+        Iterate over the mutations logged since the live snapshot.
+
+        Yields:
+            Tuple[Dict, Optional[bytes]]: The payload and raw vector bytes of each record
+        """
+        return WriteAheadLog.replay(self._wal_path(self.generation))
+
+    # PUBLIC_INTERFACE
+    def write_snapshot(self, index: faiss.Index, chunks: ChunkStore, meta: Dict[str, Any],
+                       doc_token_counts: Optional[Dict[str, np.ndarray]] = None,
+                       vectors: Optional[VectorArchive] = None,
+                       doc_char_spans: Optional[Dict[str, np.ndarray]] = None,
+                       lexical_index: Optional[BM25Index] = None) -> None:
+        """
+        Write a new snapshot generation, make it live and start a fresh WAL.
+
+        Args:
+            index: The FAISS index to persist
+            chunks: The chunk store
+            meta: Extra store settings to record (dimension, index type, ...)
+            doc_token_counts: Map of doc_id -> token count of each chunk
+            vectors: Full-precision vectors kept for re-ranking, if any
+            doc_char_spans: Map of doc_id -> (start, end) character offsets of each
+                chunk, for the documents whose offsets are known
+            lexical_index: Keyword index over the chunks, stored so loading
+                doesn't re-tokenize the corpus
+
+        Raises:
+            RuntimeError: If the directory was opened read-only
+        """
+        if self.read_only:
+            raise RuntimeError(f"Storage directory {self.directory} is open read-only")
+        generation = self.generation + 1
+        snapshot = self._snapshot_dir(generation)
+        shutil.rmtree(snapshot, ignore_errors=True)
+        os.makedirs(snapshot)
+
+        faiss.write_index(index, os.path.join(snapshot, "index.faiss"))
+
+        # The text file is the arena itself, so it can be memory-mapped on load
+        documents, vector_ids, doc_numbers, offsets, text = chunks.export()
+        with open(os.path.join(snapshot, "text.bin"), "wb") as text_file:
+            text_file.write(text)
+        arrays = {}
+        if doc_token_counts is not None:
+            arrays["token_counts"] = np.concatenate(
+                [doc_token_counts[doc_id] for doc_id in documents] or [np.empty(0, np.int32)]
+            ).astype(np.int32)
+        if doc_char_spans is not None:
+            # Rows are grouped by document in ``documents`` order; unknown offsets are -1
+            rows = np.bincount(doc_numbers, minlength=len(documents)).tolist()
+            arrays["char_spans"] = np.concatenate(
+                [doc_char_spans.get(doc_id, np.full((count, 2), -1, dtype=np.int64))
+                 for doc_id, count in zip(documents, rows)] or [np.empty((0, 2), np.int64)]
+            ).astype(np.int64)
+        np.savez(
+            os.path.join(snapshot, "chunks.npz"),
+            vector_ids=vector_ids,
+            doc_numbers=doc_numbers,
+            offsets=offsets,
+            **arrays,
+        )
+        if vectors is not None:
+            self._write_vectors(snapshot, vectors)
+        if lexical_index is not None:
+            terms, term_offsets, term_ids, frequencies, lengths = lexical_index.export()
+            np.savez(
+                os.path.join(snapshot, "lexical.npz"),
+                terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=term_offsets,
+                ids=term_ids,
+                frequencies=frequencies,
+                lengths=lengths,
+            )
+        with open(os.path.join(snapshot, "meta.json"), "w") as meta_file:
+            json.dump(dict(meta, documents=documents), meta_file)
+        self._fsync_dir(snapshot)
+
+        # Atomically switch CURRENT, then retire the generation before the previous one
+        current_tmp = os.path.join(self.directory, "CURRENT.tmp")
+        with open(current_tmp, "w") as current:
+            current.write(str(generation))
+            current.flush()
+            os.fsync(current.fileno())
+        os.replace(current_tmp, os.path.join(self.directory, "CURRENT"))
+        self._fsync_dir(self.directory)
+
+        previous = self.generation
+        self.generation = generation
+        self.wal.close()
+        self.wal = WriteAheadLog(self._wal_path(generation), sync=self.wal_sync)
+        # Readers load snapshots only, so the previous WAL can go now
+        if os.path.exists(self._wal_path(previous)):
+            os.remove(self._wal_path(previous))
+        for name in os.listdir(self.directory):
+            prefix, _, number = name.partition("-")
+            if prefix == "snapshot" and number.isdigit() and int(number) < previous:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    @staticmethod
+    def _write_vectors(snapshot: str, vectors: VectorArchive, block: int = 65536) -> None:
+        """Write the archive as an .npy file, in blocks so it is never copied whole into memory."""
+        ids = vectors.ids()
+        np.save(os.path.join(snapshot, "vector_ids.npy"), ids)
+        out = np.lib.format.open_memmap(os.path.join(snapshot, "vectors.npy"), mode="w+",
+                                        dtype=np.float32, shape=(len(ids), vectors.dimension))
+        for start in range(0, len(ids), block):
+            out[start:start + block] = vectors.get(ids[start:start + block])
+        out.flush()
+        del out
+
+    @staticmethod
+    def _fsync_dir(path: str) -> None:
+        """Flush directory entries so renames survive a crash."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Close the active WAL."""
+        if self.wal is not None:
+            self.wal.close()
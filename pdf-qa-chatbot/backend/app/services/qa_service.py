@@ -1,48 +1,441 @@
 """
 Question Answering service that uses OpenAI's API to generate answers based on document context.
 """
+import asyncio
 import os
-from typing import List, Dict
-from openai import OpenAI
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import numpy as np
+import openai
+from fastapi.concurrency import run_in_threadpool
+from .answer_cache import AnswerCache
+from .context_builder import ContextBuilder
+from .lexical_index import is_identifier_query
+from .metrics import TOKENS, stage
+from .openai_client import get_async_client, request_timeout
+from .reranker import Reranker
+from .tokens import DEFAULT_MODEL as CHAT_MODEL, count_tokens
 from .vector_store import VectorStore
 
+MAX_ANSWER_TOKENS = 500
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information to answer your question."
+
 class QAService:
     """
     Handles question answering using OpenAI's API and document context from VectorStore.
     """
     
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore, client: Optional[openai.AsyncOpenAI] = None,
+                 max_concurrent_requests: Optional[int] = None, timeout: Optional[float] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 context_candidates: Optional[int] = None,
+                 batch_concurrency: Optional[int] = None,
+                 reranker: Optional[Reranker] = None):
         """
         Initialize the QA service.
         
         Args:
             vector_store: VectorStore instance for retrieving relevant document chunks
+            client: Async OpenAI client (default: the shared pooled client)
+            max_concurrent_requests: Cap on chat completions in flight
+                (default: OPENAI_MAX_CONCURRENCY or 32)
+            timeout: Seconds before a chat completion times out (default: OPENAI_TIMEOUT or 30)
+            answer_cache: Cache of previous answers to reuse for repeated questions
+                (default: no caching)
+            context_builder: Fits retrieved chunks into the prompt's token budget
+                (default: one for CHAT_MODEL)
+            context_candidates: Chunks retrieved per question when the caller does
+                not limit them (default: CONTEXT_CANDIDATES or 8)
+            batch_concurrency: Chat completions one ``get_answers`` batch may have
+                in flight (default: BATCH_MAX_CONCURRENCY or 8)
+            reranker: Re-orders the top ``reranker.candidates`` search results and
+                keeps the best ``reranker.keep`` (default: search order)
         """
         self.vector_store = vector_store
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = client or get_async_client()
+        self.timeout = timeout or request_timeout()
+        self._semaphore = asyncio.Semaphore(
+            max_concurrent_requests or int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+        )
+        self.answer_cache = answer_cache
+        self.context_builder = context_builder or ContextBuilder(CHAT_MODEL, max_answer_tokens=MAX_ANSWER_TOKENS)
+        self.context_candidates = context_candidates or int(os.getenv("CONTEXT_CANDIDATES", "8"))
+        self.batch_concurrency = batch_concurrency or int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+        self.reranker = reranker
         
     # PUBLIC_INTERFACE
-    def get_answer(self, question: str, max_context_chunks: int = 3) -> Dict:
+    async def get_answer(self, question: str, max_context_chunks: Optional[int] = None,
+                   document_id: Optional[str] = None) -> Dict:
         """
         Generate an answer for the given question using relevant document context.
         
         Args:
             question: The question to answer
-            max_context_chunks: Maximum number of context chunks to use (default: 3)
+            max_context_chunks: Maximum number of chunks to retrieve; the context is
+                then trimmed to the token budget (default: context_candidates)
+            document_id: Only use context from this document (default: all documents)
             
         Returns:
             Dict: Dictionary containing the answer and metadata
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
         """
-        # Get relevant context chunks
-        context_chunks = self.vector_store.search_similar(question, k=max_context_chunks)
+        cached, version, question_embedding = await self._lookup_cache(question, document_id)
+        if cached is not None:
+            return cached
         
+        context_chunks = await self._retrieve_context(question, max_context_chunks, document_id)
+        result = await self._generate_answer(question, context_chunks)
+        self._store_in_cache(question, document_id, version, result, question_embedding)
+        return result
+
+    async def _generate_answer(self, question: str, context_chunks: List[Dict]) -> Dict:
+        """
+        Ask the chat model to answer from the given context.
+        
+        Args:
+            question: The question to answer
+            context_chunks: The passages to answer from
+            
+        Returns:
+            Dict: Dictionary containing the answer and metadata
+        """
         if not context_chunks:
-            return {
-                "answer": "I couldn't find any relevant information to answer your question.",
-                "context_used": [],
-                "confidence": 0.0
-            }
+            return {"answer": NO_CONTEXT_ANSWER, **self._context_metadata(context_chunks)}
+        
+        with stage("prompt"):
+            messages = self._build_messages(question, context_chunks)
+        # Generate answer using OpenAI, capping the requests in flight
+        async with self._semaphore:
+            with stage("completion"):
+                response = await self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=self.context_builder.max_answer_tokens,
+                    timeout=self.timeout
+                )
+        self._record_usage(response)
         
+        # Extract answer from response
+        answer = response.choices[0].message.content.strip()
+        return {"answer": answer, **self._context_metadata(context_chunks)}
+
+    # PUBLIC_INTERFACE
+    async def get_answers(self, questions: List[str], max_context_chunks: Optional[int] = None,
+                          document_id: Optional[str] = None,
+                          max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Answer many questions about the same documents in one batch.
+        
+        The questions are embedded in one request and searched as one matrix
+        query; their chat completions then run concurrently.
+        
+        Args:
+            questions: The questions to answer
+            max_context_chunks: Maximum number of chunks to retrieve per question
+                (default: context_candidates)
+            document_id: Only use context from this document (default: all documents)
+            max_concurrency: Chat completions in flight for this batch
+                (default: batch_concurrency)
+            
+        Returns:
+            List[Dict]: One result per question, in input order. A question whose
+            answer failed gets an ``error`` message instead of an ``answer``.
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
+        """
+        results: List[Optional[Dict]] = [None] * len(questions)
+        async for index, result in self._answer_batch(questions, max_context_chunks, document_id, max_concurrency):
+            results[index] = result
+        return results
+
+    # PUBLIC_INTERFACE
+    async def stream_answers(self, questions: List[str], max_context_chunks: Optional[int] = None,
+                             document_id: Optional[str] = None,
+                             max_concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Answer many questions, yielding each result as soon as it is ready.
+        
+        Args:
+            questions: The questions to answer
+            max_context_chunks: Maximum number of chunks to retrieve per question
+                (default: context_candidates)
+            document_id: Only use context from this document (default: all documents)
+            max_concurrency: Chat completions in flight for this batch
+                (default: batch_concurrency)
+            
+        Yields:
+            Dict: A result as returned by ``get_answers`` plus the ``index`` of its
+            question, in completion order
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
+        """
+        async for index, result in self._answer_batch(questions, max_context_chunks, document_id, max_concurrency):
+            yield {"index": index, **result}
+
+    async def _answer_batch(self, questions: List[str], max_context_chunks: Optional[int],
+                            document_id: Optional[str],
+                            max_concurrency: Optional[int]) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Answer a batch of questions, yielding (index, result) pairs as they finish.
+        
+        Repeated questions are answered once. Cached answers are yielded first;
+        the rest share one embedding request and one index search, and their
+        completions run at most ``max_concurrency`` at a time.
+        """
+        if document_id is not None and not self.vector_store.has_document(document_id):
+            raise KeyError(f"Document not found: {document_id}")
+        
+        # Answer each distinct question once, then fan the result out to its repeats
+        positions: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            positions.setdefault(AnswerCache.normalize(question), []).append(index)
+        distinct = [questions[indices[0]] for indices in positions.values()]
+        repeats = list(positions.values())
+        
+        pending = list(range(len(distinct)))
+        version, embeddings = None, {}
+        if self.answer_cache is not None:
+            version = self.vector_store.document_version(document_id)
+            misses = []
+            for i in pending:
+                cached = self.answer_cache.get_exact(distinct[i], document_id, version)
+                if cached is None:
+                    misses.append(i)
+                    continue
+                for index in repeats[i]:
+                    yield index, cached
+            # Identifier questions only reuse exact matches, as in get_answer
+            semantic = [i for i in misses if not is_identifier_query(distinct[i])]
+            if semantic:
+                matrix = await self.vector_store.agenerate_embeddings_batch([distinct[i] for i in semantic])
+                embeddings = dict(zip(semantic, matrix))
+            pending = []
+            for i in misses:
+                cached = self.answer_cache.get_similar(embeddings[i], document_id, version) if i in embeddings else None
+                if cached is None:
+                    pending.append(i)
+                    continue
+                for index in repeats[i]:
+                    yield index, cached
+        if not pending:
+            return
+        
+        # The query embeddings are cached by now, so this search makes no embedding request
+        k = self._context_limit(max_context_chunks)
+        found = await self.vector_store.asearch_similar_batch(
+            [distinct[i] for i in pending], k=self._search_depth(k),
+            doc_ids=None if document_id is None else [document_id], with_metadata=True
+        )
+        gate = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        
+        async def answer(i: int, found_chunks: List[Dict]) -> Tuple[int, Dict]:
+            async with gate:
+                try:
+                    context_chunks = await self._rerank(distinct[i], found_chunks, k)
+                    context_chunks = self._fit_context(distinct[i], context_chunks, k)
+                    result = await self._generate_answer(distinct[i], context_chunks)
+                except Exception as e:
+                    return i, {"error": str(e)}
+            self._store_in_cache(distinct[i], document_id, version, result, embeddings.get(i))
+            return i, result
+        
+        tasks = [asyncio.ensure_future(answer(i, chunks)) for i, chunks in zip(pending, found)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, result = await next_done
+                for index in repeats[i]:
+                    yield index, result
+        finally:
+            # Stop generating answers nobody will read if the caller goes away
+            for task in tasks:
+                task.cancel()
+
+    # PUBLIC_INTERFACE
+    async def stream_answer(self, question: str, max_context_chunks: Optional[int] = None,
+                            document_id: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Generate an answer as a stream of events, forwarding tokens as they arrive.
+        
+        Yields a ``context`` event with the citations first, then one ``token``
+        event per generated fragment, then a ``done`` event with the full answer.
+        
+        Args:
+            question: The question to answer
+            max_context_chunks: Maximum number of chunks to retrieve; the context is
+                then trimmed to the token budget (default: context_candidates)
+            document_id: Only use context from this document (default: all documents)
+            
+        Yields:
+            Dict: Events with a ``type`` of "context", "token" or "done"
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
+        """
+        cached, version, question_embedding = await self._lookup_cache(question, document_id)
+        if cached is not None:
+            yield {"type": "context", "context_used": cached["context_used"], "confidence": cached["confidence"]}
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"]}
+            return
+        
+        context_chunks = await self._retrieve_context(question, max_context_chunks, document_id)
+        metadata = self._context_metadata(context_chunks)
+        yield {"type": "context", **metadata}
+        if not context_chunks:
+            self._store_in_cache(question, document_id, version,
+                                 {"answer": NO_CONTEXT_ANSWER, **metadata}, question_embedding)
+            yield {"type": "token", "content": NO_CONTEXT_ANSWER}
+            yield {"type": "done", "answer": NO_CONTEXT_ANSWER}
+            return
+        
+        parts = []
+        with stage("prompt"):
+            messages = self._build_messages(question, context_chunks)
+        async with self._semaphore:
+            with stage("completion"):
+                stream = await self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=self.context_builder.max_answer_tokens,
+                    stream=True,
+                    timeout=self.timeout
+                )
+            try:
+                with stage("completion_stream"):
+                    async for event in stream:
+                        if not event.choices:
+                            continue
+                        content = event.choices[0].delta.content
+                        if content:
+                            parts.append(content)
+                            yield {"type": "token", "content": content}
+            finally:
+                # Free the upstream connection if the client went away mid-answer
+                await stream.close()
+        answer = "".join(parts).strip()
+        self._store_in_cache(question, document_id, version, {"answer": answer, **metadata}, question_embedding)
+        yield {"type": "done", "answer": answer}
+
+    async def _lookup_cache(self, question: str, document_id: Optional[str]
+                            ) -> Tuple[Optional[Dict], Optional[int], Optional[np.ndarray]]:
+        """
+        Look for a cached answer, first by exact question, then by similar question.
+        
+        Args:
+            question: The question to answer
+            document_id: The document the question is about (None for all documents)
+            
+        Returns:
+            Tuple: The cached answer (or None), the document version the lookup
+            was made against, and the question embedding if one was computed
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
+        """
+        if self.answer_cache is None:
+            return None, None, None
+        version = self.vector_store.document_version(document_id)
+        if document_id is not None and version is None:
+            raise KeyError(f"Document not found: {document_id}")
+        
+        cached = self.answer_cache.get_exact(question, document_id, version)
+        if cached is not None or is_identifier_query(question):
+            # "clause 4.2" and "clause 4.3" embed almost identically, so identifier
+            # lookups only ever reuse answers to the exact same question
+            return cached, version, None
+        # The embedding is cached by the store, so the context search reuses it
+        question_embedding = await self.vector_store.agenerate_embeddings(question)
+        return self.answer_cache.get_similar(question_embedding, document_id, version), version, question_embedding
+
+    def _store_in_cache(self, question: str, document_id: Optional[str], version: Optional[int],
+                        result: Dict, question_embedding: Optional[np.ndarray]) -> None:
+        """Cache a freshly generated answer, if caching is enabled."""
+        if self.answer_cache is not None:
+            self.answer_cache.put(question, document_id, version, result, question_embedding)
+
+    async def _retrieve_context(self, question: str, max_context_chunks: Optional[int],
+                                document_id: Optional[str]) -> List[Dict]:
+        """
+        Find the chunks most relevant to the question and fit them to the token budget.
+        
+        Args:
+            question: The question to answer
+            max_context_chunks: Maximum number of chunks to retrieve (default: context_candidates,
+                or the reranker's keep)
+            document_id: Only search this document (default: all documents)
+            
+        Returns:
+            List[Dict]: Context passages with their doc_id and distance, most relevant first
+            
+        Raises:
+            KeyError: If document_id is given but the document is not indexed
+        """
+        k = self._context_limit(max_context_chunks)
+        depth = self._search_depth(k)
+        # Get relevant context chunks, scoped to the requested document if any
+        if document_id is None:
+            context_chunks = await self.vector_store.asearch_similar(question, k=depth, with_metadata=True)
+        else:
+            if not self.vector_store.has_document(document_id):
+                raise KeyError(f"Document not found: {document_id}")
+            context_chunks = await self.vector_store.asearch_similar(
+                question, k=depth, doc_ids=[document_id], with_metadata=True
+            )
+        context_chunks = await self._rerank(question, context_chunks, k)
+        return self._fit_context(question, context_chunks, k)
+
+    def _context_limit(self, max_context_chunks: Optional[int]) -> int:
+        """Chunks one question's context may hold."""
+        if max_context_chunks:
+            return max_context_chunks
+        return self.reranker.keep if self.reranker is not None else self.context_candidates
+
+    def _search_depth(self, k: int) -> int:
+        """Search results to fetch for a context of ``k`` chunks; more when they are re-ranked."""
+        return max(k, self.reranker.candidates) if self.reranker is not None else k
+
+    async def _rerank(self, question: str, context_chunks: List[Dict], k: int) -> List[Dict]:
+        """Keep the ``k`` search results the reranker scores best, if there is one."""
+        if self.reranker is None:
+            return context_chunks
+        return await run_in_threadpool(self.reranker.rerank, question, context_chunks, k)
+
+    def _fit_context(self, question: str, context_chunks: List[Dict], k: int) -> List[Dict]:
+        """Trim the top ``k`` search results to the prompt's context token budget."""
+        with stage("prompt"):
+            prompt_tokens = sum(count_tokens(message["content"], CHAT_MODEL)
+                                for message in self._build_messages(question, []))
+            return self.context_builder.build(context_chunks[:k], self.context_builder.budget(prompt_tokens))
+
+    @staticmethod
+    def _record_usage(response) -> None:
+        """Observe a completion's token usage, when the API reported it."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if isinstance(tokens, int):
+                TOKENS.observe(tokens, kind=kind)
+
+    @staticmethod
+    def _build_messages(question: str, context_chunks: List[Dict]) -> List[Dict]:
+        """
+        Build the chat messages asking the model to answer from the context.
+        
+        Args:
+            question: The question to answer
+            context_chunks: The chunks to answer from
+            
+        Returns:
+            List[Dict]: System and user messages for the chat completion
+        """
         # Prepare context for the prompt
         context_text = "\n\n".join([chunk["chunk"] for chunk in context_chunks])
         
@@ -55,23 +448,28 @@ Context:
 Question: {question}
 
 Answer:"""
+        return [
+            {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context. Be concise and accurate."},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _context_metadata(context_chunks: List[Dict]) -> Dict:
+        """
+        Describe the context an answer was based on.
         
-        # Generate answer using OpenAI
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context. Be concise and accurate."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        # Extract answer from response
-        answer = response.choices[0].message.content.strip()
-        
+        Args:
+            context_chunks: The chunks used as context
+            
+        Returns:
+            Dict: ``context_used`` citations and a ``confidence`` score
+        """
+        if not context_chunks:
+            return {"context_used": [], "confidence": 0.0}
+        distances = [chunk["distance"] for chunk in context_chunks if chunk["distance"] is not None]
         return {
-            "answer": answer,
             "context_used": [{"text": chunk["chunk"], "doc_id": chunk["doc_id"]} for chunk in context_chunks],
-            "confidence": 1.0 - min([chunk["distance"] for chunk in context_chunks]) / 2  # Simple confidence score based on vector similarity
-        }
\ No newline at end of file
+            # Simple confidence score based on vector similarity; keyword-only
+            # matches (no distance) hit the query's exact terms
+            "confidence": 1.0 - min(distances) / 2 if distances else 1.0
+        }
@@ -0,0 +1,298 @@
+"""
+Cross-encoder re-ranking of retrieved chunks, within a latency budget.
+
+Vector search ranks chunks by embedding distance, which is cheap but coarse.
+A cross-encoder reads the question and a chunk together and scores how well
+the chunk answers it, so the QA service can over-fetch candidates, re-rank
+them and send only the best few to the chat model.
+
+Scoring runs in batches. When the budget runs out before every candidate is
+scored, the candidates keep their search order, so a slow scorer never
+delays an answer by more than the budget plus one batch. Scores are cached
+per (question, chunk) pair, including those of a re-ranking that ran out of
+time, so repeated questions get cheaper.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .metrics import stage
+
+
+class RerankScorer:
+    """
+    Interface for models scoring how relevant passages are to a query.
+
+    Subclasses set ``model_name`` and ``batch_size`` and implement ``score``.
+    """
+
+    model_name: str = ""
+    # Pairs scored per call
+    batch_size: int = 16
+
+    # PUBLIC_INTERFACE
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Score passages against a query.
+
+        Args:
+            query: The question
+            texts: The passages, at most ``batch_size`` of them
+
+        Returns:
+            numpy.ndarray: One float score per passage, higher is more relevant
+        """
+        raise NotImplementedError
+
+
+class CrossEncoderScorer(RerankScorer):
+    """
+    A sentence-transformers cross-encoder running batched on CPU.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 16,
+                 max_length: int = 512, num_threads: Optional[int] = None, device: str = "cpu"):
+        """
+        Load the model.
+
+        Args:
+            model_name: sentence-transformers cross-encoder name or local path
+            batch_size: Pairs per forward pass
+            max_length: Tokens of each (query, passage) pair the model reads
+            num_threads: torch intra-op thread count (default: torch's choice)
+            device: Device to run inference on
+        """
+        import torch
+        from sentence_transformers import CrossEncoder
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, max_length=max_length, device=device)
+
+    # PUBLIC_INTERFACE
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Score passages against a query in one forward pass.
+
+        Args:
+            query: The question
+            texts: The passages
+
+        Returns:
+            numpy.ndarray: One relevance logit per passage
+        """
+        scores = self.model.predict([(query, text) for text in texts], batch_size=self.batch_size,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32).reshape(len(texts))
+
+
+class FakeRerankScorer(RerankScorer):
+    """
+    Deterministic offline scorer for tests and benchmarks.
+
+    Scores a passage by the share of the query's words it contains. Optional
+    sleeps simulate the cost of a model.
+    """
+
+    def __init__(self, batch_size: int = 16, latency: float = 0.0, per_pair_latency: float = 0.0,
+                 model_name: str = "fake-reranker"):
+        """
+        Args:
+            batch_size: Pairs scored per call
+            latency: Seconds to sleep per call
+            per_pair_latency: Additional seconds to sleep per pair
+            model_name: Name reported to callers
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.latency = latency
+        self.per_pair_latency = per_pair_latency
+        self.calls = 0
+
+    # PUBLIC_INTERFACE
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Score passages by word overlap with the query.
+
+        Args:
+            query: The question
+            texts: The passages
+
+        Returns:
+            numpy.ndarray: The share of query words found in each passage
+        """
+        self.calls += 1
+        delay = self.latency + self.per_pair_latency * len(texts)
+        if delay > 0:
+            time.sleep(delay)
+        words = set(query.lower().split())
+        return np.array([len(words & set(text.lower().split())) / max(1, len(words)) for text in texts],
+                        dtype=np.float32)
+
+
+class Reranker:
+    """
+    Re-orders search results by cross-encoder score within a latency budget.
+    """
+
+    def __init__(self, scorer: RerankScorer, candidates: Optional[int] = None, keep: Optional[int] = None,
+                 budget: Optional[float] = None, cache_size: Optional[int] = None):
+        """
+        Args:
+            scorer: Model scoring (question, chunk) pairs
+            candidates: Search results to re-rank per question (default: RERANK_CANDIDATES or 20)
+            keep: Best chunks kept after re-ranking (default: RERANK_KEEP or 4)
+            budget: Seconds re-ranking one question may take before falling back
+                to search order (default: RERANK_BUDGET_MS or 150 ms)
+            cache_size: (question, chunk) scores kept (default: RERANK_CACHE_SIZE or 50000)
+        """
+        self.scorer = scorer
+        self.candidates = candidates or int(os.getenv("RERANK_CANDIDATES", "20"))
+        self.keep = keep or int(os.getenv("RERANK_KEEP", "4"))
+        self.budget = budget if budget is not None else float(os.getenv("RERANK_BUDGET_MS", "150")) / 1000
+        self.cache_size = cache_size if cache_size is not None else int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+        self._scores: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of the seconds one pair takes to score
+        self._pair_seconds: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def _key(self, query: str, text: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (self.scorer.model_name, query, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.digest()
+
+    # PUBLIC_INTERFACE
+    def rerank(self, query: str, chunks: List[Dict], keep: Optional[int] = None) -> List[Dict]:
+        """
+        Re-order search results by relevance to the query and keep the best.
+
+        Args:
+            query: The question
+            chunks: Search results, best first, each with the ``chunk`` text
+            keep: Results to return (default: the reranker's ``keep``)
+
+        Returns:
+            List[Dict]: The best results, each with a ``rerank_score``, most
+            relevant first; or the first results in search order, without
+            scores, if the budget ran out
+        """
+        keep = keep or self.keep
+        if len(chunks) <= 1:
+            return chunks[:keep]
+        with stage("rerank"):
+            scores = self._score(query, [chunk["chunk"] for chunk in chunks])
+        if scores is None:
+            return chunks[:keep]
+        # Stable, so equally scored chunks keep their search order
+        order = sorted(range(len(chunks)), key=lambda i: -scores[i])[:keep]
+        return [dict(chunks[i], rerank_score=scores[i]) for i in order]
+
+    def _score(self, query: str, texts: List[str]) -> Optional[List[float]]:
+        """Score every text, from the cache where possible; None if the budget runs out first."""
+        start = time.perf_counter()
+        keys = [self._key(query, text) for text in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    scores[i] = score
+            missing = [i for i, score in enumerate(scores) if score is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        batch_size = self.scorer.batch_size
+        for first in range(0, len(missing), batch_size):
+            batch = missing[first:first + batch_size]
+            elapsed = time.perf_counter() - start
+            # Stop when the next batch would not finish in time; the first always runs
+            if first and elapsed + len(batch) * self._pair_seconds > self.budget:
+                return self._fall_back()
+            batch_start = time.perf_counter()
+            fresh = self.scorer.score(query, [texts[i] for i in batch])
+            per_pair = (time.perf_counter() - batch_start) / len(batch)
+            self._pair_seconds = per_pair if self._pair_seconds is None else 0.8 * self._pair_seconds + 0.2 * per_pair
+            with self._lock:
+                for i, score in zip(batch, fresh.tolist()):
+                    scores[i] = score
+                    self._remember(keys[i], score)
+        # Once every text is scored the ranking is used, even if the last batch ran late
+        return scores
+
+    def _remember(self, key: bytes, score: float) -> None:
+        """Cache one score, evicting the least recently used. Caller holds the lock."""
+        if self.cache_size <= 0:
+            return
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.cache_size:
+            self._scores.popitem(last=False)
+
+    def _fall_back(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    # PUBLIC_INTERFACE
+    def stats(self) -> Dict[str, float]:
+        """
+        Report score cache effectiveness and budget overruns.
+
+        Returns:
+            Dict[str, float]: Cache hits, misses, hit rate, cached scores and
+            re-rankings that fell back to search order
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "items": len(self._scores),
+                "fallbacks": self.fallbacks,
+            }
+
+
+# PUBLIC_INTERFACE
+def create_reranker(kind: Optional[str] = None) -> Optional[Reranker]:
+    """
+    Build the reranker selected by the environment.
+
+    Reads RERANKER ("none", "cross-encoder" or "fake"), RERANK_MODEL,
+    RERANK_BATCH_SIZE and RERANK_THREADS, plus the Reranker settings.
+
+    Args:
+        kind: Reranker to build, overriding RERANKER
+
+    Returns:
+        Optional[Reranker]: The reranker, or None when re-ranking is off
+
+    Raises:
+        ValueError: If the reranker name is unknown
+    """
+    kind = (kind or os.getenv("RERANKER", "none")).lower()
+    if kind == "none":
+        return None
+    batch_size = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    if kind == "cross-encoder":
+        model_name = os.getenv("RERANK_MODEL")
+        threads = os.getenv("RERANK_THREADS")
+        return Reranker(CrossEncoderScorer(**({"model_name": model_name} if model_name else {}),
+                                           batch_size=batch_size,
+                                           num_threads=int(threads) if threads else None))
+    if kind == "fake":
+        return Reranker(FakeRerankScorer(batch_size=batch_size))
+    raise ValueError(f"Unknown reranker: {kind}")
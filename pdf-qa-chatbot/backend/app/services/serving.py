@@ -0,0 +1,499 @@
+"""
+Multi-process serving: one writer process owns ingestion, the rest serve reads.
+
+With SERVING_MODE=shared, every uvicorn worker opens the same
+VECTOR_STORE_DIR. The first to take ``writer.lock`` becomes the writer: it
+runs the ingestion queue and publishes its changes as snapshot generations.
+Every other worker is a reader. It memory-maps the live generation
+read-only, so all readers on the machine share one copy of the index and
+chunk text in the page cache, and a watcher thread swaps in each new
+generation as it appears. If the writer exits, the next worker process to
+start (uvicorn replaces dead workers) takes the lock over.
+
+Uploads reach the writer through files in the storage directory, so any
+worker can accept them::
+
+    writer.lock              held by the writer process
+    inbox/<job_id>.pdf       an upload waiting for the writer
+    inbox/<job_id>.json      its ticket: document id, filename, content hash
+    jobs/<job_id>.json       job status, published by the writer for all workers
+
+Run it with, for example::
+
+    SERVING_MODE=shared VECTOR_STORE_DIR=/data/store uvicorn app.main:app --workers 4
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ingestion import IngestionJob, IngestionQueue, IngestionQueueFullError
+from .vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+SERVING_MODES = ("single", "shared")
+
+
+# PUBLIC_INTERFACE
+def serving_mode() -> str:
+    """
+    The configured serving mode.
+
+    Returns:
+        str: SERVING_MODE, "single" (one process holds everything) or
+        "shared" (one writer and any number of reader processes)
+
+    Raises:
+        ValueError: If SERVING_MODE is not a known mode
+    """
+    mode = os.getenv("SERVING_MODE", "single").lower()
+    if mode not in SERVING_MODES:
+        raise ValueError(f"Unknown serving mode: {mode} (expected single or shared)")
+    return mode
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Write a JSON file atomically, so other processes never read half of it."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as out:
+        json.dump(data, out)
+    os.replace(tmp, path)
+
+
+class WriterLock:
+    """
+    Exclusive lock electing the writer among processes sharing a storage directory.
+
+    The lock is an ``flock`` on a file, so the kernel releases it when the
+    holding process exits, however it exits.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: The shared storage directory
+        """
+        self.path = os.path.join(directory, "writer.lock")
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        """Whether this process holds the lock."""
+        return self._fd is not None
+
+    # PUBLIC_INTERFACE
+    def acquire(self) -> bool:
+        """
+        Try to take the lock without waiting.
+
+        Returns:
+            bool: True if this process now holds the lock
+        """
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    # PUBLIC_INTERFACE
+    def release(self) -> None:
+        """Give up the lock if this process holds it."""
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class GenerationWatcher:
+    """
+    Background thread keeping a read-only VectorStore on the newest generation.
+    """
+
+    def __init__(self, vector_store: VectorStore, interval: Optional[float] = None):
+        """
+        Args:
+            vector_store: A read-only store
+            interval: Seconds between checks for a new generation (default: REFRESH_INTERVAL or 0.5)
+        """
+        self.vector_store = vector_store
+        self.interval = interval or float(os.getenv("REFRESH_INTERVAL", "0.5"))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # PUBLIC_INTERFACE
+    def start(self) -> None:
+        """Start polling."""
+        self._thread = threading.Thread(target=self._run, name="generation-watcher", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.vector_store.refresh()
+            except Exception as e:
+                # Typically the generation was retired while loading; the next poll loads its successor
+                logger.warning("Failed to load the new store generation: %s", e)
+
+    # PUBLIC_INTERFACE
+    def stop(self) -> None:
+        """Stop polling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class IngestionInbox:
+    """
+    Upload handoff from any worker to the writer, with job status shared through files.
+
+    It offers the ``submit`` / ``get`` interface of IngestionQueue, so the
+    upload and job routes work unchanged in every worker.
+    """
+
+    def __init__(self, directory: str, vector_store: VectorStore, max_pending: Optional[int] = None,
+                 job_retention: Optional[float] = None):
+        """
+        Args:
+            directory: The shared storage directory
+            vector_store: This worker's store, used to spot uploads that are already indexed
+            max_pending: Uploads allowed to wait for the writer (default: INGEST_QUEUE_SIZE or 32)
+            job_retention: Seconds a finished job's status is kept (default: JOB_RETENTION or 3600)
+        """
+        self.vector_store = vector_store
+        self.inbox_dir = os.path.join(directory, "inbox")
+        self.jobs_dir = os.path.join(directory, "jobs")
+        self.max_pending = max_pending or int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+        self.job_retention = job_retention or float(os.getenv("JOB_RETENTION", "3600"))
+        os.makedirs(self.inbox_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    # PUBLIC_INTERFACE
+    def submit(self, path: str, filename: str, document_id: Optional[str] = None,
+               content_hash: Optional[str] = None) -> IngestionJob:
+        """
+        Hand a saved upload to the writer.
+
+        The inbox takes ownership of the file at ``path``. An upload whose
+        content this worker already has indexed gets a completed job at once.
+
+        Args:
+            path: Temporary file holding the PDF
+            filename: Original name of the uploaded file
+            document_id: Id to index the document under (default: a new UUID)
+            content_hash: SHA-256 hex digest of the file, used to detect duplicates
+
+        Returns:
+            IngestionJob: The queued job, or a completed one for an indexed duplicate
+
+        Raises:
+            IngestionQueueFullError: If too many uploads are waiting for the writer
+        """
+        if content_hash is not None:
+            existing = self.vector_store.find_by_content_hash(content_hash)
+            if existing is not None:
+                os.remove(path)
+                job = IngestionJob(existing, filename, "", content_hash)
+                job.complete_as_duplicate()
+                self.publish(job)
+                return job
+        if self.pending() >= self.max_pending:
+            raise IngestionQueueFullError(f"Ingestion inbox is full ({self.max_pending} uploads waiting)")
+
+        job_id = str(uuid.uuid4())
+        pdf_path = os.path.join(self.inbox_dir, f"{job_id}.pdf")
+        job = IngestionJob(document_id or str(uuid.uuid4()), filename, pdf_path, content_hash, job_id)
+        shutil.move(path, pdf_path)
+        self.publish(job)
+        # The ticket goes last: the writer only picks up uploads that have one
+        _write_json(os.path.join(self.inbox_dir, f"{job_id}.json"), {
+            "job_id": job_id, "document_id": job.document_id, "filename": filename,
+            "content_hash": content_hash,
+        })
+        return job
+
+    # PUBLIC_INTERFACE
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Look up a job's published status.
+
+        A job the writer reports as completed is only reported completed
+        here once this worker's store has loaded the document.
+
+        Args:
+            job_id: The job id returned by submit
+
+        Returns:
+            Optional[IngestionJob]: The job, or None if it is unknown or expired
+        """
+        try:
+            with open(os.path.join(self.jobs_dir, f"{os.path.basename(job_id)}.json")) as status:
+                job = IngestionJob.from_dict(json.load(status))
+        except (FileNotFoundError, ValueError):
+            return None
+        if job.status == "completed" and not job.duplicate and self.vector_store.read_only:
+            if not self.vector_store.has_document(job.document_id):
+                self.vector_store.refresh()
+            if not self.vector_store.has_document(job.document_id):
+                job.status = "running"
+                job.stages["index"]["status"] = "running"
+        return job
+
+    # PUBLIC_INTERFACE
+    def pending(self) -> int:
+        """Number of uploads waiting for, or being ingested by, the writer."""
+        return len(self.tickets())
+
+    # PUBLIC_INTERFACE
+    def tickets(self) -> List[Dict[str, Any]]:
+        """
+        Uploads in the inbox, oldest first.
+
+        Returns:
+            List[Dict]: Each upload's ticket plus the ``path`` of its PDF
+        """
+        tickets = []
+        for name in os.listdir(self.inbox_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.inbox_dir, name)
+            try:
+                submitted_at = os.path.getmtime(path)
+                with open(path) as ticket_file:
+                    ticket = json.load(ticket_file)
+            except (FileNotFoundError, ValueError):
+                continue
+            ticket["path"] = os.path.join(self.inbox_dir, f"{ticket['job_id']}.pdf")
+            tickets.append((submitted_at, ticket))
+        return [ticket for _, ticket in sorted(tickets, key=lambda item: item[0])]
+
+    # PUBLIC_INTERFACE
+    def close_ticket(self, job_id: str) -> None:
+        """
+        Remove a handled upload's ticket.
+
+        Args:
+            job_id: The upload's job id
+        """
+        try:
+            os.remove(os.path.join(self.inbox_dir, f"{job_id}.json"))
+        except FileNotFoundError:
+            pass
+
+    # PUBLIC_INTERFACE
+    def publish(self, job: IngestionJob, job_id: Optional[str] = None) -> None:
+        """
+        Make a job's status visible to every worker.
+
+        Args:
+            job: The job
+            job_id: Id to publish it under (default: the job's own), for an
+                upload the writer merged into another job with the same content
+        """
+        data = job.to_dict()
+        data["job_id"] = job_id or job.job_id
+        _write_json(os.path.join(self.jobs_dir, f"{data['job_id']}.json"), data)
+
+    # PUBLIC_INTERFACE
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Delete status files of jobs that finished more than job_retention seconds ago.
+
+        Args:
+            now: Current time as a UNIX timestamp (default: time.time())
+
+        Returns:
+            int: Number of status files deleted
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.job_retention:
+                    with open(path) as status:
+                        finished = json.load(status)["finished_at"] is not None
+                    if finished:
+                        os.remove(path)
+                        removed += 1
+            except (FileNotFoundError, ValueError):
+                continue
+        return removed
+
+
+class InboxPump:
+    """
+    The writer's loop: feed inbox uploads to the ingestion queue, publish
+    snapshot generations and job status, and evict expired documents.
+    """
+
+    def __init__(self, inbox: IngestionInbox, ingestion_queue: IngestionQueue,
+                 interval: float = 0.2, publish_interval: Optional[float] = None):
+        """
+        Args:
+            inbox: The shared inbox
+            ingestion_queue: The writer's ingestion queue
+            interval: Seconds between inbox scans
+            publish_interval: Seconds between snapshot generations while
+                documents are changing (default: PUBLISH_INTERVAL or 1)
+        """
+        self.inbox = inbox
+        self.ingestion_queue = ingestion_queue
+        self.vector_store = ingestion_queue.vector_store
+        self.interval = interval
+        self.publish_interval = publish_interval or float(os.getenv("PUBLISH_INTERVAL", "1"))
+        # Map of inbox job id -> the queue's job for that upload
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._last_publish = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # PUBLIC_INTERFACE
+    def start(self) -> None:
+        """Start the loop in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="inbox-pump", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.pump()
+            except Exception as e:
+                logger.warning("Ingestion inbox pump failed: %s", e)
+            self._stop.wait(self.interval)
+
+    # PUBLIC_INTERFACE
+    def pump(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Run one round of the loop.
+
+        Finished jobs are published only after a snapshot containing their
+        document is live, so no worker reports a job completed before it can
+        answer questions about the document.
+
+        Args:
+            now: Current time as a UNIX timestamp (default: time.time())
+
+        Returns:
+            Tuple[int, int]: Uploads submitted and finished jobs published this round
+        """
+        now = time.time() if now is None else now
+        submitted = 0
+        for ticket in self.inbox.tickets():
+            if ticket["job_id"] in self._jobs:
+                continue
+            try:
+                job = self.ingestion_queue.submit(ticket["path"], ticket["filename"],
+                                                  document_id=ticket["document_id"],
+                                                  content_hash=ticket["content_hash"],
+                                                  job_id=ticket["job_id"])
+            except IngestionQueueFullError:
+                break
+            self._jobs[ticket["job_id"]] = job
+            submitted += 1
+
+        self.vector_store.evict_expired(now)
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        changes = self.vector_store.changes_since_snapshot
+        if changes and (finished or now - self._last_publish >= self.publish_interval):
+            self.vector_store.save_snapshot()
+            self._last_publish = now
+
+        for job_id, job in self._jobs.items():
+            if job_id not in finished:
+                self.inbox.publish(job, job_id)
+        for job_id in finished:
+            self.inbox.publish(self._jobs.pop(job_id), job_id)
+            self.inbox.close_ticket(job_id)
+        self.inbox.prune(now)
+        return submitted, len(finished)
+
+    # PUBLIC_INTERFACE
+    def stop(self) -> None:
+        """Stop the loop and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class SharedServing:
+    """
+    This process's role in shared serving, and the services that go with it.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: The shared storage directory (default: VECTOR_STORE_DIR)
+
+        Raises:
+            ValueError: If no storage directory is configured
+        """
+        self.directory = directory or os.getenv("VECTOR_STORE_DIR")
+        if not self.directory:
+            raise ValueError("SERVING_MODE=shared needs VECTOR_STORE_DIR to point at a shared directory")
+        self.lock = WriterLock(self.directory)
+        self.is_writer = self.lock.acquire()
+        self._background: List[Any] = []
+
+    # PUBLIC_INTERFACE
+    def create_vector_store(self) -> VectorStore:
+        """
+        Open the store in this process's role: writable for the writer, read-only for readers.
+
+        Returns:
+            VectorStore: The store; a reader's is kept current by a GenerationWatcher
+        """
+        if self.is_writer:
+            # Generations are published by the inbox pump, not per logged document
+            return VectorStore(storage_dir=self.directory, snapshot_interval=0)
+        vector_store = VectorStore(storage_dir=self.directory, read_only=True)
+        watcher = GenerationWatcher(vector_store)
+        watcher.start()
+        self._background.append(watcher)
+        return vector_store
+
+    # PUBLIC_INTERFACE
+    def create_inbox(self, vector_store: VectorStore,
+                     ingestion_queue: Optional[IngestionQueue] = None) -> IngestionInbox:
+        """
+        Open the upload inbox, and in the writer start pumping it into the ingestion queue.
+
+        Args:
+            vector_store: This process's store
+            ingestion_queue: The writer's ingestion queue (ignored in readers)
+
+        Returns:
+            IngestionInbox: The inbox every worker submits uploads to
+        """
+        inbox = IngestionInbox(self.directory, vector_store)
+        if self.is_writer and ingestion_queue is not None:
+            pump = InboxPump(inbox, ingestion_queue)
+            pump.start()
+            self._background.append(pump)
+        return inbox
+
+    # PUBLIC_INTERFACE
+    def stop(self) -> None:
+        """Stop the inbox pump or generation watcher."""
+        for worker in self._background:
+            worker.stop()
+        self._background = []
+
+    # PUBLIC_INTERFACE
+    def release(self) -> None:
+        """Give up the writer role, once nothing more will be written."""
+        self.lock.release()
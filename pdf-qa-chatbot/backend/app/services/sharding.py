@@ -0,0 +1,663 @@
+"""
+Sharded vector storage: documents partitioned across shard processes or nodes.
+
+Each shard is an ordinary VectorStore running in its own process, reached
+over an authenticated ``multiprocessing.connection`` socket, so shards can
+be local processes or processes on other machines. ShardedVectorStore is the
+router in front of them. It embeds chunks and queries itself, places each
+document on the shard its id hashes to, sends document-scoped searches only
+to the owning shards, and scatters other searches to every shard in parallel
+before merging their top-k. Hybrid searches merge the shards' vector and
+keyword candidates separately and fuse the merged lists, scoring keywords with
+BM25 statistics summed over the shards, so results match a single store's.
+
+A shard node on another machine is started with::
+
+    SHARD_AUTHKEY=secret python -m app.services.sharding --host 0.0.0.0 --port 7001 --storage-dir /data/shard
+
+and the API pointed at the nodes with VECTOR_SHARDS=node1:7001,node2:7001.
+VECTOR_SHARDS=4 instead starts four local shard processes.
+
+The number of shards is fixed once documents are placed: changing it moves
+documents to other shards, which this module does not do.
+"""
+import argparse
+import hashlib
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Connection, Listener, answer_challenge, deliver_challenge
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .embedding_pipeline import EmbeddingPipeline
+from .embeddings import EmbeddingBackend, create_embedding_backend
+from .lexical_index import combine_statistics, reciprocal_rank_fusion
+from .metrics import stage
+from .vector_store import VectorStore
+
+# VectorStore methods a shard serves; nothing else can be called remotely
+SHARD_METHODS = frozenset({
+    "add_document", "delete_document", "has_document", "document_version", "find_by_content_hash",
+    "indexed_embeddings", "search_batch_by_embedding", "search_hybrid_candidates", "search_lexical",
+    "lexical_statistics", "evict_expired", "save_snapshot", "compact", "stats",
+})
+
+
+class ShardError(RuntimeError):
+    """Raised when a shard fails a call with an error that has no local equivalent."""
+
+
+# PUBLIC_INTERFACE
+def shard_for(doc_id: str, num_shards: int) -> int:
+    """
+    The shard that owns a document.
+
+    Args:
+        doc_id: Document id
+        num_shards: Number of shards
+
+    Returns:
+        int: Shard number in [0, num_shards)
+    """
+    digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+class ShardEmbeddings(EmbeddingBackend):
+    """
+    Stand-in backend for shard stores, whose vectors all arrive from the router.
+    """
+
+    def __init__(self, dimension: int, model_name: str):
+        self.dimension = dimension
+        self.model_name = model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise RuntimeError("Shards do not embed text; the router sends vectors")
+
+
+class Shard:
+    """
+    A handle for calling one shard's VectorStore methods.
+    """
+
+    # PUBLIC_INTERFACE
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """
+        Call a VectorStore method on the shard.
+
+        Args:
+            method: Name of a method in SHARD_METHODS
+            *args: Positional arguments
+            **kwargs: Keyword arguments
+
+        Returns:
+            Any: The method's return value
+        """
+        raise NotImplementedError
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Release the handle."""
+
+
+class LocalShard(Shard):
+    """
+    A shard held in this process, for tests and single-process setups.
+    """
+
+    def __init__(self, store: VectorStore):
+        """
+        Args:
+            store: The shard's store
+        """
+        self.store = store
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        if method not in SHARD_METHODS:
+            raise ValueError(f"Not a shard method: {method}")
+        return getattr(self.store, method)(*args, **kwargs)
+
+
+class RemoteShard(Shard):
+    """
+    A shard served by ``serve_shard`` in another process, possibly on another machine.
+
+    Calls from different threads run concurrently over a small pool of
+    connections, opened as they are needed.
+    """
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, max_connections: int = 8):
+        """
+        Args:
+            address: (host, port) the shard listens on
+            authkey: Shared secret the shard was started with
+            max_connections: Connections kept open for concurrent calls
+        """
+        self.address = tuple(address)
+        self.authkey = authkey
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = Client(self.address, authkey=self.authkey)
+            try:
+                connection.send((method, args, kwargs))
+                status, result = connection.recv()
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.put(connection)
+        if status == "ok":
+            return result
+        error_type, message = result
+        # Errors callers handle (unknown document, bad input) keep their type
+        raise {"KeyError": KeyError, "ValueError": ValueError}.get(error_type, ShardError)(message)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# PUBLIC_INTERFACE
+def serve_shard(store: VectorStore, address: Tuple[str, int], authkey: bytes,
+                on_ready: Optional[Callable[[Tuple[str, int]], None]] = None) -> None:
+    """
+    Serve a store's SHARD_METHODS to RemoteShard clients until asked to stop.
+
+    Each connection is authenticated and handled in its own thread, so a
+    client that fails or stalls the handshake never holds up the others, and
+    the store's own lock keeps concurrent calls consistent.
+
+    Args:
+        store: The shard's store
+        address: (host, port) to listen on; port 0 picks a free port
+        authkey: Secret clients must present
+        on_ready: Called with the bound address once connections are accepted
+    """
+    # The default backlog of one stalls clients connecting at the same time.
+    # The handshake runs per connection below, not inside accept()
+    listener = Listener(address, backlog=64)
+    if on_ready is not None:
+        on_ready(listener.address)
+    stopping = threading.Event()
+
+    def handle(connection: Connection) -> None:
+        with connection:
+            try:
+                deliver_challenge(connection, authkey)
+                answer_challenge(connection, authkey)
+            except (multiprocessing.AuthenticationError, EOFError, OSError):
+                # A wrong key, or a peer that went away mid-handshake
+                return
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if method == "stop":
+                    stopping.set()
+                    connection.send(("ok", None))
+                    # Wake the accept loop so it sees the flag
+                    Client(listener.address, authkey=authkey).close()
+                    return
+                try:
+                    if method not in SHARD_METHODS:
+                        raise ValueError(f"Not a shard method: {method}")
+                    reply = ("ok", getattr(store, method)(*args, **kwargs))
+                except Exception as e:
+                    reply = ("error", (type(e).__name__, str(e.args[0]) if e.args else str(e)))
+                connection.send(reply)
+
+    with listener:
+        while not stopping.is_set():
+            try:
+                connection = listener.accept()
+            except OSError:
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+    if store.persistence is not None:
+        store.persistence.close()
+
+
+def _shard_store(dimension: int, model_name: str, options: Dict[str, Any]) -> VectorStore:
+    """A shard's VectorStore: vectors come from the router, so it never embeds."""
+    return VectorStore(embedding_backend=ShardEmbeddings(dimension, model_name),
+                       cache=EmbeddingCache(max_memory_items=0), **options)
+
+
+def _run_shard_process(dimension: int, model_name: str, options: Dict[str, Any], authkey: bytes,
+                       ready: Connection) -> None:
+    """Entry point of a spawned shard process: build the store, report the address, serve."""
+    store = _shard_store(dimension, model_name, options)
+
+    def report(address: Tuple[str, int]) -> None:
+        ready.send(address)
+        ready.close()
+
+    serve_shard(store, ("127.0.0.1", 0), authkey, on_ready=report)
+
+
+class ShardProcess:
+    """
+    A shard served by a local child process.
+    """
+
+    def __init__(self, dimension: int, model_name: str, **options):
+        """
+        Start the process and wait until it accepts connections.
+
+        Args:
+            dimension: Vector dimension
+            model_name: Embedding model the router uses, recorded in snapshots
+            **options: VectorStore arguments for the shard (storage_dir, index_type, ...)
+        """
+        authkey = secrets.token_bytes(16)
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=_run_shard_process, name="vector-shard", daemon=True,
+                                       args=(dimension, model_name, options, authkey, sender))
+        self.process.start()
+        sender.close()
+        if not receiver.poll(120):
+            self.process.terminate()
+            raise ShardError("Shard process did not start")
+        self.shard = RemoteShard(receiver.recv(), authkey)
+        receiver.close()
+
+    # PUBLIC_INTERFACE
+    def stop(self) -> None:
+        """Ask the shard to close its store and exit, then wait for it."""
+        self.shard.close()
+        if self.process.is_alive():
+            try:
+                self.shard.call("stop")
+            except (OSError, EOFError):
+                pass
+            self.process.join(10)
+            if self.process.is_alive():
+                self.process.terminate()
+
+
+# PUBLIC_INTERFACE
+def merge_results(per_shard: Sequence[List[Dict]], k: int) -> List[Dict]:
+    """
+    Merge the result lists of several shards into one top-k list.
+
+    Args:
+        per_shard: Each shard's results for one query, closest first
+        k: Number of results to keep
+
+    Returns:
+        List[Dict]: The k closest results overall
+    """
+    return heapq.nsmallest(k, itertools.chain.from_iterable(per_shard),
+                           key=lambda result: math.inf if result["distance"] is None else result["distance"])
+
+
+# PUBLIC_INTERFACE
+def fuse_candidates(per_shard: Sequence[Tuple[List[Dict], List[Dict]]], candidates: int, k: int) -> List[Dict]:
+    """
+    Merge the shards' hybrid candidates for one query and fuse them by reciprocal rank.
+
+    Vector hits are merged by distance and keyword hits by BM25 score, each
+    into one list of the best ``candidates``, which are then fused as a
+    single store fuses its own.
+
+    Args:
+        per_shard: Each shard's (vector hits, keyword hits) from
+            ``search_hybrid_candidates``, with ``chunk_index``
+        candidates: Hits kept from each retriever before fusion
+        k: Number of results to keep
+
+    Returns:
+        List[Dict]: The best k results overall
+    """
+    vector = merge_results([vector_hits for vector_hits, _ in per_shard], candidates)
+    lexical = heapq.nlargest(candidates, itertools.chain.from_iterable(hits for _, hits in per_shard),
+                             key=lambda result: result["score"])
+    if not lexical:
+        return vector[:k]
+    # A document lives on one shard, so its id and the chunk's position identify a chunk
+    results = {(result["doc_id"], result["chunk_index"]): dict(result) for result in lexical}
+    for result in results.values():
+        del result["score"]
+    results.update(((result["doc_id"], result["chunk_index"]), result) for result in vector)
+    fused = reciprocal_rank_fusion([[(result["doc_id"], result["chunk_index"]) for result in hits]
+                                    for hits in (vector, lexical)])
+    return [results[key] for key, _ in fused[:k]]
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    VectorStore interface over documents partitioned across shards.
+
+    Embedding and the query-level logic (embedding cache, identifier
+    shortcut, batching) are VectorStore's own; storage and search run on the
+    shards.
+    """
+
+    def __init__(self, shards: List[Shard], embedding_backend: Optional[EmbeddingBackend] = None,
+                 pipeline: Optional[EmbeddingPipeline] = None,
+                 cache: Optional[EmbeddingCache] = None,
+                 retrieval_mode: Optional[str] = None,
+                 hybrid_candidates: int = 50,
+                 processes: Optional[List[ShardProcess]] = None):
+        """
+        Create a router over running shards.
+
+        Args:
+            shards: Shard handles; a document's shard is ``shards[shard_for(doc_id, len(shards))]``
+            embedding_backend: Backend used to generate embeddings (default: from EMBEDDING_BACKEND)
+            pipeline: Batched ingest pipeline (default: one built around the backend)
+            cache: Embedding cache (default: persisted to EMBEDDING_CACHE_PATH if set)
+            retrieval_mode: The shards' retrieval mode, "vector" or "hybrid"
+                (default: RETRIEVAL_MODE or "hybrid")
+            hybrid_candidates: Results taken from each retriever, over all shards,
+                before fusion
+            processes: Local shard processes to stop on ``close``
+
+        Raises:
+            ValueError: If there are no shards
+        """
+        if not shards:
+            raise ValueError("A sharded store needs at least one shard")
+        self.shards = shards
+        self.processes = processes or []
+        self.embedding_backend = embedding_backend or create_embedding_backend()
+        self.pipeline = pipeline or EmbeddingPipeline(self.embedding_backend)
+        self.cache = cache or EmbeddingCache(path=os.getenv("EMBEDDING_CACHE_PATH"))
+        self.client = getattr(self.embedding_backend, "client", None)
+        self.dimension = self.embedding_backend.dimension
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        self.hybrid_candidates = hybrid_candidates
+        self.read_only = False
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(shards), thread_name_prefix="shard-scatter")
+
+    # PUBLIC_INTERFACE
+    @classmethod
+    def spawn(cls, num_shards: int, embedding_backend: Optional[EmbeddingBackend] = None,
+              storage_dir: Optional[str] = None, **options) -> "ShardedVectorStore":
+        """
+        Start ``num_shards`` local shard processes and a router over them.
+
+        Args:
+            num_shards: Number of shard processes
+            embedding_backend: The router's embedding backend (default: from EMBEDDING_BACKEND)
+            storage_dir: Directory for the shards' snapshots, one ``shard-<n>``
+                subdirectory each (default: VECTOR_STORE_DIR; in-memory if unset)
+            **options: VectorStore arguments for every shard (index_type, retrieval_mode, ...)
+
+        Returns:
+            ShardedVectorStore: The router, which stops the processes on ``close``
+        """
+        embedding_backend = embedding_backend or create_embedding_backend()
+        storage_dir = storage_dir or os.getenv("VECTOR_STORE_DIR")
+        options.setdefault("retrieval_mode", os.getenv("RETRIEVAL_MODE", "hybrid"))
+        processes = []
+        try:
+            for n in range(num_shards):
+                shard_dir = os.path.join(storage_dir, f"shard-{n}") if storage_dir else None
+                processes.append(ShardProcess(embedding_backend.dimension, embedding_backend.model_name,
+                                              storage_dir=shard_dir, **options))
+        except Exception:
+            for process in processes:
+                process.stop()
+            raise
+        return cls([process.shard for process in processes], embedding_backend,
+                   retrieval_mode=options["retrieval_mode"], hybrid_candidates=options.get("hybrid_candidates", 50),
+                   processes=processes)
+
+    def _owner(self, doc_id: str) -> Shard:
+        return self.shards[shard_for(doc_id, len(self.shards))]
+
+    def _scatter(self, calls: List[Tuple[Shard, str, tuple, dict]]) -> List[Any]:
+        """Run shard calls in parallel and return their results in order."""
+        if len(calls) == 1:
+            shard, method, args, kwargs = calls[0]
+            return [shard.call(method, *args, **kwargs)]
+        futures = [self._executor.submit(shard.call, method, *args, **kwargs) for shard, method, args, kwargs in calls]
+        return [future.result() for future in futures]
+
+    def _broadcast(self, method: str, *args, **kwargs) -> List[Any]:
+        """Call a method on every shard in parallel."""
+        return self._scatter([(shard, method, args, kwargs) for shard in self.shards])
+
+    def _scoped(self, doc_ids: Optional[List[str]]) -> List[Tuple[Shard, Optional[List[str]]]]:
+        """The shards a search must visit, each with the documents it owns, or None for all."""
+        if doc_ids is None:
+            return [(shard, None) for shard in self.shards]
+        owned: Dict[int, List[str]] = {}
+        for doc_id in doc_ids:
+            owned.setdefault(shard_for(doc_id, len(self.shards)), []).append(doc_id)
+        return [(self.shards[n], ids) for n, ids in sorted(owned.items())]
+
+    def add_document(self, doc_id: str, chunks: List[str], ttl: Optional[float] = None,
+                     embeddings: Optional[np.ndarray] = None,
+                     content_hash: Optional[str] = None,
+                     char_spans: Optional[np.ndarray] = None) -> None:
+        if not chunks:
+            return
+        if embeddings is None:
+            embeddings = self.embed_texts(chunks)
+        with stage("index"):
+            self._owner(doc_id).call("add_document", doc_id, chunks, ttl=ttl,
+                                     embeddings=np.ascontiguousarray(embeddings, dtype=np.float32),
+                                     content_hash=content_hash, char_spans=char_spans)
+
+    def replace_document(self, doc_id: str, chunks: List[str], ttl: Optional[float] = None) -> None:
+        if not self.has_document(doc_id):
+            raise KeyError(f"Document not found: {doc_id}")
+        if not chunks:
+            self.delete_document(doc_id)
+            return
+        self.add_document(doc_id, chunks, ttl=ttl)
+
+    def delete_document(self, doc_id: str) -> bool:
+        return self._owner(doc_id).call("delete_document", doc_id)
+
+    def has_document(self, doc_id: str) -> bool:
+        return self._owner(doc_id).call("has_document", doc_id)
+
+    def document_version(self, doc_id: Optional[str] = None) -> Optional[int]:
+        """
+        Return a value that changes whenever a document's contents change.
+
+        A document's version comes from its shard. The whole store's version
+        is the sum of the shards' versions, each of which only grows.
+
+        Args:
+            doc_id: Unique identifier for the document (default: the whole store)
+
+        Returns:
+            Optional[int]: The version, or None if the document is not in the store
+        """
+        if doc_id is not None:
+            return self._owner(doc_id).call("document_version", doc_id)
+        return sum(self._broadcast("document_version"))
+
+    def find_by_content_hash(self, content_hash: str) -> Optional[str]:
+        return next((doc_id for doc_id in self._broadcast("find_by_content_hash", content_hash)
+                     if doc_id is not None), None)
+
+    def indexed_embeddings(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        if not texts:
+            return found
+        for vectors in self._broadcast("indexed_embeddings", texts):
+            found = [vector if vector is not None else other for vector, other in zip(found, vectors)]
+        return found
+
+    def evict_expired(self, now: Optional[float] = None) -> List[str]:
+        return [doc_id for evicted in self._broadcast("evict_expired", now) for doc_id in evicted]
+
+    def save_snapshot(self) -> None:
+        self._broadcast("save_snapshot")
+
+    def compact(self) -> int:
+        return sum(self._broadcast("compact"))
+
+    def stats(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard_stats in self._broadcast("stats"):
+            for name, value in shard_stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def search_lexical(self, query: str, k: int = 5, doc_ids: Optional[List[str]] = None,
+                       with_metadata: bool = False, require_identifier: bool = False,
+                       statistics: Optional[Tuple[int, int, Dict[str, int]]] = None) -> List[Dict]:
+        scoped = self._scoped(doc_ids)
+        if statistics is None and len(scoped) > 1:
+            statistics = self._lexical_statistics([query])
+        per_shard = self._scatter([(shard, "search_lexical", (query, k, ids, with_metadata, require_identifier,
+                                                              statistics), {})
+                                   for shard, ids in scoped])
+        return heapq.nlargest(k, itertools.chain.from_iterable(per_shard), key=lambda result: result["score"])
+
+    def search_batch_by_embedding(self, query_embeddings: np.ndarray, k: int = 5,
+                                  nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                                  doc_ids: Optional[List[str]] = None,
+                                  with_metadata: bool = False,
+                                  query_texts: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        Search every shard that can hold a match and merge their top-k.
+
+        Document-scoped searches only visit the shards owning those documents;
+        others go to all shards in parallel.
+
+        Args:
+            query_embeddings: A (queries, dimension) matrix
+            k: Number of similar chunks to return per query (default: 5)
+            nprobe: IVF cells to visit (default: shard setting)
+            ef_search: HNSW candidate list size (default: shard setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
+            query_texts: The queries' texts, for hybrid fusion on the shards
+
+        Returns:
+            List[List[Dict]]: One result list per query, in input order
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        scoped = self._scoped(doc_ids)
+        if len(scoped) > 1 and query_texts is not None and self.retrieval_mode == "hybrid":
+            return self._search_hybrid(query_embeddings, query_texts, k, nprobe, ef_search, scoped, with_metadata)
+        with stage("search"):
+            per_shard = self._scatter([
+                (shard, "search_batch_by_embedding", (query_embeddings, k, nprobe, ef_search, ids, with_metadata,
+                                                      query_texts), {})
+                for shard, ids in scoped
+            ])
+        if len(scoped) == 1:
+            return per_shard[0]
+        return [merge_results([results[row] for results in per_shard], k) for row in range(len(query_embeddings))]
+
+    def _search_hybrid(self, query_embeddings: np.ndarray, query_texts: List[str], k: int,
+                       nprobe: Optional[int], ef_search: Optional[int],
+                       scoped: List[Tuple[Shard, Optional[List[str]]]], with_metadata: bool) -> List[List[Dict]]:
+        """
+        Fuse vector and keyword hits across shards, as one store would fuse its own.
+
+        Each shard's fused top-k only ranks against that shard's chunks, so
+        merging those would let shards without relevant chunks crowd out the
+        best results. The shards instead return their raw candidates, which
+        are merged per retriever and fused here.
+        """
+        candidates = max(k, self.hybrid_candidates)
+        with stage("search"):
+            statistics = self._lexical_statistics(query_texts)
+            per_shard = self._scatter([
+                (shard, "search_hybrid_candidates", (query_embeddings, query_texts, candidates, nprobe, ef_search,
+                                                     ids, True, statistics), {})
+                for shard, ids in scoped
+            ])
+        results = []
+        for row in range(len(query_embeddings)):
+            fused = fuse_candidates([shard_results[row] for shard_results in per_shard], candidates, k)
+            if not with_metadata:
+                # The chunk index was only needed to fuse
+                fused = [{key: result[key] for key in ("doc_id", "chunk", "distance")} for result in fused]
+            results.append(fused)
+        return results
+
+    def _lexical_statistics(self, query_texts: List[str]) -> Tuple[int, int, Dict[str, int]]:
+        """BM25 statistics summed over every shard, so keyword scores compare across shards."""
+        return combine_statistics(self._broadcast("lexical_statistics", query_texts))
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Close the shard handles and stop the shard processes this router started."""
+        for shard in self.shards:
+            shard.close()
+        for process in self.processes:
+            process.stop()
+        self._executor.shutdown(wait=False)
+
+
+# PUBLIC_INTERFACE
+def create_sharded_store(spec: Optional[str] = None) -> ShardedVectorStore:
+    """
+    Build the sharded store selected by the environment.
+
+    Args:
+        spec: VECTOR_SHARDS, overriding the environment: a number of local
+            shard processes to start, or a comma-separated list of
+            ``host:port`` shard nodes started with SHARD_AUTHKEY
+
+    Returns:
+        ShardedVectorStore: The router
+
+    Raises:
+        ValueError: If shard nodes are listed but SHARD_AUTHKEY is not set
+    """
+    spec = (spec or os.getenv("VECTOR_SHARDS", "")).strip()
+    if spec.isdigit():
+        return ShardedVectorStore.spawn(int(spec))
+    authkey = os.getenv("SHARD_AUTHKEY")
+    if not authkey:
+        raise ValueError("SHARD_AUTHKEY must be set to connect to shard nodes")
+    shards: List[Shard] = []
+    for address in spec.split(","):
+        host, port = address.strip().rsplit(":", 1)
+        shards.append(RemoteShard((host, int(port)), authkey.encode("utf-8")))
+    return ShardedVectorStore(shards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one vector store shard")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--storage-dir", default=None)
+    parser.add_argument("--index-type", default=None)
+    # Must match the router's embedding backend
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--model", default="text-embedding-ada-002")
+    args = parser.parse_args()
+
+    authkey = os.getenv("SHARD_AUTHKEY")
+    if not authkey:
+        raise SystemExit("SHARD_AUTHKEY must be set")
+    store = _shard_store(args.dimension, args.model,
+                         {"storage_dir": args.storage_dir, "index_type": args.index_type})
+    serve_shard(store, (args.host, args.port), authkey.encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
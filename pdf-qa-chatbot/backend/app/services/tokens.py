@@ -0,0 +1,98 @@
+"""
+Token counting for prompt budgeting.
+
+Counts come from the model's tiktoken encoding. If the encoding cannot be
+loaded (tiktoken fetches it on first use, which fails offline) counts fall
+back to a ~4 characters per token estimate.
+"""
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Context window sizes in tokens; unknown models get the smallest common window
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Extra tokens the chat format adds per message
+TOKENS_PER_MESSAGE = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Return the tiktoken encoding for a model, or None if it cannot be loaded."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding for %s unavailable (%s); estimating token counts", model, e)
+        return None
+
+
+# PUBLIC_INTERFACE
+def context_window(model: str = DEFAULT_MODEL) -> int:
+    """
+    Context window of a chat model.
+
+    Args:
+        model: Chat model name
+
+    Returns:
+        int: Maximum prompt plus completion tokens
+    """
+    for name in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+# PUBLIC_INTERFACE
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Count the tokens in a text.
+
+    Args:
+        text: The text to count
+        model: Model whose tokenizer to use
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# PUBLIC_INTERFACE
+def count_tokens_batch(texts: List[str], model: Optional[str] = None) -> np.ndarray:
+    """
+    Count the tokens in many texts at once.
+
+    Args:
+        texts: The texts to count
+        model: Model whose tokenizer to use (default: DEFAULT_MODEL)
+
+    Returns:
+        numpy.ndarray: int32 token counts, one per text
+    """
+    encoding = _encoding(model or DEFAULT_MODEL)
+    if encoding is None:
+        return np.array([-(-len(text) // 4) for text in texts], dtype=np.int32)
+    # encode_batch tokenizes in parallel threads inside tiktoken
+    return np.array([len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())],
+                    dtype=np.int32)
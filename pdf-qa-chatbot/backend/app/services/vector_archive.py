@@ -0,0 +1,140 @@
+"""
+Full-precision copies of indexed vectors for exact re-ranking.
+
+Compressed indexes (scalar-quantized or dimension-reduced) only rank
+approximately. The archive keeps every vector as float32 so the top
+candidates can be re-scored exactly. It has the same layout as ChunkStore: a
+read-only head, memory-mapped from the last snapshot so it stays on disk
+until touched, and an in-memory tail holding vectors added since.
+"""
+from typing import Optional
+
+import numpy as np
+
+
+class VectorArchive:
+    """
+    float32 vectors addressed by FAISS id.
+    """
+
+    def __init__(self, dimension: int, head: Optional[np.ndarray] = None,
+                 head_ids: Optional[np.ndarray] = None):
+        """
+        Create an archive.
+
+        Args:
+            dimension: Vector dimension
+            head: Read-only (n, dimension) float32 rows, e.g. a memory-mapped snapshot file
+            head_ids: Id of each head row
+        """
+        self.dimension = dimension
+        self._head = head if head is not None else np.empty((0, dimension), dtype=np.float32)
+        self._tail = np.empty((0, dimension), dtype=np.float32)
+        self._tail_size = 0
+        # Row of each id; rows past the head are in the tail, and -1 marks an absent id
+        self._rows = np.full(0, -1, dtype=np.int64)
+        self._removed = 0
+        if head_ids is not None and len(head_ids):
+            self._reserve_ids(int(head_ids.max()) + 1)
+            self._rows[head_ids] = np.arange(len(head_ids))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._rows >= 0))
+
+    def _reserve_ids(self, size: int) -> None:
+        """Make room in the row map for ids below ``size``."""
+        if size > len(self._rows):
+            rows = np.full(max(size, 2 * len(self._rows)), -1, dtype=np.int64)
+            rows[:len(self._rows)] = self._rows
+            self._rows = rows
+
+    # PUBLIC_INTERFACE
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """
+        Store vectors under new ids.
+
+        Args:
+            ids: Ids of the vectors
+            vectors: (len(ids), dimension) matrix
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        end = self._tail_size + len(ids)
+        if end > len(self._tail):
+            tail = np.empty((max(end, 2 * len(self._tail)), self.dimension), dtype=np.float32)
+            tail[:self._tail_size] = self._tail[:self._tail_size]
+            self._tail = tail
+        self._tail[self._tail_size:end] = vectors
+        self._reserve_ids(int(ids.max()) + 1)
+        self._rows[ids] = len(self._head) + np.arange(self._tail_size, end)
+        self._tail_size = end
+
+    # PUBLIC_INTERFACE
+    def remove(self, ids: np.ndarray) -> None:
+        """
+        Forget vectors. Their space is reclaimed by ``compact`` and the next snapshot.
+
+        Args:
+            ids: Ids of the vectors
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < len(self._rows)]
+        self._removed += int(np.count_nonzero(self._rows[ids] >= 0))
+        self._rows[ids] = -1
+
+    # PUBLIC_INTERFACE
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Look up vectors.
+
+        Args:
+            ids: Ids of archived vectors
+
+        Returns:
+            np.ndarray: (len(ids), dimension) float32 matrix
+
+        Raises:
+            KeyError: If an id is not in the archive
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = self._rows[ids] if len(ids) and ids.max() < len(self._rows) else np.full(len(ids), -1)
+        if len(rows) and rows.min() < 0:
+            raise KeyError(f"Vectors not archived: {ids[rows < 0][:5].tolist()}")
+        vectors = np.empty((len(ids), self.dimension), dtype=np.float32)
+        in_head = rows < len(self._head)
+        # Sorted reads keep memory-mapped pages sequential
+        head_rows = rows[in_head]
+        order = np.argsort(head_rows, kind="stable")
+        vectors[np.flatnonzero(in_head)[order]] = self._head[head_rows[order]]
+        vectors[~in_head] = self._tail[rows[~in_head] - len(self._head)]
+        return vectors
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the tail and the row map; a memory-mapped head is not counted."""
+        head = 0 if isinstance(self._head, np.memmap) else self._head.nbytes
+        return head + self._tail.nbytes + self._rows.nbytes
+
+    # PUBLIC_INTERFACE
+    def compact(self) -> None:
+        """Rewrite the tail without removed vectors. The head is left to the next snapshot."""
+        if not self._removed:
+            return
+        tail_ids = np.flatnonzero(self._rows >= len(self._head)).astype(np.int64)
+        vectors = self.get(tail_ids)
+        self._tail = np.empty((0, self.dimension), dtype=np.float32)
+        self._tail_size = 0
+        self._rows[tail_ids] = -1
+        self.add(tail_ids, vectors)
+        self._removed = 0
+
+    # PUBLIC_INTERFACE
+    def ids(self) -> np.ndarray:
+        """
+        Ids of every archived vector.
+
+        Returns:
+            np.ndarray: int64 ids, increasing
+        """
+        return np.flatnonzero(self._rows >= 0).astype(np.int64)
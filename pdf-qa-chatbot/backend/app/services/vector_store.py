@@ -2,29 +2,353 @@
 Vector store service for managing document embeddings using FAISS.
 """
 import os
-from typing import List, Dict
+import copy
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, List, Dict, Mapping, Optional, Tuple
 import numpy as np
 import faiss
-from openai import OpenAI
+from fastapi.concurrency import run_in_threadpool
+from .faiss_index import (
+    base_index,
+    build_index,
+    empty_copy,
+    id_mapped,
+    min_training_size,
+    search_parameters,
+    set_default_search_parameters,
+    stores_exact_vectors,
+)
+from .embeddings import EmbeddingBackend, create_embedding_backend
+from .embedding_pipeline import EmbeddingPipeline
+from .embedding_cache import EmbeddingCache
+from .persistence import StorePersistence
+from .chunk_store import ChunkStore, DocumentChunks
+from .vector_archive import VectorArchive
+from .lexical_index import BM25Index, identifier_terms, is_identifier_query, reciprocal_rank_fusion, tokenize
+from .tokens import count_tokens_batch
+from .metrics import stage
+
+
+# PUBLIC_INTERFACE
+def chunk_digests(chunks: List[str]) -> np.ndarray:
+    """
+    64-bit hash of each chunk's whitespace-normalized text.
+    
+    Args:
+        chunks: Chunk texts
+        
+    Returns:
+        numpy.ndarray: uint64 digests, one per chunk
+    """
+    digests = b"".join(hashlib.blake2b(" ".join(chunk.split()).encode("utf-8"), digest_size=8).digest()
+                       for chunk in chunks)
+    return np.frombuffer(digests, dtype=np.uint64).copy()
 
 class VectorStore:
     """
     Handles vector embeddings generation and FAISS operations for document storage and retrieval.
-    Uses OpenAI's embeddings API for generating vectors and FAISS for efficient similarity search.
+    Uses a pluggable embedding backend (OpenAI or a local model) for generating vectors
+    and FAISS for efficient similarity search.
     """
     
-    def __init__(self):
-        """Initialize the vector store with FAISS index and OpenAI client."""
-        self.dimension = 1536  # OpenAI ada-002 embedding dimension
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.doc_chunks = {}  # Map of doc_id -> list of chunk texts
-        self.chunk_map = {}   # Map of FAISS index -> (doc_id, chunk_idx)
+    def __init__(self, embedding_backend: Optional[EmbeddingBackend] = None,
+                 pipeline: Optional[EmbeddingPipeline] = None,
+                 cache: Optional[EmbeddingCache] = None,
+                 index_type: Optional[str] = None,
+                 index_params: Optional[Dict[str, Any]] = None,
+                 train_threshold: Optional[int] = None,
+                 nprobe: int = 16,
+                 ef_search: int = 64,
+                 max_exact_candidates: int = 20_000,
+                 storage_dir: Optional[str] = None,
+                 wal_sync: bool = True,
+                 snapshot_interval: int = 1000,
+                 compaction_threshold: float = 0.2,
+                 retrieval_mode: Optional[str] = None,
+                 hybrid_candidates: int = 50,
+                 vector_storage: Optional[str] = None,
+                 reduce_dim: Optional[int] = None,
+                 reduction: str = "pca",
+                 rerank: Optional[bool] = None,
+                 rerank_factor: int = 4,
+                 read_only: bool = False):
+        """
+        Initialize the vector store with FAISS index and embedding backend.
+        
+        Args:
+            embedding_backend: Backend used to generate embeddings (default: from EMBEDDING_BACKEND)
+            pipeline: Batched ingest pipeline (default: one built around the backend)
+            cache: Embedding cache (default: persisted to EMBEDDING_CACHE_PATH if set)
+            index_type: "flat", "hnsw", "ivf_flat" or "ivf_pq" (default: VECTOR_INDEX_TYPE or "flat")
+            index_params: Extra arguments for faiss_index.build_index (nlist, pq_m, hnsw_m, ...)
+            train_threshold: Vectors to collect before training an IVF index
+                (default: ~39 per centroid)
+            nprobe: Default IVF cells visited per query
+            ef_search: Default HNSW candidate list size per query
+            max_exact_candidates: Largest document-scoped candidate set that is scored
+                exactly; larger scopes fall back to a filtered index search
+            storage_dir: Directory for snapshots and the write-ahead log
+                (default: VECTOR_STORE_DIR; in-memory only if unset)
+            wal_sync: fsync the write-ahead log after every document
+            snapshot_interval: Logged documents after which a snapshot is written
+                (0: only when save_snapshot is called)
+            compaction_threshold: Fraction of deleted vectors that triggers a
+                background compaction of the index
+            retrieval_mode: "vector" for embedding search only, or "hybrid" to fuse
+                it with BM25 keyword search and answer identifier-like queries from
+                the keyword index alone (default: RETRIEVAL_MODE or "hybrid")
+            hybrid_candidates: Results taken from each retriever before fusion
+            vector_storage: "float32", or "fp16" / "sq8" to store scalar-quantized
+                vectors in the index (default: VECTOR_STORAGE or "float32")
+            reduce_dim: Index vectors in this many dimensions
+                (default: VECTOR_REDUCE_DIM; full dimension if unset)
+            reduction: "pca" or "truncate" (Matryoshka-style prefix) for reduce_dim
+            rerank: Keep float32 copies of the vectors and re-score the top
+                candidates exactly (default: on when vectors are quantized or reduced)
+            rerank_factor: Candidates fetched from the index per result when re-ranking
+            read_only: Serve the snapshots another process writes to storage_dir,
+                with the index memory-mapped and shared; mutations raise
+                RuntimeError and ``refresh`` moves to newer generations
+            
+        Raises:
+            ValueError: If read_only is set without a storage directory
+        """
+        self.embedding_backend = embedding_backend or create_embedding_backend()
+        self.pipeline = pipeline or EmbeddingPipeline(self.embedding_backend)
+        self.cache = cache or EmbeddingCache(path=os.getenv("EMBEDDING_CACHE_PATH"))
+        self.client = getattr(self.embedding_backend, "client", None)
+        self.dimension = self.embedding_backend.dimension
+        self.index_type = index_type or os.getenv("VECTOR_INDEX_TYPE", "flat")
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.max_exact_candidates = max_exact_candidates
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        if self.retrieval_mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {self.retrieval_mode} (expected vector or hybrid)")
+        self.hybrid_candidates = hybrid_candidates
+        self.vector_storage = vector_storage or os.getenv("VECTOR_STORAGE", "float32")
+        reduce_dim = reduce_dim or int(os.getenv("VECTOR_REDUCE_DIM", "0")) or None
+        target_index = build_index(self.index_type, self.dimension, storage=self.vector_storage,
+                                   reduce_dim=reduce_dim, reduction=reduction, **(index_params or {}))
+        if rerank is None:
+            rerank = self.vector_storage != "float32" or reduce_dim is not None
+        self.rerank_factor = rerank_factor
+        # Full-precision vectors by id, for re-ranking candidates from a compressed index
+        self._exact: Optional[VectorArchive] = VectorArchive(self.dimension) if rerank else None
+        set_default_search_parameters(target_index, nprobe, ef_search)
+        # Vectors are addressed by stable ids so documents can be deleted
+        if target_index.is_trained:
+            self.index = id_mapped(target_index)
+            self._untrained_index = None
+            self.train_threshold = 0
+        else:
+            # Vectors are staged in a flat index until there are enough to train on
+            self.index = id_mapped(faiss.IndexFlatL2(self.dimension))
+            self._untrained_index = target_index
+            self.train_threshold = train_threshold or min_training_size(target_index)
+        self._reset_state()
+        # Bumped on every add and delete so caches can tell when results may have changed
+        self._mutations = 0
+        
+        # Deleted vectors stay in the index, excluded from searches, until compaction
+        self.compaction_threshold = compaction_threshold
+        self._compaction_thread = None
+        # Guards the index and mappings against concurrent mutation and compaction
+        self._lock = threading.RLock()
+        
+        self.snapshot_interval = snapshot_interval
+        self._index_read_only = False
+        self.read_only = read_only
+        self.persistence = None
+        storage_dir = storage_dir or os.getenv("VECTOR_STORE_DIR")
+        if read_only and not storage_dir:
+            raise ValueError("A read-only VectorStore needs a storage directory to load from")
+        if storage_dir:
+            self.persistence = StorePersistence(storage_dir, wal_sync=wal_sync, read_only=read_only)
+            self._load()
+    
+    def _reset_state(self) -> None:
+        """Empty the chunk mappings and document bookkeeping; the index itself is left alone."""
+        # FAISS id -> (doc_id, chunk_idx), with the chunk text, in flat arrays
+        self.chunk_map = ChunkStore()
+        self.doc_vector_ids: Dict[str, np.ndarray] = {}  # Map of doc_id -> FAISS ids of its chunks
+        self.doc_token_counts: Dict[str, np.ndarray] = {}  # Map of doc_id -> token count of each chunk
+        # Map of doc_id -> (start, end) character offsets of each chunk in its document, where known
+        self.doc_char_spans: Dict[str, np.ndarray] = {}
+        # Map of doc_id -> 64-bit hash of each chunk's normalized text, for reusing vectors
+        self.doc_chunk_digests: Dict[str, np.ndarray] = {}
+        # Map of doc_id -> hash of the uploaded file, and its inverse, for upload deduplication
+        self.doc_content_hashes: Dict[str, str] = {}
+        self._documents_by_hash: Dict[str, str] = {}
+        self._digest_lookup: Optional[Tuple[int, np.ndarray, np.ndarray]] = None
+        # Keyword index over the same chunk ids as the vector index
+        self.lexical_index = BM25Index()
+        if self._exact is not None:
+            self._exact = VectorArchive(self.dimension)
+        self._next_id = 0
+        self._tombstones = set()
+        self._live_selector = None
+        # Expiry times of documents added with a TTL
+        self._expires_at: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._ops_since_snapshot = 0
+
+    def _load(self) -> None:
+        """Restore the latest snapshot and, for the writer, replay the write-ahead log on top of it."""
+        state = self.persistence.load()
+        if state is not None:
+            meta = state["meta"]
+            if meta["dimension"] != self.dimension:
+                raise ValueError(
+                    f"Stored index has dimension {meta['dimension']}, "
+                    f"but the embedding backend produces {self.dimension}"
+                )
+            self.index = state["index"]
+            if not meta["staging"]:
+                self.index_type = meta["index_type"]
+                self._untrained_index = None
+                set_default_search_parameters(self.index, self.nprobe, self.ef_search)
+            # A memory-mapped index can't be modified; it is loaded fully on first write
+            self._index_read_only = self.persistence.read_only or self.persistence.mmap
+            # Without archived vectors the snapshot's index can't be re-ranked
+            self._exact = state.get("vectors") if self._exact is not None else None
+            self.chunk_map = state["chunks"]
+            self.doc_vector_ids = state["doc_vector_ids"]
+            doc_chunks = self.doc_chunks
+            # Snapshots written before token counts were stored get them recomputed
+            self.doc_token_counts = state.get("doc_token_counts") or {
+                doc_id: count_tokens_batch(chunks) for doc_id, chunks in doc_chunks.items()
+            }
+            self.doc_char_spans = state.get("doc_char_spans", {})
+            # Snapshots written before the keyword index was stored get it rebuilt
+            rebuild_lexical = "lexical_index" not in state
+            if not rebuild_lexical:
+                self.lexical_index = state["lexical_index"]
+            if rebuild_lexical or not self.read_only:
+                for doc_id, vector_ids in self.doc_vector_ids.items():
+                    chunks = doc_chunks[doc_id]
+                    if rebuild_lexical:
+                        self.lexical_index.add(vector_ids, chunks)
+                    if not self.read_only:
+                        # Only the writer embeds new chunks, so only it reuses vectors
+                        self.doc_chunk_digests[doc_id] = chunk_digests(chunks)
+            for doc_id, content_hash in meta.get("content_hashes", {}).items():
+                self._set_content_hash(doc_id, content_hash)
+            self._next_id = meta["next_id"]
+            self._tombstones = set(meta["tombstones"])
+            for doc_id, expires_at in meta["expires_at"].items():
+                self._set_expiry(doc_id, expires_at)
+        
+        if self.read_only:
+            # Readers serve published generations only: the writer is still
+            # appending to this log, and applying it would copy the mapped index
+            return
+        for payload, blob in self.persistence.replay_wal():
+            if payload["op"] == "add":
+                vectors = np.frombuffer(blob, dtype=np.float32).reshape(-1, self.dimension)
+                token_counts = payload.get("token_counts")
+                char_spans = payload.get("char_spans")
+                self._apply_add(payload["doc_id"], payload["chunks"], vectors,
+                                payload["start_id"], payload.get("expires_at"),
+                                None if token_counts is None else np.array(token_counts, dtype=np.int32),
+                                payload.get("content_hash"),
+                                None if char_spans is None else np.array(char_spans, dtype=np.int64))
+            elif payload["op"] == "delete":
+                self._apply_delete(payload["doc_id"])
+            self._ops_since_snapshot += 1
+
+    @property
+    def doc_chunks(self) -> Mapping[str, List[str]]:
+        """Read-only map of doc_id -> chunk texts, decoded from the chunk store on access."""
+        return DocumentChunks(self.chunk_map, self.doc_vector_ids)
+
+    @property
+    def changes_since_snapshot(self) -> int:
+        """Documents added or deleted since the last snapshot, and so not yet visible to readers."""
+        return self._ops_since_snapshot
+
+    def _ensure_writable(self) -> None:
+        """Replace a read-only memory-mapped index with an in-memory copy."""
+        if self._index_read_only:
+            self.index = faiss.read_index(self.persistence.index_path)
+            set_default_search_parameters(self.index, self.nprobe, self.ef_search)
+            self._index_read_only = False
+
+    # PUBLIC_INTERFACE
+    def save_snapshot(self) -> None:
+        """
+        Persist the index and chunk store and truncate the write-ahead log.
+        
+        Raises:
+            RuntimeError: If the store was created without a storage directory or is read-only
+        """
+        if self.persistence is None:
+            raise RuntimeError("VectorStore has no storage directory configured")
+        self._check_writable()
+        with self._lock:
+            self._ensure_writable()
+            self.persistence.write_snapshot(
+                self.index, self.chunk_map,
+                doc_token_counts=self.doc_token_counts,
+                doc_char_spans=self.doc_char_spans,
+                vectors=self._exact,
+                lexical_index=self.lexical_index,
+                meta={
+                    "dimension": self.dimension,
+                    "index_type": self.index_type,
+                    "staging": self._untrained_index is not None,
+                    "embedding_model": self.embedding_backend.model_name,
+                    "next_id": self._next_id,
+                    "tombstones": sorted(self._tombstones),
+                    "expires_at": self._expires_at,
+                    "content_hashes": self.doc_content_hashes,
+                },
+            )
+            if self._exact is not None:
+                # Swap the in-memory archive for the memory-mapped copy just written
+                self._exact = self.persistence.load_vectors()
+            self._ops_since_snapshot = 0
+
+    # PUBLIC_INTERFACE
+    def refresh(self) -> bool:
+        """
+        Move a read-only store to the newest snapshot generation on disk.
+        
+        The new generation is loaded next to the current one, so searches keep
+        running while it loads, and is swapped in under the lock. Vector ids
+        survive snapshots, so cached answers for unchanged documents stay valid.
+        
+        Returns:
+            bool: True if a newer generation was loaded
+            
+        Raises:
+            RuntimeError: If the store is not read-only
+        """
+        if not self.read_only:
+            raise RuntimeError("Only read-only stores refresh; a writable store is always current")
+        generation = self.persistence.current_generation()
+        if generation == self.persistence.generation:
+            return False
+        staged = copy.copy(self)
+        staged._reset_state()
+        staged.persistence = self.persistence.reopen(generation)
+        staged._load()
+        with self._lock:
+            for name, value in vars(staged).items():
+                if name not in ("_lock", "_mutations"):
+                    setattr(self, name, value)
+            # Replaced and deleted documents must not be answered from cache
+            self._mutations = staged._mutations + 1
+        return True
 
     # PUBLIC_INTERFACE
     def generate_embeddings(self, text: str) -> np.ndarray:
         """
-        Generate embeddings for a given text using OpenAI's embeddings API.
+        Generate embeddings for a given text using the embedding backend.
         
         Args:
             text: The text to generate embeddings for
@@ -32,71 +356,965 @@ class VectorStore:
         Returns:
             numpy.ndarray: The generated embedding vector
         """
-        response = self.client.embeddings.create(
-            model="text-embedding-ada-002",
-            input=text
-        )
-        return np.array(response.data[0].embedding, dtype=np.float32)
+        model = self.embedding_backend.model_name
+        embedding = self.cache.get(model, text)
+        if embedding is None:
+            with stage("query_embed"):
+                embedding = self.embedding_backend.embed_one(text)
+            self.cache.put(model, text, embedding)
+        return embedding
 
     # PUBLIC_INTERFACE
-    def add_document(self, doc_id: str, chunks: List[str]) -> None:
+    async def agenerate_embeddings(self, text: str) -> np.ndarray:
+        """
+        Generate embeddings for a given text without blocking the event loop.
+        
+        Args:
+            text: The text to generate embeddings for
+            
+        Returns:
+            numpy.ndarray: The generated embedding vector
+        """
+        model = self.embedding_backend.model_name
+        # The cache may go to disk, so it is read and written off the event loop
+        embedding = await run_in_threadpool(self.cache.get, model, text)
+        if embedding is None:
+            with stage("query_embed"):
+                embedding = await self.embedding_backend.aembed_one(text)
+            await run_in_threadpool(self.cache.put, model, text, embedding)
+        return embedding
+
+    # PUBLIC_INTERFACE
+    async def agenerate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for many queries with at most one backend request.
+        
+        Only texts missing from the embedding cache are sent to the backend.
+        
+        Args:
+            texts: The texts to generate embeddings for
+            
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        
+        model = self.embedding_backend.model_name
+        cached = await run_in_threadpool(self.cache.get_many, model, texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            with stage("query_embed"):
+                fresh = await self.embedding_backend.aembed(unique)
+            await run_in_threadpool(self.cache.put_many, model, unique, fresh)
+            rows = {text: row for row, text in enumerate(unique)}
+            for i in missing:
+                cached[i] = fresh[rows[texts[i]]]
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    # PUBLIC_INTERFACE
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for many texts through the batched pipeline.
+        
+        Only texts missing from the embedding cache are sent to the backend.
+        
+        Args:
+            texts: The texts to generate embeddings for
+            
+        Returns:
+            numpy.ndarray: A (len(texts), dimension) float32 matrix, in input order
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        
+        model = self.embedding_backend.model_name
+        cached = self.cache.get_many(model, texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            # Embed each distinct missing text once, even if it repeats in the document
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            vectors = dict(zip(unique, self.indexed_embeddings(unique)))
+            # Only chunks not already indexed under any document go to the backend
+            new = [text for text in unique if vectors[text] is None]
+            if new:
+                with stage("embed"):
+                    vectors.update(zip(new, self.pipeline.embed(new)))
+            self.cache.put_many(model, unique, np.stack([vectors[text] for text in unique]))
+            for i in missing:
+                cached[i] = vectors[texts[i]]
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    # PUBLIC_INTERFACE
+    def indexed_embeddings(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Find vectors already in the index for chunks with the same text.
+        
+        Chunks are matched by a hash of their normalized text, so an edited
+        revision of a document only needs its changed chunks embedded. Indexes
+        that store compressed vectors cannot give them back exactly and never
+        match.
+        
+        Args:
+            texts: Chunk texts
+            
+        Returns:
+            List[Optional[numpy.ndarray]]: The stored vector of each text, or None
+        """
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        if not texts:
+            return found
+        digests = chunk_digests(texts)
+        with self._lock:
+            if self._exact is None and not stores_exact_vectors(self.index):
+                return found
+            known, vector_ids = self._digests_index()
+            positions = np.minimum(np.searchsorted(known, digests), max(len(known) - 1, 0))
+            rows = np.flatnonzero(known[positions] == digests) if len(known) else np.empty(0, dtype=np.int64)
+            if not len(rows):
+                return found
+            vectors = self._exact_vectors(vector_ids[positions[rows]])
+        for row, vector in zip(rows.tolist(), vectors):
+            found[row] = vector
+        return found
+
+    def _digests_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sorted chunk digests of all live documents and their vector ids. Caller holds the lock.
+        
+        Rebuilt lazily after documents change, since lookups only happen at ingest.
+        """
+        if self._digest_lookup is None or self._digest_lookup[0] != self._mutations:
+            if self.doc_chunk_digests:
+                digests = np.concatenate(list(self.doc_chunk_digests.values()))
+                vector_ids = np.concatenate([self.doc_vector_ids[doc_id] for doc_id in self.doc_chunk_digests])
+            else:
+                digests, vector_ids = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+            order = np.argsort(digests, kind="stable")
+            self._digest_lookup = (self._mutations, digests[order], vector_ids[order])
+        return self._digest_lookup[1], self._digest_lookup[2]
+
+    # PUBLIC_INTERFACE
+    def find_by_content_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Find the document indexed from an upload with the given content hash.
+        
+        Args:
+            content_hash: Hex digest of the uploaded file
+            
+        Returns:
+            Optional[str]: The document's id, or None if no such upload is indexed
+        """
+        with self._lock:
+            return self._documents_by_hash.get(content_hash)
+
+    # PUBLIC_INTERFACE
+    def add_document(self, doc_id: str, chunks: List[str], ttl: Optional[float] = None,
+                     embeddings: Optional[np.ndarray] = None,
+                     content_hash: Optional[str] = None,
+                     char_spans: Optional[np.ndarray] = None) -> None:
         """
         Add document chunks to the vector store.
         
+        Adding an existing doc_id replaces the previous version of the document.
+        
         Args:
             doc_id: Unique identifier for the document
             chunks: List of text chunks from the document
+            ttl: Seconds after which the document is evicted (default: never),
+                used for anonymous uploads
+            embeddings: Precomputed (len(chunks), dimension) embeddings of the
+                chunks (default: embed them here)
+            content_hash: Hash of the file the document was extracted from, so
+                later uploads of the same file can be recognised
+            char_spans: (len(chunks), 2) start and end character offsets of the
+                chunks in the document, so overlapping neighbours can be merged
+                without repeating text (default: unknown)
+                
+        Raises:
+            ValueError: If embeddings or char_spans does not have one row per chunk
+            RuntimeError: If the store is read-only
+        """
+        if not chunks:
+            return
+        self._check_writable()
+        self.evict_expired()
+            
+        if embeddings is None:
+            # Generate embeddings for all chunks in concurrent batches
+            embeddings_array = self.embed_texts(chunks)
+        else:
+            embeddings_array = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if embeddings_array.shape != (len(chunks), self.dimension):
+                raise ValueError(
+                    f"Expected embeddings of shape {(len(chunks), self.dimension)}, got {embeddings_array.shape}"
+                )
+        if char_spans is not None:
+            char_spans = np.asarray(char_spans, dtype=np.int64)
+            if char_spans.shape != (len(chunks), 2):
+                raise ValueError(f"Expected char_spans of shape {(len(chunks), 2)}, got {char_spans.shape}")
+        expires_at = time.time() + ttl if ttl is not None else None
+        with stage("index"):
+            # Count tokens once at ingest so prompt assembly never re-tokenizes
+            token_counts = count_tokens_batch(chunks)
+            
+            with self._lock:
+                if doc_id in self.doc_vector_ids:
+                    self._log({"op": "delete", "doc_id": doc_id})
+                    self._apply_delete(doc_id)
+                
+                # Log the document before applying it so it survives a crash
+                start_id = self._next_id
+                self._log({"op": "add", "doc_id": doc_id, "chunks": chunks, "start_id": start_id,
+                           "expires_at": expires_at, "token_counts": token_counts.tolist(),
+                           "content_hash": content_hash,
+                           "char_spans": None if char_spans is None else char_spans.tolist()}, embeddings_array)
+                self._apply_add(doc_id, chunks, embeddings_array, start_id, expires_at, token_counts, content_hash,
+                                char_spans)
+        self._after_mutation()
+
+    # PUBLIC_INTERFACE
+    def replace_document(self, doc_id: str, chunks: List[str], ttl: Optional[float] = None) -> None:
         """
+        Replace the chunks of an existing document.
+        
+        Args:
+            doc_id: Unique identifier for the document
+            chunks: The document's new text chunks
+            ttl: Seconds after which the document is evicted (default: never)
+            
+        Raises:
+            KeyError: If the document does not exist
+        """
+        if doc_id not in self.doc_vector_ids:
+            raise KeyError(f"Document not found: {doc_id}")
         if not chunks:
+            self.delete_document(doc_id)
             return
+        self.add_document(doc_id, chunks, ttl=ttl)
+
+    # PUBLIC_INTERFACE
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        Remove a document from the vector store.
+        
+        Its vectors are excluded from searches immediately and physically
+        removed by the next compaction.
+        
+        Args:
+            doc_id: Unique identifier for the document
             
-        # Generate embeddings for all chunks
-        embeddings = []
-        for chunk in chunks:
-            embedding = self.generate_embeddings(chunk)
-            embeddings.append(embedding)
+        Returns:
+            bool: True if the document existed
+        """
+        with self._lock:
+            if doc_id not in self.doc_vector_ids:
+                return False
+            self._log({"op": "delete", "doc_id": doc_id})
+            self._apply_delete(doc_id)
+        self._after_mutation()
+        return True
+
+    # PUBLIC_INTERFACE
+    def evict_expired(self, now: Optional[float] = None) -> List[str]:
+        """
+        Delete documents whose TTL has passed.
+        
+        Read-only stores leave eviction to the writer and return nothing.
+        
+        Args:
+            now: Current time as a UNIX timestamp (default: time.time())
             
+        Returns:
+            List[str]: The evicted document ids
+        """
+        if self.read_only:
+            return []
+        now = time.time() if now is None else now
+        evicted = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            with self._lock:
+                if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                    break
+                expires_at, doc_id = heapq.heappop(self._expiry_heap)
+                # Skip stale heap entries for replaced or deleted documents
+                if self._expires_at.get(doc_id) != expires_at:
+                    continue
+            if self.delete_document(doc_id):
+                evicted.append(doc_id)
+        return evicted
+
+    def _log(self, payload: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> None:
+        """Append a mutation to the write-ahead log, if persistence is enabled."""
+        self._check_writable()
+        if self.persistence is not None:
+            self.persistence.wal.append(payload, vectors)
+
+    def _check_writable(self) -> None:
+        """Refuse to mutate a read-only store; only the process writing its snapshots may."""
+        if self.read_only:
+            raise RuntimeError("VectorStore is read-only; changes must go through the writer process")
+
+    def _after_mutation(self) -> None:
+        """Snapshot and compact once enough changes have accumulated."""
+        if self.persistence is not None:
+            self._ops_since_snapshot += 1
+            if self.snapshot_interval and self._ops_since_snapshot >= self.snapshot_interval:
+                self.save_snapshot()
+        self._maybe_schedule_compaction()
+
+    def _set_content_hash(self, doc_id: str, content_hash: str) -> None:
+        """Record which uploaded file a document was built from. Caller holds the lock."""
+        self.doc_content_hashes[doc_id] = content_hash
+        self._documents_by_hash[content_hash] = doc_id
+
+    def _set_expiry(self, doc_id: str, expires_at: Optional[float]) -> None:
+        """Record (or clear) the expiry time of a document."""
+        if expires_at is None:
+            self._expires_at.pop(doc_id, None)
+        else:
+            self._expires_at[doc_id] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, doc_id))
+
+    def _apply_add(self, doc_id: str, chunks: List[str], embeddings_array: np.ndarray,
+                   start_id: int, expires_at: Optional[float] = None,
+                   token_counts: Optional[np.ndarray] = None, content_hash: Optional[str] = None,
+                   char_spans: Optional[np.ndarray] = None) -> None:
+        """
+        Add already-embedded chunks to the index and the chunk mappings.
+        
+        Args:
+            doc_id: Unique identifier for the document
+            chunks: List of text chunks from the document
+            embeddings_array: Embeddings of the chunks, one row per chunk
+            start_id: FAISS id of the first chunk; ids are consecutive
+            expires_at: UNIX time at which the document expires, if any
+            token_counts: Token count of each chunk (default: count them here)
+            content_hash: Hash of the uploaded file the document came from, if known
+            char_spans: Start and end character offsets of each chunk, if known
+        """
+        self._ensure_writable()
+        
         # Store the chunks and update the mapping
-        start_idx = self.index.ntotal
-        self.doc_chunks[doc_id] = chunks
+        vector_ids = np.arange(start_id, start_id + len(chunks), dtype=np.int64)
+        self._next_id = max(self._next_id, start_id + len(chunks))
+        self.chunk_map.add(doc_id, start_id, chunks)
+        
+        # Add embeddings to FAISS index and the chunk text to the keyword index
+        self.index.add_with_ids(embeddings_array, vector_ids)
+        if self._exact is not None:
+            self._exact.add(vector_ids, embeddings_array)
+        self.lexical_index.add(vector_ids, chunks)
+        self.doc_vector_ids[doc_id] = vector_ids
+        self.doc_token_counts[doc_id] = token_counts if token_counts is not None else count_tokens_batch(chunks)
+        if char_spans is not None:
+            self.doc_char_spans[doc_id] = char_spans
+        self.doc_chunk_digests[doc_id] = chunk_digests(chunks)
+        if content_hash is not None:
+            self._set_content_hash(doc_id, content_hash)
+        self._set_expiry(doc_id, expires_at)
+        self._mutations += 1
+        
+        self._maybe_train()
+
+    def _apply_delete(self, doc_id: str) -> None:
+        """
+        Drop a document's chunks and tombstone its vectors.
+        
+        Args:
+            doc_id: Unique identifier for the document
+        """
+        vector_ids = self.doc_vector_ids.pop(doc_id)
+        self.chunk_map.remove(vector_ids)
+        self.doc_token_counts.pop(doc_id, None)
+        self.doc_char_spans.pop(doc_id, None)
+        self.doc_chunk_digests.pop(doc_id, None)
+        content_hash = self.doc_content_hashes.pop(doc_id, None)
+        if content_hash is not None and self._documents_by_hash.get(content_hash) == doc_id:
+            del self._documents_by_hash[content_hash]
+        self._expires_at.pop(doc_id, None)
+        self._tombstones.update(vector_ids.tolist())
+        self._live_selector = None
+        self.lexical_index.remove(vector_ids)
+        if self._exact is not None:
+            self._exact.remove(vector_ids)
+        self._mutations += 1
+
+    def _maybe_train(self) -> None:
+        """
+        Switch from the flat staging index to the configured ANN index once
+        enough vectors exist to train it. FAISS ids are carried over unchanged.
+        """
+        if self._untrained_index is None or self.index.ntotal < self.train_threshold:
+            return
+        vector_ids = faiss.vector_to_array(self.index.id_map)
+        vectors = base_index(self.index).reconstruct_n(0, self.index.ntotal)
+        trained_index = self._untrained_index
+        trained_index.train(vectors)
+        trained_index = id_mapped(trained_index)
+        trained_index.add_with_ids(vectors, vector_ids)
+        self.index = trained_index
+        self._untrained_index = None
+
+    def _maybe_schedule_compaction(self) -> None:
+        """Start a background compaction once the tombstone ratio passes the threshold."""
+        if not self._tombstones or len(self._tombstones) < self.compaction_threshold * self.index.ntotal:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, name="vector-store-compaction", daemon=True)
+        self._compaction_thread.start()
+
+    # PUBLIC_INTERFACE
+    def compact(self) -> int:
+        """
+        Physically remove deleted vectors from the index.
+        
+        Flat indexes drop them in place with ``remove_ids``. Graph and IVF
+        indexes are rebuilt from the live vectors outside the lock, so searches
+        keep running against the old index in the meantime.
+        
+        Returns:
+            int: Number of vectors removed
+            
+        Raises:
+            RuntimeError: If the store is read-only
+        """
+        self._check_writable()
+        with self._lock:
+            dead = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+            if not len(dead):
+                return 0
+            self._ensure_writable()
+            if isinstance(base_index(self.index), faiss.IndexFlatCodes):
+                self.index.remove_ids(faiss.IDSelectorBatch(dead))
+                self._forget_tombstones(dead)
+                self._compact_stores()
+                return len(dead)
+            vector_ids = faiss.vector_to_array(self.index.id_map)
+            live_ids = vector_ids[~np.isin(vector_ids, dead)]
+            live_vectors = self._exact_vectors(live_ids)
+            cutoff = self._next_id
+            rebuilt = empty_copy(self.index)
         
-        # Add embeddings to FAISS index
-        embeddings_array = np.array(embeddings)
-        self.index.add(embeddings_array)
+        rebuilt.add_with_ids(live_vectors, live_ids)
         
-        # Update chunk mapping
-        for i in range(len(chunks)):
-            self.chunk_map[start_idx + i] = (doc_id, i)
+        with self._lock:
+            # Carry over documents that were added while rebuilding
+            vector_ids = faiss.vector_to_array(self.index.id_map)
+            added = vector_ids[vector_ids >= cutoff]
+            if len(added):
+                rebuilt.add_with_ids(self._exact_vectors(added), added)
+            self.index = rebuilt
+            self._forget_tombstones(dead)
+            self._compact_stores()
+        return len(dead)
+
+    def _compact_stores(self) -> None:
+        """Reclaim the space deleted chunks hold outside the index. Caller holds the lock."""
+        self.lexical_index.compact()
+        self.chunk_map.compact()
+        if self._exact is not None:
+            self._exact.compact()
+
+    def _exact_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Vectors as they were added, from the archive or else the index. Caller holds the lock.
+        
+        Indexes that compress vectors return approximations when there is no archive.
+        """
+        if self._exact is not None:
+            return self._exact.get(ids)
+        return self.index.reconstruct_batch(ids)
+
+    def _rerank(self, queries: np.ndarray, distances: np.ndarray, indices: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-score index candidates against their float32 vectors and keep the best k.
+        
+        Args:
+            queries: (queries, dimension) matrix
+            distances: Approximate distances from the index, one row per query
+            indices: Candidate ids, -1 for missing results
+            k: Results to keep per query
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Exact (distances, indices), each shaped (queries, <=k)
+        """
+        if self._exact is None or not indices.size:
+            return distances[:, :k], indices[:, :k]
+        valid = indices >= 0
+        rows = np.nonzero(valid)[0]
+        vectors = self._exact.get(indices[valid])
+        exact = np.full(indices.shape, np.inf, dtype=np.float32)
+        exact[valid] = ((vectors - queries[rows]) ** 2).sum(axis=1)
+        top = np.argsort(exact, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(exact, top, axis=1), np.take_along_axis(indices, top, axis=1)
+
+    def _forget_tombstones(self, removed: np.ndarray) -> None:
+        """Clear tombstones for vectors that are no longer in the index."""
+        self._tombstones.difference_update(removed.tolist())
+        self._live_selector = None
+
+    def _exclude_deleted(self) -> Optional[faiss.IDSelector]:
+        """Selector accepting every id except tombstoned ones, or None if nothing is deleted."""
+        if not self._tombstones:
+            return None
+        if self._live_selector is None:
+            deleted = faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype=np.int64))
+            # Keep the inner selector alive alongside the wrapper that points to it
+            self._live_selector = (faiss.IDSelectorNot(deleted), deleted)
+        return self._live_selector[0]
+
+    # PUBLIC_INTERFACE
+    def has_document(self, doc_id: str) -> bool:
+        """
+        Check whether a document is currently in the store.
+        
+        Args:
+            doc_id: Unique identifier for the document
+            
+        Returns:
+            bool: True if the document's chunks are indexed
+        """
+        return doc_id in self.doc_vector_ids
 
     # PUBLIC_INTERFACE
-    def search_similar(self, query: str, k: int = 5) -> List[Dict]:
+    def document_version(self, doc_id: Optional[str] = None) -> Optional[int]:
+        """
+        Return a value that changes whenever a document's contents change.
+        
+        A document's version is the id of its first vector, which is fresh for
+        every add or replace. Without a doc_id the version covers the whole store.
+        
+        Args:
+            doc_id: Unique identifier for the document (default: the whole store)
+            
+        Returns:
+            Optional[int]: The version, or None if the document is not in the store
+        """
+        if doc_id is None:
+            return self._mutations
+        vector_ids = self.doc_vector_ids.get(doc_id)
+        if vector_ids is None or not len(vector_ids):
+            return None
+        return int(vector_ids[0])
+
+    # PUBLIC_INTERFACE
+    def stats(self) -> Dict[str, int]:
+        """
+        Report the size of the store.
+        
+        Returns:
+            Dict[str, int]: Documents, live chunks and vectors in the index,
+            which include deleted ones until the next compaction
+        """
+        with self._lock:
+            return {"documents": len(self.doc_vector_ids), "chunks": len(self.chunk_map),
+                    "vectors": int(self.index.ntotal)}
+
+    def _search_documents(self, query_embeddings: np.ndarray, k: int, doc_ids: List[str],
+                          nprobe: Optional[int], ef_search: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search only the chunks belonging to the given documents.
+        
+        Small scopes are scored exactly against their reconstructed vectors, so
+        the cost depends on the size of the documents rather than of the store.
+        Large scopes use a filtered index search instead.
+        
+        Args:
+            query_embeddings: The query vector, or a (queries, dimension) matrix
+            k: Number of results to return per query
+            doc_ids: Documents to search within
+            nprobe: IVF cells to visit for a filtered search
+            ef_search: HNSW candidate list size for a filtered search
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (distances, indices), each shaped (queries, <=k)
+        """
+        queries = np.atleast_2d(query_embeddings)
+        id_arrays = [self.doc_vector_ids[doc_id] for doc_id in doc_ids if doc_id in self.doc_vector_ids]
+        if not id_arrays:
+            return (np.empty((len(queries), 0), dtype=np.float32),
+                    np.empty((len(queries), 0), dtype=np.int64))
+        ids = np.concatenate(id_arrays)
+        
+        if len(ids) > self.max_exact_candidates:
+            selector = faiss.IDSelectorBatch(ids)
+            return self.index.search(
+                queries, k,
+                params=search_parameters(self.index, nprobe, ef_search, sel=selector)
+            )
+        
+        vectors = self._exact_vectors(ids)
+        # Squared L2 distances of every query to every scoped chunk in one product
+        distances = ((queries ** 2).sum(axis=1)[:, None] + (vectors ** 2).sum(axis=1)[None, :]
+                     - 2 * queries @ vectors.T)
+        np.maximum(distances, 0, out=distances)
+        top = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, top, axis=1), ids[top]
+
+    # PUBLIC_INTERFACE
+    def search_similar(self, query: str, k: int = 5, nprobe: Optional[int] = None,
+                       ef_search: Optional[int] = None,
+                       doc_ids: Optional[List[str]] = None,
+                       with_metadata: bool = False) -> List[Dict]:
         """
         Search for similar text chunks using the query.
         
+        In hybrid mode, identifier-like queries (clause or part numbers) are
+        answered from the keyword index without an embedding call when the
+        identifier itself occurs in a chunk; other queries fuse vector and
+        keyword results.
+        
         Args:
             query: The search query text
             k: Number of similar chunks to return (default: 5)
+            nprobe: IVF cells to visit for this query (default: store setting)
+            ef_search: HNSW candidate list size for this query (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
             
         Returns:
-            List[Dict]: List of dictionaries containing similar chunks and their metadata
+            List[Dict]: List of dictionaries containing similar chunks and their metadata.
+            Keyword-only matches have a ``distance`` of None.
         """
+        if self.retrieval_mode == "hybrid" and is_identifier_query(query):
+            results = self.search_lexical(query, k, doc_ids, with_metadata, require_identifier=True)
+            if results:
+                return results
+        
         # Generate query embedding
         query_embedding = self.generate_embeddings(query)
+        return self.search_by_embedding(query_embedding, k, nprobe, ef_search, doc_ids, with_metadata,
+                                        query_text=query)
+
+    # PUBLIC_INTERFACE
+    async def asearch_similar(self, query: str, k: int = 5, nprobe: Optional[int] = None,
+                              ef_search: Optional[int] = None,
+                              doc_ids: Optional[List[str]] = None,
+                              with_metadata: bool = False) -> List[Dict]:
+        """
+        Search for similar text chunks without blocking the event loop.
         
-        # Perform similarity search
-        distances, indices = self.index.search(
-            np.array([query_embedding]), k
-        )
+        The query is embedded with the backend's async client and the index
+        search, which may wait on the store lock, runs in a worker thread.
         
-        # Format results
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and idx in self.chunk_map:  # -1 indicates no result found
-                doc_id, chunk_idx = self.chunk_map[idx]
-                results.append({
-                    "doc_id": doc_id,
-                    "chunk": self.doc_chunks[doc_id][chunk_idx],
-                    "distance": float(distances[0][i])
-                })
+        Args:
+            query: The search query text
+            k: Number of similar chunks to return (default: 5)
+            nprobe: IVF cells to visit for this query (default: store setting)
+            ef_search: HNSW candidate list size for this query (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
+            
+        Returns:
+            List[Dict]: List of dictionaries containing similar chunks and their metadata.
+            Keyword-only matches have a ``distance`` of None.
+        """
+        if self.retrieval_mode == "hybrid" and is_identifier_query(query):
+            results = await run_in_threadpool(self.search_lexical, query, k, doc_ids, with_metadata, True)
+            if results:
+                return results
+        
+        query_embedding = await self.agenerate_embeddings(query)
+        return await run_in_threadpool(self.search_by_embedding, query_embedding, k, nprobe, ef_search,
+                                       doc_ids, with_metadata, query)
+
+    # PUBLIC_INTERFACE
+    async def asearch_similar_batch(self, queries: List[str], k: int = 5, nprobe: Optional[int] = None,
+                                    ef_search: Optional[int] = None,
+                                    doc_ids: Optional[List[str]] = None,
+                                    with_metadata: bool = False) -> List[List[Dict]]:
+        """
+        Search for the chunks most similar to each of many queries.
+        
+        Identifier-like queries whose identifier occurs in a chunk are answered
+        from the keyword index as in ``search_similar``. The rest are embedded in one
+        batched request and searched as a single matrix query.
+        
+        Args:
+            queries: The search query texts
+            k: Number of similar chunks to return per query (default: 5)
+            nprobe: IVF cells to visit (default: store setting)
+            ef_search: HNSW candidate list size (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
+            
+        Returns:
+            List[List[Dict]]: One result list per query, in input order
+        """
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        if self.retrieval_mode == "hybrid":
+            for i, query in enumerate(queries):
+                if is_identifier_query(query):
+                    results[i] = await run_in_threadpool(self.search_lexical, query, k, doc_ids, with_metadata,
+                                                         True) or None
+        
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            texts = [queries[i] for i in pending]
+            query_embeddings = await self.agenerate_embeddings_batch(texts)
+            found = await run_in_threadpool(self.search_batch_by_embedding, query_embeddings, k, nprobe,
+                                            ef_search, doc_ids, with_metadata, texts)
+            for i, result in zip(pending, found):
+                results[i] = result
+        return results
+
+    # PUBLIC_INTERFACE
+    def search_lexical(self, query: str, k: int = 5, doc_ids: Optional[List[str]] = None,
+                       with_metadata: bool = False, require_identifier: bool = False,
+                       statistics: Optional[Tuple[int, int, Dict[str, int]]] = None) -> List[Dict]:
+        """
+        Search the keyword index only, without embedding the query.
+        
+        Args:
+            query: The search query text
+            k: Number of chunks to return (default: 5)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return ``chunk_index`` and ``tokens`` of each chunk
+            require_identifier: Return nothing unless one of the query's numbers or
+                codes occurs in a chunk, so matches on words like "what" don't count
+            statistics: BM25 collection statistics to score with, combined across
+                shards (default: this store's own)
+            
+        Returns:
+            List[Dict]: Matching chunks, best BM25 score first, with a ``distance``
+            of None and their BM25 ``score``
+        """
+        self.evict_expired()
+        
+        with stage("lexical"), self._lock:
+            ids, scores = self.lexical_index.search(query, k, self._scope_ids(doc_ids),
+                                                    identifier_terms(query) if require_identifier else None,
+                                                    statistics)
+            results = self._format_results(ids, [None] * len(ids), with_metadata)
+        for result, score in zip(results, scores.tolist()):
+            result["score"] = score
+        return results
+
+    # PUBLIC_INTERFACE
+    def search_by_embedding(self, query_embedding: np.ndarray, k: int = 5, nprobe: Optional[int] = None,
+                            ef_search: Optional[int] = None,
+                            doc_ids: Optional[List[str]] = None,
+                            with_metadata: bool = False,
+                            query_text: Optional[str] = None) -> List[Dict]:
+        """
+        Search for the chunks closest to an already computed query embedding.
+        
+        Args:
+            query_embedding: The query vector
+            k: Number of similar chunks to return (default: 5)
+            nprobe: IVF cells to visit for this query (default: store setting)
+            ef_search: HNSW candidate list size for this query (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
+            query_text: The query's text; in hybrid mode its keyword matches are
+                fused with the vector results by reciprocal rank
+            
+        Returns:
+            List[Dict]: List of dictionaries containing similar chunks and their metadata
+        """
+        return self.search_batch_by_embedding(
+            np.asarray(query_embedding).reshape(1, -1), k, nprobe, ef_search, doc_ids, with_metadata,
+            None if query_text is None else [query_text]
+        )[0]
+
+    # PUBLIC_INTERFACE
+    def search_batch_by_embedding(self, query_embeddings: np.ndarray, k: int = 5,
+                                  nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                                  doc_ids: Optional[List[str]] = None,
+                                  with_metadata: bool = False,
+                                  query_texts: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        Search for the chunks closest to each of many query embeddings.
+        
+        All queries go to the index as one matrix, so FAISS scans the data once
+        for the whole batch.
+        
+        Args:
+            query_embeddings: A (queries, dimension) matrix
+            k: Number of similar chunks to return per query (default: 5)
+            nprobe: IVF cells to visit (default: store setting)
+            ef_search: HNSW candidate list size (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return each chunk's position in its document
+                (``chunk_index``) and token count (``tokens``)
+            query_texts: The queries' texts; in hybrid mode each query's keyword
+                matches are fused with its vector results by reciprocal rank
+            
+        Returns:
+            List[List[Dict]]: One result list per query, in input order
+        """
+        self.evict_expired()
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        hybrid = query_texts is not None and self.retrieval_mode == "hybrid"
+        candidates = max(k, self.hybrid_candidates) if hybrid else k
+        
+        with stage("search"), self._lock:
+            results = []
+            vector_hits = self._vector_candidates(query_embeddings, candidates, nprobe, ef_search, doc_ids)
+            for row, (query_embedding, found) in enumerate(zip(query_embeddings, vector_hits)):
+                if hybrid:
+                    found = self._fuse_lexical(found, query_embedding, query_texts[row], candidates, k, doc_ids)
+                found = found[:k]
                 
-        return results
\ No newline at end of file
+                # Format results
+                results.append(self._format_results([i for i, _ in found], [d for _, d in found], with_metadata))
+            return results
+
+    # PUBLIC_INTERFACE
+    def search_hybrid_candidates(self, query_embeddings: np.ndarray, query_texts: List[str], candidates: int,
+                                 nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                                 doc_ids: Optional[List[str]] = None,
+                                 with_metadata: bool = False,
+                                 statistics: Optional[Tuple[int, int, Dict[str, int]]] = None
+                                 ) -> List[Tuple[List[Dict], List[Dict]]]:
+        """
+        Find each query's vector and keyword candidates without fusing them.
+        
+        A sharded store merges each list across its shards and fuses the
+        merged lists, as a single store fuses its own.
+        
+        Args:
+            query_embeddings: A (queries, dimension) matrix
+            query_texts: The queries' texts
+            candidates: Results taken from each retriever
+            nprobe: IVF cells to visit (default: store setting)
+            ef_search: HNSW candidate list size (default: store setting)
+            doc_ids: Restrict the search to these documents (default: all documents)
+            with_metadata: Also return ``chunk_index`` and ``tokens`` of each chunk
+            statistics: BM25 collection statistics to score with, combined across
+                shards (default: this store's own)
+            
+        Returns:
+            List[Tuple[List[Dict], List[Dict]]]: Per query, the vector hits closest
+            first and the keyword hits best first, with their BM25 ``score`` and
+            exact ``distance``
+        """
+        self.evict_expired()
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        with stage("search"), self._lock:
+            results = []
+            vector_hits = self._vector_candidates(query_embeddings, candidates, nprobe, ef_search, doc_ids)
+            for query_embedding, query_text, found in zip(query_embeddings, query_texts, vector_hits):
+                lexical_ids, scores = self.lexical_index.search(query_text, candidates, self._scope_ids(doc_ids),
+                                                                statistics=statistics)
+                distances = []
+                if len(lexical_ids):
+                    distances = ((self._exact_vectors(lexical_ids) - query_embedding) ** 2).sum(axis=1).tolist()
+                lexical = self._format_results(lexical_ids, distances, with_metadata)
+                for result, score in zip(lexical, scores.tolist()):
+                    result["score"] = score
+                results.append((self._format_results([i for i, _ in found], [d for _, d in found], with_metadata),
+                                lexical))
+            return results
+
+    # PUBLIC_INTERFACE
+    def lexical_statistics(self, query_texts: List[str]) -> Tuple[int, int, Dict[str, int]]:
+        """
+        BM25 collection statistics for the terms of some queries.
+        
+        Args:
+            query_texts: The queries' texts
+            
+        Returns:
+            Tuple[int, int, Dict[str, int]]: Live chunks, their total length and
+            the document frequency of each query term
+        """
+        self.evict_expired()
+        with self._lock:
+            return self.lexical_index.statistics(itertools.chain.from_iterable(map(tokenize, query_texts)))
+
+    def _vector_candidates(self, query_embeddings: np.ndarray, candidates: int, nprobe: Optional[int],
+                           ef_search: Optional[int], doc_ids: Optional[List[str]]) -> List[List[Tuple[int, float]]]:
+        """
+        Each query's closest live chunks as (chunk id, distance) pairs, closest first. Caller holds the lock.
+        """
+        # A compressed index only shortlists; the float32 vectors decide the order
+        fetch = candidates * self.rerank_factor if self._exact is not None else candidates
+        if doc_ids is not None:
+            distances, indices = self._search_documents(query_embeddings, fetch, doc_ids, nprobe, ef_search)
+        else:
+            distances, indices = self.index.search(
+                query_embeddings, fetch,
+                params=search_parameters(self.index, nprobe, ef_search, sel=self._exclude_deleted())
+            )
+        distances, indices = self._rerank(query_embeddings, distances, indices, candidates)
+        # -1 indicates no result found
+        return [[(int(idx), float(distance)) for idx, distance in zip(indices[row], distances[row])
+                 if idx != -1 and idx in self.chunk_map]
+                for row in range(len(query_embeddings))]
+
+    def _fuse_lexical(self, found: List[Tuple[int, float]], query_embedding: np.ndarray, query_text: str,
+                      candidates: int, k: int, doc_ids: Optional[List[str]]) -> List[Tuple[int, float]]:
+        """
+        Merge a query's vector hits with its keyword hits. Caller holds the lock.
+        
+        Args:
+            found: (chunk id, distance) vector hits, closest first
+            query_embedding: The query vector
+            query_text: The query text
+            candidates: Keyword hits to consider
+            k: Number of fused hits to return
+            doc_ids: Restrict keyword hits to these documents
+            
+        Returns:
+            List[Tuple[int, float]]: (chunk id, distance) pairs in fused rank order
+        """
+        lexical_ids, _ = self.lexical_index.search(query_text, candidates, self._scope_ids(doc_ids))
+        if not len(lexical_ids):
+            return found
+        vector_distances = dict(found)
+        fused = reciprocal_rank_fusion([list(vector_distances), lexical_ids.tolist()])[:k]
+        # Keyword-only matches get their exact distance so scores stay comparable
+        missing = np.array([i for i, _ in fused if i not in vector_distances], dtype=np.int64)
+        if len(missing):
+            vectors = self._exact_vectors(missing)
+            exact = ((vectors - query_embedding) ** 2).sum(axis=1)
+            vector_distances.update(zip(missing.tolist(), exact.tolist()))
+        return [(i, vector_distances[i]) for i, _ in fused]
+
+    def _scope_ids(self, doc_ids: Optional[List[str]]) -> Optional[np.ndarray]:
+        """Chunk ids of the given documents, or None for no restriction."""
+        if doc_ids is None:
+            return None
+        id_arrays = [self.doc_vector_ids[doc_id] for doc_id in doc_ids if doc_id in self.doc_vector_ids]
+        return np.concatenate(id_arrays) if id_arrays else np.empty(0, dtype=np.int64)
+
+    def _format_results(self, ids, distances, with_metadata: bool) -> List[Dict]:
+        """
+        Turn chunk ids into result dictionaries. Caller holds the lock.
+        
+        Args:
+            ids: Chunk ids, best first
+            distances: Distance of each chunk (None for keyword-only matches)
+            with_metadata: Include ``chunk_index`` and ``tokens``, and ``char_start``
+                and ``char_end`` where the chunk's offsets are known
+            
+        Returns:
+            List[Dict]: One dictionary per chunk still in the store
+        """
+        results = []
+        for idx, distance in zip(ids, distances):
+            if idx not in self.chunk_map:
+                continue
+            doc_id, chunk_idx = self.chunk_map[idx]
+            result = {
+                "doc_id": doc_id,
+                "chunk": self.chunk_map.text(idx),
+                "distance": None if distance is None else float(distance)
+            }
+            if with_metadata:
+                result["chunk_index"] = chunk_idx
+                result["tokens"] = int(self.doc_token_counts[doc_id][chunk_idx])
+                spans = self.doc_char_spans.get(doc_id)
+                if spans is not None:
+                    result["char_start"], result["char_end"] = spans[chunk_idx].tolist()
+            results.append(result)
+        return results
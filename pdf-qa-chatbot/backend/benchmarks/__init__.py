@@ -0,0 +1,4 @@
+"""
+Offline benchmarks for the PDF QA Chatbot backend.
+Run from the backend directory, e.g. ``python -m benchmarks.bench_ingest``.
+"""
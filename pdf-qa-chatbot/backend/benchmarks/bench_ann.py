@@ -0,0 +1,79 @@
+"""
+Recall-vs-latency benchmark for the ANN index types against the flat index.
+
+Uses clustered synthetic vectors so IVF partitioning behaves like it does on
+real embeddings.
+
+    python -m benchmarks.bench_ann --vectors 100000 --dimension 256
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.faiss_index import build_index, search_parameters
+
+
+def synthetic_vectors(n: int, dimension: int, clusters: int, seed: int) -> np.ndarray:
+    """Gaussian-mixture vectors, normalized like typical text embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_search(index, queries: np.ndarray, k: int, **params):
+    """Run one query at a time, as the QA path does, and return (ids, ms/query)."""
+    search_params = search_parameters(index, **params)
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        ids[i] = index.search(query.reshape(1, -1), k, params=search_params)[1][0]
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of true top-k neighbours that were returned."""
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=32)
+    args = parser.parse_args()
+
+    data = synthetic_vectors(args.vectors, args.dimension, args.clusters, seed=0)
+    queries = synthetic_vectors(args.queries, args.dimension, args.clusters, seed=1)
+
+    flat = build_index("flat", args.dimension)
+    flat.add(data)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+    print(f"{'index':<10} {'setting':<14} {'build s':>8} {'ms/query':>9} {'recall@' + str(args.k):>10}")
+    print(f"{'flat':<10} {'-':<14} {0:>8.1f} {flat_ms:>9.3f} {1.0:>10.3f}")
+
+    sweeps = [
+        ("hnsw", "ef_search", [16, 64, 128, 256]),
+        ("ivf_flat", "nprobe", [1, 8, 32, 64]),
+        ("ivf_pq", "nprobe", [8, 32, 64]),
+    ]
+    for index_type, param, values in sweeps:
+        start = time.perf_counter()
+        index = build_index(index_type, args.dimension, nlist=args.nlist, pq_m=args.pq_m)
+        if not index.is_trained:
+            index.train(data)
+        index.add(data)
+        build_s = time.perf_counter() - start
+        for value in values:
+            found, ms = timed_search(index, queries, args.k, **{param: value})
+            print(f"{index_type:<10} {f'{param}={value}':<14} {build_s:>8.1f} {ms:>9.3f} "
+                  f"{recall_at_k(found, truth):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
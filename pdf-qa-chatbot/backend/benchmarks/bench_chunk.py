@@ -0,0 +1,78 @@
+"""
+Chunking throughput benchmark: the original sentence loop vs the structure-aware chunker.
+
+Chunks the extracted text of a synthetic contract and reports MB/s and
+chunks/sec for each implementation.
+
+    python -m benchmarks.bench_chunk --pages 2000 --size 1000 --overlap 150
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from app.services.chunker import Chunker
+from benchmarks.synthetic_pdf import page_lines
+
+
+def legacy_chunk(text: str, chunk_size: int) -> List[str]:
+    """The original split-on-'.' loop with ``current_chunk +=`` concatenation."""
+    chunks = []
+    current_chunk = ""
+    for sentence in text.replace('\n', ' ').split('.'):
+        if len(current_chunk) + len(sentence) <= chunk_size:
+            current_chunk += sentence + '.'
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + '.'
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def make_pages(pages: int, lines_per_page: int) -> List[Tuple[int, str]]:
+    """Extracted-text stand-in: one heading and numbered clause lines per page."""
+    rng = random.Random(0)
+    return [(page, "\n".join(page_lines(page, lines_per_page, rng))) for page in range(1, pages + 1)]
+
+
+def best_of(repeats: int, run) -> Tuple[float, int]:
+    """Fastest wall time over ``repeats`` runs, and the number of chunks produced."""
+    best, count = float("inf"), 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        count = len(run())
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--lines-per-page", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1000, help="chunk size in characters")
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, args.lines_per_page)
+    text = "".join(page_text for _, page_text in pages)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    chunker = Chunker(size=args.size, overlap=args.overlap)
+    no_overlap = Chunker(size=args.size, overlap=0)
+
+    runs = [
+        ("legacy", lambda: legacy_chunk(text, args.size)),
+        ("chunker", lambda: chunker.chunk_pages(pages)),
+        ("chunker, no overlap", lambda: no_overlap.chunk_pages(pages)),
+    ]
+    print(f"{megabytes:.1f} MB of text, {args.pages} pages")
+    print(f"{'implementation':<20} {'seconds':>8} {'MB/s':>8} {'chunks':>8} {'chunks/sec':>11}")
+    for name, run in runs:
+        seconds, count = best_of(args.repeats, run)
+        print(f"{name:<20} {seconds:>8.3f} {megabytes / seconds:>8.1f} {count:>8} {count / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Chunk bookkeeping memory benchmark: per-chunk Python objects vs the array-backed ChunkStore.
+
+Builds the id -> (doc_id, chunk_idx) lookup and chunk text for N chunks both
+ways and reports the memory each holds, measured with tracemalloc. The
+legacy layout also counts the chunk lists PDFProcessor used to keep. The
+last row restores the store from a snapshot with its text memory-mapped,
+which leaves only the arrays on the heap.
+
+    python -m benchmarks.bench_chunk_memory --chunks 1000000 --chunk-chars 100
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from app.services.chunk_store import ChunkStore, open_arena
+
+
+def make_documents(chunks: int, chunks_per_doc: int, chunk_chars: int) -> List[Tuple[str, List[str]]]:
+    """Documents with uuid ids, as uploads get, and distinct chunk texts."""
+    rng = random.Random(0)
+    words = ["clause", "party", "agreement", "term", "notice", "payment", "liability", "section"]
+    documents = []
+    for start in range(0, chunks, chunks_per_doc):
+        texts = []
+        for i in range(start, min(start + chunks_per_doc, chunks)):
+            text = f"{i} " + " ".join(rng.choice(words) for _ in range(chunk_chars // 6))
+            texts.append(text[:chunk_chars])
+        documents.append((str(uuid.UUID(int=rng.getrandbits(128))), texts))
+    return documents
+
+
+def legacy(documents):
+    """The previous layout: dict chunk_map, doc_chunks lists, and PDFProcessor's copy."""
+    chunk_map, doc_chunks, processed_files = {}, {}, {}
+    next_id = 0
+    for doc_id, texts in documents:
+        # Texts arrive as fresh strings, as they did from the chunker
+        chunks = [text.encode("utf-8").decode("utf-8") for text in texts]
+        processed_files[doc_id] = chunks
+        doc_chunks[doc_id] = list(chunks)
+        for i in range(len(chunks)):
+            chunk_map[next_id + i] = (doc_id, i)
+        next_id += len(chunks)
+    return chunk_map, doc_chunks, processed_files
+
+
+def compact(documents):
+    """ChunkStore: one text copy in the arena, id lookups in arrays."""
+    store = ChunkStore()
+    next_id = 0
+    for doc_id, texts in documents:
+        store.add(doc_id, next_id, texts)
+        next_id += len(texts)
+    return store
+
+
+def mapped(path: str):
+    """Build for the memory-mapped case: restore a store from its exported snapshot files."""
+    def build(documents):
+        with open(path + ".rows", "rb") as rows:
+            arrays = [np.load(rows) for _ in range(3)]
+        return ChunkStore.from_rows([doc_id for doc_id, _ in documents], *arrays, open_arena(path, True))
+    return build
+
+
+def measure(build: Callable, documents) -> Tuple[float, float]:
+    """Memory held by what ``build`` returns, in MB, and the build time in seconds."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = build(documents)
+    seconds = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return retained / 1e6, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--chunks-per-doc", type=int, default=200)
+    parser.add_argument("--chunk-chars", type=int, default=100)
+    args = parser.parse_args()
+
+    documents = make_documents(args.chunks, args.chunks_per_doc, args.chunk_chars)
+    text_mb = sum(len(text.encode("utf-8")) for _, texts in documents for text in texts) / 1e6
+    print(f"{args.chunks} chunks in {len(documents)} documents, {text_mb:.1f} MB of UTF-8 text")
+    print(f"{'layout':<12} {'MB':>9} {'bytes/chunk':>12} {'build s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "text.bin")
+        _, ids, doc_numbers, offsets, text = compact(documents).export()
+        with open(path, "wb") as text_file:
+            text_file.write(text)
+        with open(path + ".rows", "wb") as rows:
+            for array in (ids, doc_numbers, offsets):
+                np.save(rows, array)
+        del text
+        for name, build in [("legacy", legacy), ("chunk store", compact), ("mmap store", mapped(path))]:
+            megabytes, seconds = measure(build, documents)
+            print(f"{name:<12} {megabytes:>9.1f} {megabytes * 1e6 / args.chunks:>12.0f} {seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+PDF text extraction benchmark: pages/sec and peak RSS.
+
+Each mode runs in a fresh interpreter so peak RSS is not polluted by the
+previous run.
+
+    python -m benchmarks.bench_extract --pages 400
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import PyPDF2
+
+from app.services.pdf_processor import PDFProcessor
+from benchmarks.synthetic_pdf import make_pdf
+
+
+def legacy_extract(path: str) -> str:
+    """The original single-threaded ``text +=`` loop."""
+    text = ""
+    for page in PyPDF2.PdfReader(path).pages:
+        text += page.extract_text()
+    return text
+
+
+def run_mode(mode: str, path: str, workers: int) -> dict:
+    """Extract the PDF once with the given mode and report timings."""
+    processor = PDFProcessor(
+        parallel_page_threshold=1 if mode == "parallel" else 10 ** 9,
+        max_workers=workers,
+    )
+    start = time.perf_counter()
+    if mode == "legacy":
+        pages = PyPDF2.PdfReader(path).pages
+        page_count = len(pages)
+        legacy_extract(path)
+    elif mode == "streaming":
+        with open(path, "rb") as pdf_file:
+            page_count = sum(1 for _ in processor.iter_pages(pdf_file))
+    else:
+        page_count = len(processor.extract_pages(path))
+    elapsed = time.perf_counter() - start
+    processor.close()
+    # ru_maxrss is KiB on Linux; include worker processes for the parallel mode
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"mode": mode, "pages": page_count, "seconds": elapsed,
+            "pages_per_sec": page_count / elapsed, "peak_rss_mib": peak_kib / 1024,
+            "worker_peak_rss_mib": child_kib / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines-per-page", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.path, args.workers)))
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+        pdf_file.write(make_pdf(args.pages, args.lines_per_page))
+    try:
+        print(f"{'mode':<10} {'pages/sec':>10} {'peak RSS MiB':>13} {'worker RSS MiB':>15}")
+        for mode in ("legacy", "streaming", "parallel"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_extract", "--mode", mode,
+                 "--path", pdf_file.name, "--workers", str(args.workers)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<10} {result['pages_per_sec']:>10.1f} {result['peak_rss_mib']:>13.1f} "
+                  f"{result['worker_peak_rss_mib']:>15.1f}")
+    finally:
+        os.remove(pdf_file.name)
+
+
+if __name__ == "__main__":
+    main()
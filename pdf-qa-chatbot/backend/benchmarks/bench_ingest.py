@@ -0,0 +1,49 @@
+"""
+Ingest throughput benchmark for the embedding pipeline.
+
+Compares the old one-request-per-chunk behaviour with batched, concurrent
+embedding against a fake backend that simulates API latency.
+
+    python -m benchmarks.bench_ingest --chunks 2000 --latency 0.05
+"""
+import argparse
+import time
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.embedding_pipeline import EmbeddingPipeline
+
+
+def run(pipeline: EmbeddingPipeline, texts) -> float:
+    """Embed ``texts`` once and return throughput in chunks/sec."""
+    start = time.perf_counter()
+    pipeline.embed(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per request")
+    parser.add_argument("--per-item-latency", type=float, default=0.0005)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    backend = FakeEmbeddingBackend(dimension=args.dimension, latency=args.latency,
+                                   per_item_latency=args.per_item_latency)
+    texts = [(f"chunk {i} " * args.chunk_chars)[:args.chunk_chars] for i in range(args.chunks)]
+
+    configs = [
+        ("serial, batch=1", EmbeddingPipeline(backend, max_batch_size=1, max_concurrency=1)),
+        ("serial, batch=128", EmbeddingPipeline(backend, max_batch_size=128, max_concurrency=1)),
+        ("concurrent=4, batch=128", EmbeddingPipeline(backend, max_batch_size=128, max_concurrency=4)),
+        ("concurrent=8, batch=64", EmbeddingPipeline(backend, max_batch_size=64, max_concurrency=8)),
+    ]
+    for name, pipeline in configs:
+        # The serial baseline is slow by design; sample it on a subset
+        sample = texts[:200] if pipeline.max_batch_size == 1 else texts
+        print(f"{name:<26} {run(pipeline, sample):>10.1f} chunks/sec")
+
+
+if __name__ == "__main__":
+    main()
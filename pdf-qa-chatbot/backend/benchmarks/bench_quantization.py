@@ -0,0 +1,102 @@
+"""
+Memory-vs-recall benchmark for VectorStore's reduced-precision storage modes.
+
+Indexes the same synthetic embeddings with float32, fp16 and int8 scalar
+quantization, with and without PCA / Matryoshka-style dimension reduction,
+and reports index memory per chunk and recall@k against exact float32 search,
+both straight from the compressed index and after float32 re-ranking. The
+vectors have low intrinsic dimension, like real text embeddings, so
+dimension reduction behaves realistically.
+
+    python -m benchmarks.bench_quantization --vectors 20000 --dimension 1536
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.vector_store import VectorStore
+
+
+def synthetic_embeddings(n: int, dimension: int, intrinsic: int, seed: int) -> np.ndarray:
+    """Unit vectors near a random ``intrinsic``-dimensional subspace, with decaying component scales."""
+    rng = np.random.default_rng(seed)
+    basis = np.linalg.qr(rng.standard_normal((dimension, intrinsic)))[0].T.astype(np.float32)
+    scales = (1.0 / np.sqrt(np.arange(1, intrinsic + 1))).astype(np.float32)
+    vectors = (rng.standard_normal((n, intrinsic)).astype(np.float32) * scales) @ basis
+    vectors += 0.02 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(data: np.ndarray, doc_size: int, **options) -> VectorStore:
+    """A vector-only store holding ``data``, one document per ``doc_size`` rows."""
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=data.shape[1]),
+                        retrieval_mode="vector", compaction_threshold=1.0, **options)
+    for number, start in enumerate(range(0, len(data), doc_size)):
+        rows = data[start:start + doc_size]
+        store.add_document(str(number), [f"chunk {start + i}" for i in range(len(rows))], embeddings=rows)
+    return store
+
+
+def search_ids(store: VectorStore, queries: np.ndarray, k: int, doc_size: int) -> np.ndarray:
+    """Row numbers of each query's top-k results."""
+    results = store.search_batch_by_embedding(queries, k=k, with_metadata=True)
+    return np.array([[int(r["doc_id"]) * doc_size + r["chunk_index"] for r in rows] for rows in results])
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of true top-k neighbours that were returned."""
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--intrinsic-dim", type=int, default=128)
+    parser.add_argument("--reduce-dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--train-size", type=int, default=5000)
+    parser.add_argument("--doc-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(args.vectors + args.queries, args.dimension, args.intrinsic_dim, seed=0)
+    data, queries = data[:args.vectors], data[args.vectors:]
+
+    truth = search_ids(build_store(data, args.doc_size), queries, args.k, args.doc_size)
+    modes = [
+        ("float32", {}),
+        ("fp16", {"vector_storage": "fp16"}),
+        ("sq8", {"vector_storage": "sq8"}),
+        (f"pca{args.reduce_dim}", {"reduce_dim": args.reduce_dim}),
+        (f"pca{args.reduce_dim}+sq8", {"reduce_dim": args.reduce_dim, "vector_storage": "sq8"}),
+        (f"trunc{args.reduce_dim}+fp16", {"reduce_dim": args.reduce_dim, "reduction": "truncate",
+                                          "vector_storage": "fp16"}),
+    ]
+    print(f"{args.vectors} vectors, dimension {args.dimension}, recall@{args.k} vs exact float32 search")
+    print(f"{'mode':<16} {'index B/chunk':>14} {'rerank B/chunk':>15} {'build s':>8} "
+          f"{'recall':>7} {'reranked':>9} {'ms/query':>9}")
+    for name, options in modes:
+        start = time.perf_counter()
+        store = build_store(data, args.doc_size, train_threshold=args.train_size,
+                            rerank_factor=args.rerank_factor, **options)
+        build_s = time.perf_counter() - start
+        index_bytes = faiss.serialize_index(store.index).nbytes / args.vectors
+        # The float32 copies live in the snapshot's memory-mapped vectors.npy once persisted
+        rerank_bytes = 4 * args.dimension if store._exact is not None else 0
+        start = time.perf_counter()
+        reranked = search_ids(store, queries, args.k, args.doc_size)
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        exact, store._exact = store._exact, None
+        approximate = search_ids(store, queries, args.k, args.doc_size)
+        store._exact = exact
+        print(f"{name:<16} {index_bytes:>14.0f} {rerank_bytes:>15} {build_s:>8.1f} "
+              f"{recall_at_k(approximate, truth):>7.3f} {recall_at_k(reranked, truth):>9.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
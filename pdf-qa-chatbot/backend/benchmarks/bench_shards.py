@@ -0,0 +1,98 @@
+"""
+Search latency and throughput vs number of shard processes.
+
+For each shard count, starts that many local shard processes, indexes the
+same synthetic documents across them (precomputed vectors, so only placement
+and indexing are timed) and measures: one-at-a-time latency of searches over
+all documents, which scatter to every shard, and of searches scoped to one
+document, which go to its shard only; and throughput with several searches
+in flight. The single-process store without a router is the baseline.
+
+    python -m benchmarks.bench_shards --shards 1 2 4 8 --documents 200 --chunks 500
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.sharding import ShardedVectorStore
+from app.services.vector_store import VectorStore
+from benchmarks.bench_ann import synthetic_vectors
+from benchmarks.load_qa import percentile
+
+
+def timed(search, queries: np.ndarray) -> List[float]:
+    """Latency of each query run one at a time."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query[None, :])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def throughput(search, queries: np.ndarray, concurrency: int) -> float:
+    """Queries per second with ``concurrency`` searches in flight."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda query: search(query[None, :]), queries))
+        return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=500, help="chunks per document")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    backend = FakeEmbeddingBackend(dimension=args.dimension)
+    total = args.documents * args.chunks
+    vectors = synthetic_vectors(total, args.dimension, clusters=64, seed=0)
+    queries = synthetic_vectors(args.queries, args.dimension, clusters=64, seed=1)
+    doc_ids = [f"doc-{d}" for d in range(args.documents)]
+    print(f"{total} vectors of dimension {args.dimension}, {args.index_type} index; {os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'index s':>8} {'p50 ms':>8} {'p99 ms':>8} {'doc p50':>8} {'doc p99':>8} {'q/s':>8}")
+
+    def run(label: str, store: VectorStore) -> None:
+        start = time.perf_counter()
+        for d, doc_id in enumerate(doc_ids):
+            rows = vectors[d * args.chunks:(d + 1) * args.chunks]
+            store.add_document(doc_id, [f"{doc_id} chunk {i}" for i in range(args.chunks)], embeddings=rows)
+        indexed = time.perf_counter() - start
+
+        def search(query):
+            return store.search_batch_by_embedding(query, k=args.k)
+
+        scoped = iter(doc_ids * (len(queries) // len(doc_ids) + 1))
+
+        def search_document(query):
+            return store.search_batch_by_embedding(query, k=args.k, doc_ids=[next(scoped)])
+
+        search(queries[:1])
+        latencies = timed(search, queries)
+        doc_latencies = timed(search_document, queries)
+        rate = throughput(search, queries, args.concurrency)
+        print(f"{label:>6} {indexed:>8.1f} {percentile(latencies, 50):>8.2f} {percentile(latencies, 99):>8.2f} "
+              f"{percentile(doc_latencies, 50):>8.2f} {percentile(doc_latencies, 99):>8.2f} {rate:>8.0f}")
+
+    run("none", VectorStore(embedding_backend=backend, index_type=args.index_type, retrieval_mode="vector"))
+    for num_shards in args.shards:
+        store = ShardedVectorStore.spawn(num_shards, backend, index_type=args.index_type, retrieval_mode="vector")
+        try:
+            run(str(num_shards), store)
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
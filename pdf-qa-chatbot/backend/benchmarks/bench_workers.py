@@ -0,0 +1,146 @@
+"""
+Question throughput vs uvicorn worker count with SERVING_MODE=shared.
+
+Indexes synthetic documents into a storage directory, then for each worker
+count starts ``uvicorn app.main:app --workers N`` on it, with an OpenAI stub
+answering completions after a fixed latency, and fires /question requests at
+it with a fixed number in flight. Reports throughput, latency and the memory
+of the worker processes: RSS counts the shared, memory-mapped index once per
+worker, PSS splits it between them. Query embeddings come from the offline
+fake backend, so each question costs one index search and one stub call.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --chunks 50000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.vector_store import VectorStore
+from benchmarks.load_qa import make_stub_app, percentile, start_stub_server
+
+
+def build_store(directory: str, documents: int, chunks: int) -> List[str]:
+    """Index ``documents`` documents of ``chunks`` chunks each and snapshot them."""
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(), storage_dir=directory,
+                        wal_sync=False, snapshot_interval=0)
+    rng = np.random.default_rng(0)
+    words = np.array(["clause", "party", "notice", "payment", "term", "liability", "section", "fee"])
+    doc_ids = [f"doc-{d}" for d in range(documents)]
+    for doc_id in doc_ids:
+        texts = [f"{doc_id} section {i}: " + " ".join(rng.choice(words, 12)) for i in range(chunks)]
+        store.add_document(doc_id, texts)
+    store.save_snapshot()
+    store.persistence.close()
+    return doc_ids
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def worker_memory(server: int, workers: int) -> Tuple[float, float]:
+    """Total RSS and PSS of the server's worker processes, in MB."""
+    pids = [server]
+    if workers > 1:
+        # uvicorn runs a single worker in its own process and more as child processes
+        with open(f"/proc/{server}/task/{server}/children") as children:
+            pids = [int(pid) for pid in children.read().split()]
+    rss = pss = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            fields: Dict[str, int] = {}
+            for line in rollup:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    fields[parts[0]] = int(parts[1])
+        rss += fields["Rss:"]
+        pss += fields["Pss:"]
+    return rss / 1024, pss / 1024
+
+
+async def run_load(base_url: str, doc_ids: List[str], questions: int, concurrency: int) -> List[float]:
+    """Ask ``questions`` questions with ``concurrency`` in flight; return each one's latency."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def ask(i: int) -> None:
+            body = {"question": f"What does section {i} say about payment?",
+                    "document_id": doc_ids[i % len(doc_ids)]}
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post("/question", json=body)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(ask(i) for i in range(questions)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=5000, help="chunks per document")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated completion seconds")
+    args = parser.parse_args()
+
+    stub = start_stub_server(make_stub_app(FakeEmbeddingBackend().dimension, args.latency))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        doc_ids = build_store(directory, args.documents, args.chunks)
+        print(f"indexed {args.documents * args.chunks} chunks in {time.perf_counter() - start:.1f} s; "
+              f"{os.cpu_count()} CPUs; completion latency {args.latency * 1000:.0f} ms")
+        print(f"{'workers':>7} {'q/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'PSS MB':>8}")
+        # Few malloc arenas, so memory freed by request threads is reused rather than retained per thread
+        env = dict(os.environ, SERVING_MODE="shared", VECTOR_STORE_DIR=directory, EMBEDDING_BACKEND="fake",
+                   ANSWER_CACHE_SIZE="0", OPENAI_API_KEY="stub", OPENAI_MAX_CONCURRENCY=str(args.concurrency),
+                   MALLOC_ARENA_MAX="2")
+        for workers in args.workers:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning"], env=env)
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                # Every worker must be up, not just the first, so warm up until all have answered
+                deadline = time.time() + 120
+                while True:
+                    try:
+                        asyncio.run(run_load(base_url, doc_ids, 4 * workers, workers))
+                        break
+                    except httpx.HTTPError:
+                        if time.time() > deadline:
+                            raise
+                        time.sleep(0.5)
+                time.sleep(1)
+                asyncio.run(run_load(base_url, doc_ids, 20 * workers, args.concurrency))
+
+                start = time.perf_counter()
+                latencies = asyncio.run(run_load(base_url, doc_ids, args.questions, args.concurrency))
+                elapsed = time.perf_counter() - start
+                rss, pss = worker_memory(server.pid, workers)
+                print(f"{workers:>7} {args.questions / elapsed:>8.1f} {percentile(latencies, 50):>8.1f} "
+                      f"{percentile(latencies, 99):>8.1f} {rss:>8.0f} {pss:>8.0f}")
+            finally:
+                server.terminate()
+                server.wait()
+    stub.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Load test for the async question-answering path against a local OpenAI stub.
+
+Starts an OpenAI-compatible stub server (embeddings and chat completions with
+a fixed simulated latency), indexes a few synthetic documents through it and
+fires questions at ``QAService.get_answer`` with N in flight at once. With
+``--stream`` it uses ``QAService.stream_answer`` instead and also reports the
+time to the first answer token.
+
+    python -m benchmarks.load_qa --concurrency 64 --questions 1000 --latency 0.2
+    python -m benchmarks.load_qa --stream --tokens 50 --token-latency 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from typing import List, Tuple
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.embeddings import FakeEmbeddingBackend
+
+
+def make_stub_app(dimension: int, latency: float, tokens: int = 20, token_latency: float = 0.0) -> FastAPI:
+    """
+    OpenAI-compatible app answering embeddings and chat completions after ``latency`` seconds.
+
+    Streamed completions send ``tokens`` tokens, ``token_latency`` seconds apart.
+    """
+    stub = FastAPI()
+    vectors = FakeEmbeddingBackend(dimension=dimension)
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(latency)
+        data = [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                for i, vector in enumerate(vectors.embed(texts))]
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        if body.get("stream"):
+            return StreamingResponse(stream_tokens(body["model"]), media_type="text/event-stream")
+        return {
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Stub answer."}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    async def stream_tokens(model: str):
+        for i in range(tokens):
+            if i and token_latency:
+                await asyncio.sleep(token_latency)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": f" token{i}"}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return stub
+
+
+def start_stub_server(app: FastAPI) -> uvicorn.Server:
+    """Serve ``app`` on a free local port in a background thread."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    return server
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    """Nearest-rank percentile in milliseconds."""
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000
+
+
+async def run_load(qa_service, doc_ids: List[str], questions: int, concurrency: int,
+                   stream: bool = False) -> Tuple[List[float], List[float]]:
+    """
+    Ask ``questions`` questions with at most ``concurrency`` in flight.
+
+    Returns:
+        Tuple[List[float], List[float]]: Seconds to the full answer and to the
+        first answer token (equal unless streaming), per question
+    """
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    first_token: List[float] = []
+
+    async def ask(i: int) -> None:
+        question, doc_id = f"What does section {i % 50} say?", doc_ids[i % len(doc_ids)]
+        async with gate:
+            start = time.perf_counter()
+            if stream:
+                first = None
+                async for event in qa_service.stream_answer(question, document_id=doc_id):
+                    if first is None and event["type"] == "token":
+                        first = time.perf_counter() - start
+            else:
+                await qa_service.get_answer(question, document_id=doc_id)
+            latencies.append(time.perf_counter() - start)
+            first_token.append(first if stream else latencies[-1])
+
+    await asyncio.gather(*(ask(i) for i in range(questions)))
+    return latencies, first_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated upstream seconds per call")
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=200, help="chunks per document")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--stream", action="store_true", help="use stream_answer and report time to first token")
+    parser.add_argument("--tokens", type=int, default=20, help="tokens per streamed answer")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds between streamed tokens")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(max(args.concurrency)))
+    server = start_stub_server(make_stub_app(args.dimension, args.latency, args.tokens, args.token_latency))
+
+    # Imported after OPENAI_BASE_URL points at the stub
+    from app.services.embedding_cache import EmbeddingCache
+    from app.services.embeddings import OpenAIEmbeddingBackend
+    from app.services.openai_client import close_async_client
+    from app.services.qa_service import QAService
+    from app.services.vector_store import VectorStore
+
+    # Disable the query cache so every question pays for its embedding call
+    store = VectorStore(embedding_backend=OpenAIEmbeddingBackend(dimension=args.dimension),
+                        cache=EmbeddingCache(max_memory_items=0))
+    rng = np.random.default_rng(0)
+    doc_ids = [f"doc-{d}" for d in range(args.documents)]
+    for doc_id in doc_ids:
+        store.add_document(doc_id, [f"{doc_id} section {i}: {rng.integers(1 << 30)}" for i in range(args.chunks)])
+
+    async def run_all():
+        qa_service = QAService(store)
+        print(f"upstream latency {args.latency * 1000:.0f} ms per call, 2 calls per question")
+        print(f"{'concurrency':>11} {'questions':>9} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'ttft p50':>9} {'ttft p99':>9} {'q/s':>8}")
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            latencies, first_token = await run_load(qa_service, doc_ids, args.questions, concurrency, args.stream)
+            elapsed = time.perf_counter() - start
+            print(f"{concurrency:>11} {args.questions:>9} {percentile(latencies, 50):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {percentile(first_token, 50):>9.1f} "
+                  f"{percentile(first_token, 99):>9.1f} {args.questions / elapsed:>8.1f}")
+        await close_async_client()
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Reproducible offline benchmark suite for ingest and question answering.
+
+Everything runs in one process against deterministic fakes: synthetic PDFs
+from benchmarks.synthetic_pdf, FakeEmbeddingBackend for embeddings and
+FakeChatClient for chat completions, both sleeping a fixed simulated
+latency. Seeds are fixed, so every run does the same work. It measures:
+
+- upload: POST /upload through the ASGI app until every job is indexed
+- extract, chunk: PDFProcessor._extract_text and _chunk_text
+- add_document: chunks embedded and indexed per second
+- search: search_similar latency at each index size
+- question: POST /question latency and throughput at each concurrency
+
+Results are written as JSON. --compare checks them against an earlier run
+and exits with status 1 if a metric got worse by more than --tolerance.
+--quick is a smoke run: its timings are too short to compare reliably.
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output new.json --compare baseline.json
+    python -m benchmarks.suite --quick
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import faiss
+import httpx
+import numpy as np
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.pdf_processor import PDFProcessor
+from app.services.qa_service import QAService
+from app.services.vector_store import VectorStore
+from benchmarks.bench_ann import synthetic_vectors
+from benchmarks.load_qa import percentile
+from benchmarks.synthetic_pdf import make_pdf, page_lines
+
+FULL = {"upload_files": 40, "upload_pages": 20, "upload_concurrency": 8, "extract_pages": 400,
+        "add_documents": 50, "add_chunks": 200, "search_sizes": [1000, 100_000, 1_000_000],
+        "search_queries": 500, "question_concurrency": [1, 16, 64], "questions": 500}
+QUICK = {"upload_files": 8, "upload_pages": 5, "upload_concurrency": 4, "extract_pages": 50,
+         "add_documents": 10, "add_chunks": 100, "search_sizes": [1000, 10_000],
+         "search_queries": 100, "question_concurrency": [1, 16], "questions": 100}
+
+
+class FakeChatClient:
+    """
+    Stand-in for the OpenAI async client's chat completions.
+
+    Answers after ``latency`` seconds with a deterministic reply derived from
+    the prompt, and reports token usage estimated at four characters a token.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model: str, messages: List[Dict[str, str]], **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = "".join(message["content"] for message in messages)
+        answer = f"Answer {hashlib.blake2b(prompt.encode('utf-8'), digest_size=4).hexdigest()}."
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=answer))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(answer) // 4),
+        )
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """p50, p99 and mean of a list of seconds, in milliseconds."""
+    return {"p50_ms": round(percentile(latencies, 50), 3), "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(1000 * sum(latencies) / len(latencies), 3)}
+
+
+def synthetic_chunks(count: int, seed: int) -> List[str]:
+    """Contract-like sentences, as the chunker would emit them."""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    page = 0
+    while len(lines) < count:
+        page += 1
+        lines.extend(page_lines(page, 40, rng))
+    return lines[:count]
+
+
+def bench_extract_chunk(pages: int, repeats: int = 3) -> Dict[str, Any]:
+    """Time text extraction and chunking of one synthetic PDF, best of ``repeats``."""
+    pdf = make_pdf(pages)
+    processor = PDFProcessor()
+    try:
+        extract_times, chunk_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            text = processor._extract_text(io.BytesIO(pdf))
+            extract_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            chunks = processor._chunk_text(text)
+            chunk_times.append(time.perf_counter() - start)
+    finally:
+        processor.close()
+    megabytes = len(text.encode("utf-8")) / 1e6
+    return {
+        "extract": {"pages": pages, "pdf_mb": round(len(pdf) / 1e6, 3), "seconds_s": round(min(extract_times), 4),
+                    "pages_per_s": round(pages / min(extract_times), 1)},
+        "chunk": {"text_mb": round(megabytes, 3), "chunks": len(chunks), "seconds_s": round(min(chunk_times), 4),
+                  "mb_per_s": round(megabytes / min(chunk_times), 2),
+                  "chunks_per_s": round(len(chunks) / min(chunk_times), 1)},
+    }
+
+
+def bench_add_document(documents: int, chunks: int, dimension: int, latency: float) -> Dict[str, Any]:
+    """Index documents of distinct synthetic chunks, embedding them through the fake backend."""
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=dimension, latency=latency))
+    texts = synthetic_chunks(documents * chunks, seed=1)
+    start = time.perf_counter()
+    for d in range(documents):
+        store.add_document(f"doc-{d}", texts[d * chunks:(d + 1) * chunks])
+    elapsed = time.perf_counter() - start
+    return {"documents": documents, "chunks": documents * chunks, "seconds_s": round(elapsed, 3),
+            "documents_per_s": round(documents / elapsed, 2), "chunks_per_s": round(documents * chunks / elapsed, 1)}
+
+
+def bench_search(size: int, queries: int, dimension: int, index_type: str, k: int = 5) -> Dict[str, Any]:
+    """
+    Build a ``size``-vector index and time ``search_similar`` one query at a time.
+
+    Vectors are clustered synthetic ones added with their embeddings, so the
+    build does not embed; each query is embedded by the zero-latency fake.
+    """
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=dimension), index_type=index_type,
+                        retrieval_mode="vector")
+    per_document = 1000
+    start = time.perf_counter()
+    for first in range(0, size, per_document):
+        count = min(per_document, size - first)
+        vectors = synthetic_vectors(count, dimension, clusters=64, seed=first)
+        store.add_document(f"doc-{first // per_document}", [f"chunk {first + i}" for i in range(count)],
+                           embeddings=vectors)
+    build = time.perf_counter() - start
+
+    store.search_similar("warm up", k=k)
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        store.search_similar(f"what does clause {i} say about payment terms", k=k)
+        latencies.append(time.perf_counter() - start)
+    return {"vectors": size, "index_type": index_type, "build_s": round(build, 2), **latency_summary(latencies)}
+
+
+@contextlib.contextmanager
+def serving_app(store: VectorStore, qa_service: QAService) -> Iterator[Any]:
+    """The API app wired to the given services, restoring its own afterwards."""
+    from app.api import routes
+    from app.main import app
+
+    saved = (routes._vector_store, routes._qa_service, routes._ingestion_queue)
+    routes._vector_store, routes._qa_service, routes._ingestion_queue = store, qa_service, None
+    try:
+        yield app
+    finally:
+        if routes._ingestion_queue is not None:
+            routes._ingestion_queue.shutdown()
+        routes._vector_store, routes._qa_service, routes._ingestion_queue = saved
+
+
+async def upload_all(client: httpx.AsyncClient, pdfs: List[bytes], concurrency: int) -> List[str]:
+    """Upload every PDF, retrying while the ingestion queue is full, and wait until all are indexed."""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def upload(i: int) -> str:
+        async with gate:
+            while True:
+                response = await client.post("/upload", files={"file": (f"bench-{i}.pdf", pdfs[i], "application/pdf")})
+                if response.status_code != 503:
+                    break
+                await asyncio.sleep(0.05)
+            response.raise_for_status()
+            body = response.json()
+            while True:
+                job = (await client.get(f"/jobs/{body['job_id']}")).json()
+                if job["status"] == "completed":
+                    return body["file_id"]
+                if job["status"] == "failed":
+                    raise RuntimeError(f"Ingestion failed: {job['error']}")
+                await asyncio.sleep(0.01)
+
+    return list(await asyncio.gather(*(upload(i) for i in range(len(pdfs)))))
+
+
+async def ask_all(client: httpx.AsyncClient, doc_ids: List[str], questions: int, concurrency: int,
+                  offset: int) -> List[float]:
+    """POST ``questions`` distinct questions with ``concurrency`` in flight; return each latency."""
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def ask(i: int) -> None:
+        body = {"question": f"What does section {offset + i} say about payment?",
+                "document_id": doc_ids[i % len(doc_ids)]}
+        async with gate:
+            start = time.perf_counter()
+            response = await client.post("/question", json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(ask(i) for i in range(questions)))
+    return latencies
+
+
+def bench_api(config: Dict[str, Any], dimension: int, embed_latency: float, chat_latency: float) -> Dict[str, Any]:
+    """Upload synthetic PDFs through the API, then ask questions about them."""
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=dimension, latency=embed_latency))
+    # No answer cache, so every question is searched and answered
+    qa_service = QAService(store, client=FakeChatClient(chat_latency), answer_cache=None,
+                           max_concurrent_requests=max(config["question_concurrency"]))
+    pdfs = [make_pdf(config["upload_pages"], seed=i) for i in range(config["upload_files"])]
+    results: Dict[str, Any] = {}
+
+    async def run(app) -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            start = time.perf_counter()
+            doc_ids = await upload_all(client, pdfs, config["upload_concurrency"])
+            elapsed = time.perf_counter() - start
+            results["upload"] = {
+                "files": len(pdfs), "pages": len(pdfs) * config["upload_pages"],
+                "chunks": sum(len(store.doc_vector_ids[doc_id]) for doc_id in doc_ids),
+                "seconds_s": round(elapsed, 3), "files_per_s": round(len(pdfs) / elapsed, 2),
+                "pages_per_s": round(len(pdfs) * config["upload_pages"] / elapsed, 1),
+                "mb_per_s": round(sum(map(len, pdfs)) / 1e6 / elapsed, 3),
+            }
+            results["question"] = {}
+            for n, concurrency in enumerate(config["question_concurrency"]):
+                await ask_all(client, doc_ids, concurrency, concurrency, offset=-1000 * (n + 1))
+                start = time.perf_counter()
+                latencies = await ask_all(client, doc_ids, config["questions"], concurrency,
+                                          offset=n * config["questions"])
+                elapsed = time.perf_counter() - start
+                results["question"][str(concurrency)] = {
+                    "questions": config["questions"], **latency_summary(latencies),
+                    "questions_per_s": round(config["questions"] / elapsed, 1),
+                }
+
+    with serving_app(store, qa_service) as app:
+        asyncio.run(run(app))
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """What a result depends on besides the code: machine, interpreter and libraries."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__, "faiss": faiss.__version__,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+# PUBLIC_INTERFACE
+def run_suite(config: Dict[str, Any], dimension: int = 384, index_type: str = "flat",
+              embed_latency: float = 0.02, chat_latency: float = 0.05,
+              only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run the benchmarks.
+
+    Args:
+        config: Workload sizes, e.g. FULL or QUICK
+        dimension: Embedding dimension
+        index_type: Index type for the search benchmark
+        embed_latency: Simulated seconds per embedding request
+        chat_latency: Simulated seconds per chat completion
+        only: Benchmarks to run, from "api" (upload and question), "extract"
+            (extract and chunk), "add_document" and "search" (default: all)
+
+    Returns:
+        Dict[str, Any]: ``environment``, ``settings`` and per-benchmark ``results``
+    """
+    only = only or ["api", "extract", "add_document", "search"]
+    results: Dict[str, Any] = {}
+    if "api" in only:
+        results.update(bench_api(config, dimension, embed_latency, chat_latency))
+    if "extract" in only:
+        results.update(bench_extract_chunk(config["extract_pages"]))
+    if "add_document" in only:
+        results["add_document"] = bench_add_document(config["add_documents"], config["add_chunks"],
+                                                     dimension, embed_latency)
+    if "search" in only:
+        results["search"] = {str(size): bench_search(size, config["search_queries"], dimension, index_type)
+                             for size in config["search_sizes"]}
+    settings = dict(config, dimension=dimension, index_type=index_type, embed_latency=embed_latency,
+                    chat_latency=chat_latency)
+    return {"environment": environment(), "settings": settings, "results": results}
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Dotted paths of every number in a results tree."""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+# PUBLIC_INTERFACE
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.1) -> List[str]:
+    """
+    Find the metrics that got worse than in a baseline run.
+
+    Rates (``*_per_s``) regress when they drop, times (``*_ms``, ``*_s``)
+    when they grow; other numbers describe the workload and are not compared.
+
+    Args:
+        current: Results of this run, as returned by ``run_suite``
+        baseline: Results of the run to compare against
+        tolerance: Relative change allowed before a metric counts as worse
+
+    Returns:
+        List[str]: One line per regressed metric
+    """
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        if name.endswith("_per_s"):
+            worse = change < -tolerance
+        elif name.endswith("_ms") or name.endswith("_s"):
+            worse = change > tolerance
+        else:
+            continue
+        if worse:
+            regressions.append(f"{name}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="small workloads, for a fast check")
+    parser.add_argument("--only", nargs="+", choices=["api", "extract", "add_document", "search"])
+    parser.add_argument("--search-sizes", type=int, nargs="+", help="index sizes for the search benchmark")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="simulated seconds per embedding request")
+    parser.add_argument("--chat-latency", type=float, default=0.05, help="simulated seconds per chat completion")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    config = dict(QUICK if args.quick else FULL)
+    if args.search_sizes:
+        config["search_sizes"] = args.search_sizes
+    report = run_suite(config, args.dimension, args.index_type, args.embed_latency, args.chat_latency, args.only)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Generator for synthetic multi-page PDFs used by the benchmarks and tests.
+
+Writes a minimal but valid PDF by hand so no PDF-writing dependency is needed.
+"""
+import random
+from typing import List, Optional
+
+_WORDS = (
+    "agreement party term clause notice payment liability warranty schedule "
+    "termination confidential obligation section invoice supplier customer "
+    "delivery period amount breach remedy governing law jurisdiction"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_number: int, lines: int, rng: random.Random) -> List[str]:
+    """Deterministic contract-like sentences for one page."""
+    result = [f"Section {page_number}. Page {page_number} heading"]
+    for line in range(lines - 1):
+        words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 14)))
+        result.append(f"{page_number}.{line + 1} The {words}.")
+    return result
+
+
+# PUBLIC_INTERFACE
+def make_pdf(pages: int, lines_per_page: int = 40, seed: Optional[int] = 0) -> bytes:
+    """
+    Build a PDF with the given number of text pages.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Lines of text on each page
+        seed: Seed for the generated text
+
+    Returns:
+        bytes: The PDF file contents
+    """
+    rng = random.Random(seed)
+    # Object numbers: 1 catalog, 2 pages, 3 font, then (page, content) pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for page in range(pages):
+        page_obj, content_obj = 4 + 2 * page, 5 + 2 * page
+        kids.append(f"{page_obj} 0 R")
+        text = " Tj T* ".join(f"({_escape(line)})" for line in page_lines(page + 1, lines_per_page, rng))
+        stream = f"BT /F1 9 Tf 11 TL 40 760 Td {text} Tj ET".encode("latin-1")
+        objects[page_obj] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>"
+        ).encode("latin-1")
+        objects[content_obj] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services.answer_cache import AnswerCache
+
+ANSWER = {"answer": "Thirty days' notice.", "context_used": [], "confidence": 0.9}
+
+@pytest.fixture
+def cache():
+    return AnswerCache(max_items=3, ttl=60, similarity_threshold=0.9)
+
+def test_exact_hit_ignores_case_whitespace_and_punctuation(cache):
+    cache.put("What is the termination clause?", "doc1", 7, ANSWER)
+    
+    assert cache.get_exact("  what is the   TERMINATION clause ", "doc1", 7) == ANSWER
+    assert cache.get_exact("What is the termination clause?", "doc2", 7) is None
+
+def test_semantic_hit_within_threshold(cache):
+    cache.put("What is the termination clause?", "doc1", 7, ANSWER, embedding=np.array([1.0, 0.0]))
+    
+    assert cache.get_similar(np.array([0.95, 0.1]), "doc1", 7) == ANSWER
+    assert cache.get_similar(np.array([0.5, 0.5]), "doc1", 7) is None
+    assert cache.get_similar(np.array([1.0, 0.0]), "doc2", 7) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+def test_document_change_invalidates(cache):
+    cache.put("q", "doc1", 7, ANSWER, embedding=np.array([1.0, 0.0]))
+    
+    assert cache.get_exact("q", "doc1", 8) is None
+    assert cache.get_similar(np.array([1.0, 0.0]), "doc1", 8) is None
+    assert cache.stats()["items"] == 0
+
+def test_invalidate_drops_document_and_store_wide_answers(cache):
+    cache.put("q", "doc1", 7, ANSWER)
+    cache.put("q", "doc2", 3, ANSWER)
+    cache.put("q", None, 10, ANSWER)
+    
+    cache.invalidate("doc1")
+    
+    assert cache.get_exact("q", "doc1", 7) is None
+    assert cache.get_exact("q", None, 10) is None
+    assert cache.get_exact("q", "doc2", 3) == ANSWER
+
+def test_ttl_expiry():
+    cache = AnswerCache(ttl=0.01)
+    cache.put("q", "doc1", 1, ANSWER)
+    time.sleep(0.02)
+    
+    assert cache.get_exact("q", "doc1", 1) is None
+
+def test_lru_eviction(cache):
+    for question in ["a", "b", "c"]:
+        cache.put(question, "doc1", 1, ANSWER)
+    cache.get_exact("a", "doc1", 1)
+    cache.put("d", "doc1", 1, ANSWER)
+    
+    assert cache.get_exact("b", "doc1", 1) is None
+    assert cache.get_exact("a", "doc1", 1) == ANSWER
+    assert cache.stats()["items"] == 3
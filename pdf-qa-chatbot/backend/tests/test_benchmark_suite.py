@@ -0,0 +1,31 @@
+import json
+
+from app.api import routes
+from benchmarks.suite import compare, run_suite
+
+TINY = {"upload_files": 2, "upload_pages": 2, "upload_concurrency": 2, "extract_pages": 3,
+        "add_documents": 2, "add_chunks": 5, "search_sizes": [50], "search_queries": 5,
+        "question_concurrency": [2], "questions": 4}
+
+def test_suite_reports_every_benchmark_as_json():
+    services = (routes._vector_store, routes._qa_service, routes._ingestion_queue)
+    report = run_suite(TINY, dimension=16, embed_latency=0, chat_latency=0)
+    results = json.loads(json.dumps(report))["results"]
+
+    assert results["upload"]["files"] == 2 and results["upload"]["chunks"] > 0
+    assert results["question"]["2"]["questions"] == 4
+    assert results["extract"]["pages"] == 3 and results["chunk"]["chunks"] > 0
+    assert results["add_document"]["chunks"] == 10
+    assert results["search"]["50"]["p99_ms"] >= results["search"]["50"]["p50_ms"]
+    assert report["settings"]["dimension"] == 16
+    # The API's own services are left as they were
+    assert (routes._vector_store, routes._qa_service, routes._ingestion_queue) == services
+
+def test_compare_flags_only_regressions():
+    baseline = {"results": {"search": {"1000": {"p50_ms": 1.0, "vectors": 1000}},
+                            "upload": {"files_per_s": 10.0, "seconds_s": 2.0}}}
+    current = {"results": {"search": {"1000": {"p50_ms": 1.5, "vectors": 5}},
+                           "upload": {"files_per_s": 12.0, "seconds_s": 2.1}}}
+
+    assert compare(current, baseline, tolerance=0.1) == ["search.1000.p50_ms: 1.0 -> 1.5 (+50%)"]
+    assert compare(current, baseline, tolerance=0.6) == []
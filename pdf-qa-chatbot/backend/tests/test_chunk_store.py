@@ -0,0 +1,71 @@
+import mmap
+
+import numpy as np
+import pytest
+
+from app.services.chunk_store import ChunkStore, DocumentChunks, open_arena
+
+def make_store():
+    store = ChunkStore()
+    store.add("doc1", 0, ["alpha", "béta"])
+    store.add("doc2", 2, ["gamma", "", "delta"])
+    return store
+
+def test_lookup_by_id():
+    store = make_store()
+
+    assert store[1] == ("doc1", 1)
+    assert store[4] == ("doc2", 2)
+    assert store.text(1) == "béta"
+    assert store.text(3) == ""
+    assert 5 not in store and -1 not in store
+    assert len(store) == 5
+    with pytest.raises(KeyError):
+        store[7]
+
+def test_ids_must_increase():
+    store = make_store()
+    with pytest.raises(ValueError):
+        store.add("doc3", 3, ["late"])
+    # Gaps are allowed
+    store.add("doc3", 9, ["later"])
+    assert store[9] == ("doc3", 0) and 7 not in store
+
+def test_remove_and_compact():
+    store = make_store()
+    store.remove(np.array([0, 1]))
+
+    assert 0 not in store and len(store) == 3
+    assert store.dead_bytes == len("alpha") + len("béta".encode("utf-8"))
+
+    store.compact()
+
+    assert store.dead_bytes == 0
+    assert [store.text(i) for i in store] == ["gamma", "", "delta"]
+    assert store[4] == ("doc2", 2)
+    assert store._documents == ["doc2"]
+
+def test_document_view():
+    store = make_store()
+    view = DocumentChunks(store, {"doc1": np.arange(2), "doc2": np.arange(2, 5)})
+
+    assert view == {"doc1": ["alpha", "béta"], "doc2": ["gamma", "", "delta"]}
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_export_round_trip(tmp_path, use_mmap):
+    store = make_store()
+    # Re-adding a document reuses its number, so rows are not in number order
+    store.remove(np.array([0, 1]))
+    store.add("doc1", 5, ["new alpha"])
+    documents, ids, doc_numbers, offsets, text = store.export()
+    assert documents == ["doc2", "doc1"]
+    path = tmp_path / "text.bin"
+    path.write_bytes(text)
+
+    arena = open_arena(str(path), use_mmap)
+    restored = ChunkStore.from_rows(documents, ids, doc_numbers, offsets, arena)
+    restored.add("doc3", 6, ["appended"])
+
+    assert isinstance(arena, mmap.mmap) == use_mmap
+    assert dict(restored) == {2: ("doc2", 0), 3: ("doc2", 1), 4: ("doc2", 2), 5: ("doc1", 0), 6: ("doc3", 0)}
+    assert restored.texts([5, 2, 6]) == ["new alpha", "gamma", "appended"]
@@ -0,0 +1,72 @@
+import pytest
+
+from app.services.chunker import PAGE_SEPARATOR, Chunker
+from app.services.tokens import count_tokens
+
+def test_sentences_keep_decimals_and_abbreviations():
+    chunker = Chunker(size=60, overlap=0)
+    text = "The rate is 3.5 percent, e.g. Monthly fees. Dr. Smith approves it. Done."
+    
+    chunks = [chunk.text for chunk in chunker.chunk_text(text)]
+    
+    assert chunks == ["The rate is 3.5 percent, e.g. Monthly fees.", "Dr. Smith approves it. Done."]
+
+def test_headings_start_new_chunks():
+    chunker = Chunker(size=500, overlap=0)
+    text = "1. Scope\nThis agreement covers services.\nSECTION 2 PAYMENT\nInvoices are due in 30 days."
+    
+    chunks = [chunk.text for chunk in chunker.chunk_text(text)]
+    
+    assert chunks == ["1. Scope This agreement covers services.", "SECTION 2 PAYMENT Invoices are due in 30 days."]
+
+def test_paragraph_breaks_preferred_over_sentence_breaks():
+    chunker = Chunker(size=80, overlap=0)
+    text = "First paragraph sentence one. Sentence two here.\n\nSecond paragraph starts. And continues on."
+    
+    chunks = [chunk.text for chunk in chunker.chunk_text(text)]
+    
+    assert chunks[0] == "First paragraph sentence one. Sentence two here."
+
+def test_overlap_repeats_trailing_sentences():
+    chunker = Chunker(size=50, overlap=20)
+    text = "Alpha one is here. Beta two is here. Gamma three is here. Delta four is here."
+    
+    chunks = chunker.chunk_text(text)
+    
+    assert all(len(chunk.text) <= 50 for chunk in chunks)
+    assert chunks[0].text.endswith("Beta two is here.")
+    assert chunks[1].text.startswith("Beta two is here.")
+    assert chunks[-1].text.endswith("Delta four is here.")
+
+def test_chunks_carry_pages_and_offsets():
+    chunker = Chunker(size=40, overlap=0)
+    pages = [(4, "Page four text is here."), (5, "Page five text. More on five.")]
+    
+    chunks = chunker.chunk_pages(pages)
+    text = PAGE_SEPARATOR.join(page_text for _, page_text in pages)
+    
+    assert [(c.page_start, c.page_end) for c in chunks] == [(4, 4), (5, 5)]
+    for chunk in chunks:
+        assert text[chunk.char_start:chunk.char_end] == chunk.text
+
+def test_long_sentence_is_split_at_whitespace():
+    chunker = Chunker(size=30, overlap=0)
+    chunks = chunker.chunk_text("word " * 40)
+    
+    assert all(len(chunk.text) <= 30 for chunk in chunks)
+    assert " ".join(chunk.text for chunk in chunks).split() == ["word"] * 40
+
+def test_token_sized_chunks():
+    chunker = Chunker(size=20, overlap=5, unit="tokens")
+    text = " ".join(f"Sentence number {i} is short." for i in range(30))
+    
+    chunks = chunker.chunk_text(text)
+    
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk.text) <= 20 for chunk in chunks)
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        Chunker(size=100, overlap=100)
+    with pytest.raises(ValueError):
+        Chunker(unit="words")
@@ -0,0 +1,85 @@
+import pytest
+
+from app.services.chunker import Chunker
+from app.services.context_builder import ContextBuilder
+from app.services.tokens import context_window, count_tokens, count_tokens_batch
+
+def chunk(text, index, distance, doc_id="doc1", tokens=10):
+    return {"doc_id": doc_id, "chunk": text, "distance": distance, "chunk_index": index, "tokens": tokens}
+
+def test_budget_leaves_room_for_answer_and_prompt():
+    builder = ContextBuilder(model="gpt-4", max_answer_tokens=500, max_context_tokens=100_000)
+    
+    assert builder.budget(prompt_tokens=200) == context_window("gpt-4") - 500 - 200 - 8
+    assert ContextBuilder(max_context_tokens=1000).budget(prompt_tokens=200) == 1000
+
+def test_build_respects_budget_and_skips_chunks_that_do_not_fit():
+    builder = ContextBuilder()
+    chunks = [
+        chunk("alpha beta gamma", 0, 0.1, tokens=60),
+        chunk("delta epsilon zeta", 5, 0.2, tokens=60),
+        chunk("eta theta iota", 9, 0.3, tokens=30),
+    ]
+    
+    passages = builder.build(chunks, budget=100)
+    
+    assert [p["chunk"] for p in passages] == ["alpha beta gamma", "eta theta iota"]
+    assert sum(p["tokens"] for p in passages) <= 100
+
+def test_build_drops_near_duplicates():
+    builder = ContextBuilder()
+    text = "the agreement may be terminated by either party with thirty days written notice"
+    chunks = [
+        chunk(text, 0, 0.1),
+        chunk(text + " period", 7, 0.2),
+        chunk("payment is due within fifteen days of the invoice date", 3, 0.3),
+    ]
+    
+    passages = builder.build(chunks, budget=1000)
+    
+    assert [p["chunk_index"] for p in passages] == [0, 3]
+
+def test_build_merges_adjacent_chunks_in_document_order():
+    builder = ContextBuilder()
+    chunks = [
+        chunk("second part.", 4, 0.1),
+        chunk("first part.", 3, 0.2),
+        chunk("other document.", 4, 0.15, doc_id="doc2"),
+        chunk("far away.", 9, 0.3),
+    ]
+    
+    passages = builder.build(chunks, budget=1000)
+    
+    assert [(p["doc_id"], p["chunk"]) for p in passages] == [
+        ("doc1", "first part. second part."),
+        ("doc2", "other document."),
+        ("doc1", "far away."),
+    ]
+    assert passages[0]["distance"] == pytest.approx(0.1)
+    assert passages[0]["tokens"] == 20
+
+def test_build_merges_overlapping_chunks_without_repeating_text():
+    text = " ".join(f"Sentence number {i} is here." for i in range(30))
+    records = Chunker(size=400, overlap=150).chunk_text(text)
+    assert records[1].char_start < records[0].char_end
+    chunks = [dict(chunk(record.text, index, 0.1, tokens=count_tokens(record.text)),
+                   char_start=record.char_start, char_end=record.char_end)
+              for index, record in enumerate(records)]
+    
+    passages = ContextBuilder().build(chunks, budget=1000)
+    
+    assert len(passages) == 1
+    assert passages[0]["chunk"] == text
+    assert passages[0]["tokens"] == count_tokens(text)
+    assert (passages[0]["char_start"], passages[0]["char_end"]) == (0, len(text))
+
+def test_build_counts_tokens_when_not_cached():
+    builder = ContextBuilder()
+    passages = builder.build([{"doc_id": "doc1", "chunk": "some text here", "distance": 0.1}], budget=1000)
+    
+    assert passages[0]["tokens"] == count_tokens("some text here")
+
+def test_count_tokens_batch_matches_count_tokens():
+    texts = ["hello world", "", "a much longer piece of text with several words"]
+    
+    assert count_tokens_batch(texts).tolist() == [count_tokens(t) for t in texts]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.vector_store import VectorStore
+
+@pytest.fixture
+def vectors():
+    return np.random.rand(3, 4).astype(np.float32)
+
+def test_key_normalizes_whitespace_and_includes_model():
+    key = EmbeddingCache.make_key("model-a", "Termination  clause\n applies")
+    assert key == EmbeddingCache.make_key("model-a", " Termination clause applies ")
+    assert key != EmbeddingCache.make_key("model-b", "Termination clause applies")
+
+def test_get_many_reports_hits_and_misses(vectors):
+    cache = EmbeddingCache()
+    cache.put_many("m", ["a", "b"], vectors[:2])
+    
+    results = cache.get_many("m", ["a", "c", "b"])
+    
+    assert np.allclose(results[0], vectors[0])
+    assert results[1] is None
+    assert np.allclose(results[2], vectors[1])
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+def test_lru_evicts_oldest(vectors):
+    cache = EmbeddingCache(max_memory_items=2)
+    cache.put("m", "a", vectors[0])
+    cache.put("m", "b", vectors[1])
+    cache.get("m", "a")
+    cache.put("m", "c", vectors[2])
+    
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") is not None
+
+def test_disk_tier_survives_restart(tmp_path, vectors):
+    path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(path=path)
+    cache.put_many("m", ["a", "b"], vectors[:2])
+    cache.close()
+    
+    reopened = EmbeddingCache(path=path)
+    result = reopened.get("m", "b")
+    
+    assert np.allclose(result, vectors[1])
+    assert reopened.stats()["disk_hits"] == 1
+
+def test_vector_store_only_embeds_cache_misses():
+    backend = FakeEmbeddingBackend(dimension=1536)
+    store = VectorStore(embedding_backend=backend)
+    
+    store.add_document("doc1", ["header", "body one"])
+    calls = backend.calls
+    store.add_document("doc2", ["header", "header"])
+    store.search_similar("body one", k=1)
+    
+    assert backend.calls == calls
+    assert store.cache.stats()["misses"] == 2
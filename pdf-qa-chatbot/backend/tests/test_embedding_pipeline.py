@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.embedding_pipeline import EmbeddingPipeline
+
+@pytest.fixture
+def backend():
+    return FakeEmbeddingBackend(dimension=8)
+
+def test_fake_backend_is_deterministic(backend):
+    first = backend.embed(["alpha", "beta"])
+    second = backend.embed(["beta", "alpha"])
+    
+    assert first.shape == (2, 8)
+    assert first.dtype == np.float32
+    assert np.allclose(first[0], second[1])
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+
+def test_make_batches_respects_count_and_size(backend):
+    pipeline = EmbeddingPipeline(backend, max_batch_size=3, max_batch_chars=10)
+    texts = ["aaaa", "bbbb", "ccc", "dddddddddddd", "e", "f", "g", "h"]
+    
+    batches = pipeline._make_batches(texts)
+    
+    assert [list(b) for b in batches] == [[0, 1], [2], [3], [4, 5, 6], [7]]
+
+def test_embed_preserves_order_across_concurrent_batches(backend):
+    pipeline = EmbeddingPipeline(backend, max_batch_size=2, max_concurrency=4)
+    texts = [f"chunk {i}" for i in range(9)]
+    
+    embeddings = pipeline.embed(texts)
+    
+    assert embeddings.shape == (9, 8)
+    assert np.allclose(embeddings, backend.embed(texts))
+    assert backend.calls == 5 + 1
+
+def test_embed_empty(backend):
+    pipeline = EmbeddingPipeline(backend)
+    assert pipeline.embed([]).shape == (0, 8)
+    assert backend.calls == 0
+
+class FlakyBackend(FakeEmbeddingBackend):
+    """Fake backend that fails the first ``failures`` requests."""
+    retryable_exceptions = (ConnectionError,)
+    
+    def __init__(self, failures):
+        super().__init__(dimension=8)
+        self.failures = failures
+        self.batches = []
+    
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) <= self.failures:
+            raise ConnectionError("rate limited")
+        return super().embed(texts)
+
+def test_embed_retries_failed_batch_only(backend):
+    flaky = FlakyBackend(failures=1)
+    pipeline = EmbeddingPipeline(flaky, max_batch_size=1, max_concurrency=1, max_backoff=0)
+    
+    embeddings = pipeline.embed(["a", "b"])
+    
+    assert flaky.batches == [["a"], ["a"], ["b"]]
+    assert np.allclose(embeddings, backend.embed(["a", "b"]))
+
+def test_embed_gives_up_after_max_retries():
+    failing = FlakyBackend(failures=10)
+    pipeline = EmbeddingPipeline(failing, max_retries=3, max_backoff=0)
+    
+    with pytest.raises(ConnectionError):
+        pipeline.embed(["a"])
+    assert len(failing.batches) == 3
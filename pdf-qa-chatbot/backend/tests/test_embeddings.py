@@ -0,0 +1,62 @@
+import sys
+import types
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from app.services.embeddings import (
+    FakeEmbeddingBackend,
+    OpenAIEmbeddingBackend,
+    SentenceTransformerBackend,
+    create_embedding_backend,
+)
+from app.services.embedding_pipeline import EmbeddingPipeline
+from app.services.vector_store import VectorStore
+
+@pytest.fixture
+def fake_sentence_transformers():
+    """Stand-ins for torch and sentence_transformers so no model is downloaded."""
+    model = Mock()
+    model.get_sentence_embedding_dimension.return_value = 4
+    model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 4))
+    torch = types.SimpleNamespace(set_num_threads=Mock())
+    st = types.SimpleNamespace(SentenceTransformer=Mock(return_value=model))
+    with patch.dict(sys.modules, {"torch": torch, "sentence_transformers": st}):
+        yield torch, st, model
+
+def test_sentence_transformer_backend_batches_on_cpu(fake_sentence_transformers):
+    torch, st, model = fake_sentence_transformers
+    
+    backend = SentenceTransformerBackend("local-model", batch_size=16, num_threads=2)
+    embeddings = backend.embed(["a", "b", "c"])
+    
+    torch.set_num_threads.assert_called_once_with(2)
+    st.SentenceTransformer.assert_called_once_with("local-model", device="cpu")
+    assert backend.dimension == 4
+    assert embeddings.shape == (3, 4)
+    assert embeddings.dtype == np.float32
+    assert model.encode.call_args[1]["batch_size"] == 16
+
+def test_vector_store_takes_dimension_from_backend(fake_sentence_transformers):
+    store = VectorStore(embedding_backend=SentenceTransformerBackend())
+    
+    assert store.dimension == 4
+    assert store.index.d == 4
+    assert store.pipeline.max_concurrency == 1
+    
+    store.add_document("doc", ["chunk one", "chunk two"])
+    assert store.index.ntotal == 2
+
+def test_create_embedding_backend_from_env(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "fake")
+    assert isinstance(create_embedding_backend(), FakeEmbeddingBackend)
+    
+    monkeypatch.setenv("EMBEDDING_BACKEND", "openai")
+    assert isinstance(create_embedding_backend(), OpenAIEmbeddingBackend)
+    
+    with pytest.raises(ValueError):
+        create_embedding_backend("unknown")
+
+def test_pipeline_uses_backend_concurrency_hint():
+    backend = FakeEmbeddingBackend(dimension=4)
+    assert EmbeddingPipeline(backend).max_concurrency == backend.max_concurrency
+    assert EmbeddingPipeline(backend, max_concurrency=2).max_concurrency == 2
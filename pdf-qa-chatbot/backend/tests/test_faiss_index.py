@@ -0,0 +1,96 @@
+import pytest
+import faiss
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.faiss_index import (
+    base_index, build_index, core_index, min_training_size, search_parameters, stores_exact_vectors,
+)
+from app.services.vector_store import VectorStore
+
+@pytest.mark.parametrize("index_type,expected", [
+    ("flat", faiss.IndexFlatL2),
+    ("hnsw", faiss.IndexHNSWFlat),
+    ("ivf_flat", faiss.IndexIVFFlat),
+    ("ivf_pq", faiss.IndexIVFPQ),
+])
+def test_build_index_types(index_type, expected):
+    index = build_index(index_type, 32, nlist=8, pq_m=8)
+    assert isinstance(index, expected)
+    assert index.d == 32
+
+def test_build_index_rejects_bad_config():
+    with pytest.raises(ValueError):
+        build_index("annoy", 32)
+    with pytest.raises(ValueError):
+        build_index("ivf_pq", 30, pq_m=8)
+
+@pytest.mark.parametrize("index_type,options,expected", [
+    ("flat", {"storage": "fp16"}, faiss.IndexScalarQuantizer),
+    ("hnsw", {"storage": "sq8"}, faiss.IndexHNSWSQ),
+    ("ivf_flat", {"storage": "sq8"}, faiss.IndexIVFScalarQuantizer),
+    ("flat", {"reduce_dim": 8}, faiss.IndexFlatL2),
+    ("ivf_flat", {"reduce_dim": 8, "reduction": "truncate", "storage": "fp16"}, faiss.IndexIVFScalarQuantizer),
+])
+def test_build_compressed_index(index_type, options, expected):
+    index = build_index(index_type, 32, nlist=8, **options)
+    
+    assert isinstance(core_index(index), expected)
+    assert core_index(index).d == options.get("reduce_dim", 32)
+    assert index.d == 32
+    assert not stores_exact_vectors(index)
+
+def test_build_compressed_index_rejects_bad_config():
+    with pytest.raises(ValueError):
+        build_index("flat", 32, storage="int4")
+    with pytest.raises(ValueError):
+        build_index("ivf_pq", 32, pq_m=8, storage="sq8")
+    with pytest.raises(ValueError):
+        build_index("flat", 32, reduce_dim=32)
+    with pytest.raises(ValueError):
+        build_index("flat", 32, reduce_dim=8, reduction="svd")
+
+def test_min_training_size():
+    assert min_training_size(build_index("flat", 16, storage="fp16")) == 0
+    assert min_training_size(build_index("flat", 16, storage="sq8")) == 1000
+    # PCA needs at least one point per input dimension; truncation needs none
+    assert min_training_size(build_index("flat", 64, reduce_dim=8)) == 64
+    assert min_training_size(build_index("flat", 64, reduce_dim=8, reduction="truncate")) == 0
+    assert min_training_size(build_index("flat", 16)) == 0
+    assert min_training_size(build_index("ivf_flat", 16, nlist=10)) == 390
+    assert min_training_size(build_index("ivf_pq", 16, nlist=10, pq_m=4, pq_bits=8)) == 39 * 256
+
+def test_search_parameters_per_index_type():
+    ivf = build_index("ivf_flat", 16, nlist=4)
+    hnsw = build_index("hnsw", 16)
+    
+    assert search_parameters(ivf, nprobe=3).nprobe == 3
+    assert search_parameters(hnsw, ef_search=99).efSearch == 99
+    assert search_parameters(build_index("flat", 16), nprobe=3, ef_search=99) is None
+    assert search_parameters(ivf) is None
+
+def test_vector_store_trains_ivf_once_enough_vectors():
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16),
+                        index_type="ivf_flat", index_params={"nlist": 4}, train_threshold=50)
+    
+    store.add_document("doc1", [f"chunk {i}" for i in range(30)])
+    assert isinstance(base_index(store.index), faiss.IndexFlatL2)
+    
+    store.add_document("doc2", [f"other {i}" for i in range(30)])
+    assert isinstance(base_index(store.index), faiss.IndexIVFFlat)
+    assert store.index.ntotal == 60
+    
+    # Ids are preserved across the switch, so exact matches still resolve
+    results = store.search_similar("other 7", k=1, nprobe=4)
+    assert results[0]["chunk"] == "other 7"
+    assert results[0]["doc_id"] == "doc2"
+    
+    # Document-scoped search reconstructs vectors through the IVF direct map
+    scoped = store.search_similar("chunk 7", k=3, doc_ids=["doc1"])
+    assert scoped[0]["chunk"] == "chunk 7"
+    assert all(r["doc_id"] == "doc1" for r in scoped)
+
+def test_vector_store_hnsw_search():
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), index_type="hnsw")
+    store.add_document("doc", [f"chunk {i}" for i in range(20)])
+    
+    results = store.search_similar("chunk 3", k=2, ef_search=32)
+    assert results[0]["chunk"] == "chunk 3"
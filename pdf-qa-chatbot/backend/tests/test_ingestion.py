@@ -0,0 +1,123 @@
+import os
+import threading
+
+import pytest
+from unittest.mock import patch
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.ingestion import IngestionQueue, IngestionQueueFullError, STAGES
+from app.services.pdf_processor import PDFProcessor
+from app.services.vector_store import VectorStore
+
+@pytest.fixture
+def saved_pdf(tmp_path):
+    from benchmarks.synthetic_pdf import make_pdf
+    def save(name="upload.pdf", pages=6):
+        path = tmp_path / name
+        path.write_bytes(make_pdf(pages=pages, lines_per_page=4))
+        return str(path)
+    return save
+
+@pytest.fixture
+def ingestion_queue():
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    queue = IngestionQueue(PDFProcessor(), store, num_workers=2, max_queue_size=4, embed_batch_size=1)
+    yield queue
+    queue.shutdown()
+
+def test_job_runs_every_stage(ingestion_queue, saved_pdf):
+    path = saved_pdf()
+    job = ingestion_queue.submit(path, "upload.pdf")
+    assert ingestion_queue.get(job.job_id) is job
+    
+    ingestion_queue.shutdown()
+    
+    status = job.to_dict()
+    assert status["status"] == "completed"
+    assert [status["stages"][stage]["status"] for stage in STAGES] == ["completed"] * 4
+    assert status["stages"]["chunk"]["total"] == 6
+    chunks = ingestion_queue.vector_store.doc_chunks[job.document_id]
+    assert status["stages"]["embed"]["done"] == len(chunks)
+    # Chunk offsets are kept so overlapping neighbours can be merged
+    assert len(ingestion_queue.vector_store.doc_char_spans[job.document_id]) == len(chunks)
+    # Chunk text is kept once, by the vector store
+    assert job.document_id not in ingestion_queue.pdf_processor.processed_files
+    # The queue owns the saved upload and removes it when done
+    assert not os.path.exists(path)
+
+def test_failed_stage_is_reported(ingestion_queue, tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+    
+    job = ingestion_queue.submit(str(path), "broken.pdf")
+    ingestion_queue.shutdown()
+    
+    assert job.status == "failed"
+    assert job.stages["extract"]["status"] == "failed"
+    assert job.stages["embed"]["status"] == "pending"
+    assert job.error.startswith("extract failed")
+
+def test_failed_job_releases_its_chunks(ingestion_queue, saved_pdf):
+    with patch.object(ingestion_queue.vector_store, "embed_texts", side_effect=RuntimeError("embedding down")):
+        job = ingestion_queue.submit(saved_pdf(), "upload.pdf")
+        ingestion_queue.shutdown()
+    
+    assert job.status == "failed" and job.stages["embed"]["status"] == "failed"
+    assert job.document_id not in ingestion_queue.pdf_processor.processed_files
+    assert job.document_id not in ingestion_queue.pdf_processor.chunk_records
+
+def test_full_queue_refuses_jobs(saved_pdf):
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    queue = IngestionQueue(PDFProcessor(), store, num_workers=1, max_queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+    original = queue._run
+    
+    def blocked_run(job):
+        started.set()
+        release.wait(5)
+        original(job)
+    
+    with patch.object(queue, '_run', side_effect=blocked_run):
+        queue.submit(saved_pdf("a.pdf"), "a.pdf")
+        started.wait(5)
+        queue.submit(saved_pdf("b.pdf"), "b.pdf")
+        with pytest.raises(IngestionQueueFullError):
+            queue.submit(saved_pdf("c.pdf"), "c.pdf")
+        release.set()
+        queue.shutdown()
+
+def test_duplicate_upload_reuses_indexed_document(ingestion_queue, saved_pdf):
+    first = ingestion_queue.submit(saved_pdf("a.pdf"), "a.pdf", content_hash="same")
+    ingestion_queue.shutdown()
+    assert first.status == "completed"
+    
+    copy = saved_pdf("copy.pdf")
+    with patch.object(ingestion_queue.pdf_processor, 'extract_pages') as extract:
+        duplicate = ingestion_queue.submit(copy, "copy.pdf", content_hash="same")
+    
+    extract.assert_not_called()
+    assert duplicate.duplicate and duplicate.status == "completed"
+    assert duplicate.document_id == first.document_id
+    assert ingestion_queue.get(duplicate.job_id) is duplicate
+    assert not os.path.exists(copy)
+
+def test_concurrent_duplicates_share_one_job(saved_pdf):
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    queue = IngestionQueue(PDFProcessor(), store, num_workers=1)
+    release = threading.Event()
+    original = queue._run
+    
+    def blocked_run(job):
+        release.wait(5)
+        original(job)
+    
+    with patch.object(queue, '_run', side_effect=blocked_run):
+        first = queue.submit(saved_pdf("a.pdf"), "a.pdf", content_hash="same")
+        second = queue.submit(saved_pdf("b.pdf"), "b.pdf", content_hash="same")
+        release.set()
+        queue.shutdown()
+    
+    assert second is first
+    assert first.status == "completed"
+    assert queue.vector_store.find_by_content_hash("same") == first.document_id
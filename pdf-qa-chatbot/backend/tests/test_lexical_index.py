@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.services.lexical_index import (
+    BM25Index, identifier_terms, is_identifier_query, reciprocal_rank_fusion, tokenize,
+)
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("See clause 4.2.1 and part AB-12") == [
+        "see", "clause", "4.2.1", "4", "2", "1", "and", "part", "ab-12", "ab", "12"
+    ]
+
+def test_is_identifier_query():
+    assert is_identifier_query("clause 4.2.1")
+    assert is_identifier_query("AB-1234")
+    assert not is_identifier_query("what does the contract say about termination")
+    assert not is_identifier_query("what happens in section 4 of the contract")
+    assert identifier_terms("What is AB-12 in 4.2?") == ["ab-12", "4.2"]
+
+def test_search_with_required_terms_ignores_other_matches():
+    index = BM25Index()
+    index.add([0, 1], ["what is this", "release 4.2 notes"])
+
+    assert index.search("what is 4.2", k=2, required_terms=["4.2"])[0].tolist()[0] == 1
+    assert index.search("what is 4.3", k=2, required_terms=["4.3"])[0].size == 0
+    assert index.search("what is 4.2", k=2, allowed_ids=np.array([0]), required_terms=["4.2"])[0].size == 0
+
+def test_search_ranks_rare_exact_terms_first():
+    index = BM25Index()
+    index.add([0, 1, 2], [
+        "general terms apply to the agreement",
+        "clause 4.2.1 limits liability under the agreement",
+        "clause 7 covers termination of the agreement",
+    ])
+    
+    ids, scores = index.search("clause 4.2.1", k=2)
+    
+    assert ids.tolist()[0] == 1
+    assert len(ids) == 2 and scores[0] > scores[1]
+    assert index.search("unrelated", k=2)[0].size == 0
+
+def test_removed_chunks_are_not_returned():
+    index = BM25Index()
+    index.add([0, 1], ["part AB-12 spec", "part AB-12 price"])
+    index.remove([0])
+    
+    assert index.search("AB-12", k=5)[0].tolist() == [1]
+    index.compact()
+    assert index.search("AB-12", k=5)[0].tolist() == [1]
+    assert len(index) == 1
+
+def test_search_restricted_to_allowed_ids():
+    index = BM25Index()
+    index.add([3, 8], ["invoice 991", "invoice 991 overdue"])
+    
+    assert index.search("invoice 991", k=5, allowed_ids=np.array([3]))[0].tolist() == [3]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]])
+    
+    assert [item for item, _ in fused] == [1, 3, 2]
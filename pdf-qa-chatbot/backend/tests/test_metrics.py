@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+
+from app.api.middleware import MetricsMiddleware
+from app.services import metrics
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.vector_store import VectorStore
+
+@pytest.fixture
+def recording():
+    was_enabled = metrics.enabled()
+    metrics.set_enabled(True)
+    metrics.STAGE_SECONDS.reset()
+    yield
+    metrics.set_enabled(was_enabled)
+
+def test_histogram_renders_cumulative_buckets():
+    registry = []
+    histogram = metrics.Histogram("test_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0), registry=registry)
+    counter = metrics.Counter("test_total", "Test count.", registry=registry)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="a")
+    counter.inc(3)
+
+    assert metrics.render(registry).splitlines() == [
+        "# HELP test_seconds Test latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 2',
+        'test_seconds_bucket{stage="a",le="1"} 3',
+        'test_seconds_bucket{stage="a",le="+Inf"} 4',
+        'test_seconds_sum{stage="a"} 2.65',
+        'test_seconds_count{stage="a"} 4',
+        "# HELP test_total Test count.",
+        "# TYPE test_total counter",
+        "test_total 3",
+    ]
+
+def test_stages_are_timed(recording):
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), retrieval_mode="vector")
+    store.add_document("doc1", ["alpha", "beta"])
+    # A query the cache has not seen, so it is embedded
+    store.search_similar("gamma", k=1)
+
+    exposition = metrics.render()
+    for stage in ("embed", "index", "query_embed", "search"):
+        assert f'pdfqa_stage_seconds_count{{stage="{stage}"}} 1' in exposition
+
+def test_disabled_metrics_record_nothing(recording):
+    metrics.set_enabled(False)
+
+    assert metrics.stage("search") is metrics.stage("embed")
+    with metrics.stage("search"):
+        pass
+    assert "pdfqa_stage_seconds_count" not in metrics.render()
+
+def test_trace_collects_stages_from_worker_threads(recording):
+    metrics.set_enabled(False)
+
+    def search():
+        with metrics.stage("search"):
+            pass
+
+    async def handle():
+        with metrics.traced() as trace:
+            with metrics.stage("query_embed"):
+                await asyncio.sleep(0)
+            await run_in_threadpool(search)
+        return trace
+
+    trace = asyncio.run(handle())
+    assert [name for name, _ in trace.spans] == ["query_embed", "search"]
+    assert trace.server_timing().startswith("query_embed;dur=")
+    assert trace.server_timing().split(", ")[-1].startswith("total;dur=")
+    # Traces are per request
+    assert metrics.stage("search") is metrics.stage("embed")
+
+def test_middleware_times_routes_and_returns_trace_header(recording):
+    metrics.REQUEST_SECONDS.reset()
+    small_app = FastAPI()
+    small_app.add_middleware(MetricsMiddleware, allow_trace=True)
+
+    @small_app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with metrics.stage("search"):
+            return {"id": item_id}
+
+    small_client = TestClient(small_app)
+    assert "server-timing" not in small_client.get("/items/1").headers
+    response = small_client.get("/items/2", headers={"X-Debug-Trace": "1"})
+
+    assert response.headers["server-timing"].startswith("search;dur=")
+    assert 'pdfqa_request_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in metrics.render()
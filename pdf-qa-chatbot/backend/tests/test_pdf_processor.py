@@ -1,3 +1,4 @@
+import os
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from io import BytesIO
@@ -81,4 +82,101 @@ def test_get_chunks_valid_id(pdf_processor):
 def test_get_chunks_invalid_id(pdf_processor):
     with pytest.raises(KeyError) as exc_info:
         pdf_processor.get_chunks("invalid-id")
-    assert "No processed file found with ID" in str(exc_info.value)
\ No newline at end of file
+    assert "No processed file found with ID" in str(exc_info.value)
+@pytest.fixture
+def multi_page_pdf():
+    from benchmarks.synthetic_pdf import make_pdf
+    return make_pdf(pages=12, lines_per_page=4)
+
+def test_iter_pages_yields_numbered_pages(pdf_processor, multi_page_pdf):
+    pages = pdf_processor.iter_pages(BytesIO(multi_page_pdf))
+    
+    page_number, text = next(pages)
+    assert page_number == 1
+    assert "Page 1 heading" in text
+    assert len(list(pages)) == 11
+
+def test_extract_pages_parallel_matches_sequential(multi_page_pdf):
+    sequential = PDFProcessor(parallel_page_threshold=1000)
+    parallel = PDFProcessor(parallel_page_threshold=4, pages_per_task=5, max_workers=2)
+    try:
+        expected = sequential.extract_pages(BytesIO(multi_page_pdf))
+        result = parallel.extract_pages(BytesIO(multi_page_pdf))
+    finally:
+        parallel.close()
+    
+    assert result == expected
+    assert [page_number for page_number, _ in result] == list(range(1, 13))
+    assert "Page 12 heading" in result[-1][1]
+
+class ChunkedUpload:
+    """Minimal UploadFile stand-in that hands out its content in pieces."""
+
+    def __init__(self, content, size=None):
+        self.stream = BytesIO(content)
+        self.size = size
+        self.reads = []
+
+    async def read(self, size=-1):
+        data = self.stream.read(size)
+        self.reads.append(len(data))
+        return data
+
+@pytest.mark.asyncio
+async def test_process_file_spools_large_upload_to_disk(multi_page_pdf):
+    processor = PDFProcessor(spool_max_size=1024, read_chunk_size=512)
+    upload = ChunkedUpload(multi_page_pdf)
+    
+    with patch.object(processor, 'extract_pages', wraps=processor.extract_pages) as extract:
+        file_id = await processor.process_file(upload)
+    
+    spooled = extract.call_args[0][0]
+    assert spooled.name.endswith(".pdf")
+    assert spooled.closed
+    assert max(upload.reads) <= 512
+    assert "Section 1." in processor.get_chunks(file_id)[0]
+
+@pytest.mark.asyncio
+async def test_process_file_rejects_oversized_upload():
+    from app.services.pdf_processor import UploadTooLargeError
+    processor = PDFProcessor(max_upload_size=1000, read_chunk_size=100)
+    upload = ChunkedUpload(b"0" * 5000)
+    
+    with pytest.raises(UploadTooLargeError):
+        await processor.process_file(upload)
+    # Reading stops as soon as the limit is crossed
+    assert sum(upload.reads) <= 1100
+
+@pytest.mark.asyncio
+async def test_process_file_rejects_known_size_before_reading():
+    from app.services.pdf_processor import UploadTooLargeError
+    processor = PDFProcessor(max_upload_size=1000)
+    upload = ChunkedUpload(b"0" * 5000, size=5000)
+    
+    with pytest.raises(UploadTooLargeError):
+        await processor.process_file(upload)
+    assert upload.reads == []
+
+def test_process_pages_keeps_chunk_records(pdf_processor):
+    pages = [(1, "First page sentence."), (2, "Second page sentence.")]
+    
+    chunks = pdf_processor.process_pages("doc", pages)
+    records = pdf_processor.get_chunk_records("doc")
+    
+    assert [record.text for record in records] == chunks
+    assert records[0].page_start == 1 and records[-1].page_end == 2
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_is_not_processed_again(multi_page_pdf):
+    import hashlib
+    processor = PDFProcessor(read_chunk_size=512)
+    path, content_hash = await processor.save_upload(ChunkedUpload(multi_page_pdf))
+    os.remove(path)
+    assert content_hash == hashlib.sha256(multi_page_pdf).hexdigest()
+    
+    file_id = await processor.process_file(ChunkedUpload(multi_page_pdf))
+    with patch.object(processor, 'extract_pages') as extract:
+        again = await processor.process_file(ChunkedUpload(multi_page_pdf))
+    
+    extract.assert_not_called()
+    assert again == file_id
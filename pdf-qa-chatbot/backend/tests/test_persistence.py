@@ -0,0 +1,231 @@
+import numpy as np
+import faiss
+import pytest
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.faiss_index import base_index
+from app.services.lexical_index import BM25Index
+from app.services.persistence import WriteAheadLog
+from app.services.vector_store import VectorStore
+
+def make_store(directory, **kwargs):
+    return VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16),
+                       storage_dir=str(directory), wal_sync=False, **kwargs)
+
+def test_wal_replay_ignores_torn_tail(tmp_path):
+    path = str(tmp_path / "wal.log")
+    wal = WriteAheadLog(path, sync=False)
+    wal.append({"op": "add", "doc_id": "a"}, np.ones((2, 4), dtype=np.float32))
+    wal.append({"op": "add", "doc_id": "b"})
+    wal.close()
+    with open(path, "ab") as log:
+        log.write(b"\x10\x00\x00")  # partial header from a crash
+    
+    records = list(WriteAheadLog.replay(path))
+    
+    assert [payload["doc_id"] for payload, _ in records] == ["a", "b"]
+    assert np.frombuffer(records[0][1], dtype=np.float32).shape == (8,)
+    assert records[1][1] is None
+
+def test_restart_replays_wal_without_snapshot(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha", "beta"])
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert restored.index.ntotal == 2
+    assert restored.doc_chunks == {"doc1": ["alpha", "beta"]}
+    assert restored.search_similar("beta", k=1)[0]["chunk"] == "beta"
+
+def test_restart_from_mmapped_snapshot_plus_wal(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha", "beta"])
+    store.save_snapshot()
+    store.add_document("doc2", ["gamma", "délta"])
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert restored.persistence.generation == 1
+    assert restored.index.ntotal == 4
+    assert restored.doc_chunks["doc2"] == ["gamma", "délta"]
+    assert restored.chunk_map[3] == ("doc2", 1)
+    results = restored.search_similar("délta", k=1, doc_ids=["doc2"])
+    assert results[0]["chunk"] == "délta"
+
+def test_chunk_offsets_survive_restart(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha beta", "beta gamma"], char_spans=[(0, 10), (6, 16)])
+    store.add_document("doc2", ["delta"])
+    store.save_snapshot()
+    store.add_document("doc3", ["epsilon"], char_spans=[(0, 7)])
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    result = restored.search_similar("beta gamma", k=1, doc_ids=["doc1"], with_metadata=True)[0]
+    assert (result["char_start"], result["char_end"]) == (6, 16)
+    assert "char_start" not in restored.search_similar("delta", k=1, doc_ids=["doc2"], with_metadata=True)[0]
+    assert restored.doc_char_spans["doc3"].tolist() == [[0, 7]]
+
+def test_snapshot_interval_rolls_generation(tmp_path):
+    store = make_store(tmp_path, snapshot_interval=2)
+    store.add_document("doc1", ["a"])
+    store.add_document("doc2", ["b"])
+    
+    assert store.persistence.generation == 1
+    assert list(store.persistence.replay_wal()) == []
+    assert not (tmp_path / "wal-0.log").exists()
+
+def test_previous_generation_kept_for_readers(tmp_path):
+    store = make_store(tmp_path, snapshot_interval=0)
+    store.add_document("doc1", ["alpha"])
+    store.save_snapshot()
+    reader = store.persistence.reopen(1)
+    store.add_document("doc2", ["beta"])
+    store.save_snapshot()
+    
+    # A reader that saw generation 1 before CURRENT moved can still load it
+    assert reader.load()["meta"]["documents"] == ["doc1"]
+    assert not (tmp_path / "wal-1.log").exists()
+    store.save_snapshot()
+    
+    assert sorted(p.name for p in tmp_path.glob("snapshot-*")) == ["snapshot-2", "snapshot-3"]
+
+def test_mmapped_ivf_index_becomes_writable(tmp_path):
+    kwargs = {"index_type": "ivf_flat", "index_params": {"nlist": 2}, "train_threshold": 20}
+    store = make_store(tmp_path, **kwargs)
+    store.add_document("doc1", [f"chunk {i}" for i in range(30)])
+    store.save_snapshot()
+    store.persistence.close()
+    
+    restored = make_store(tmp_path, **kwargs)
+    assert isinstance(base_index(restored.index), faiss.IndexIVFFlat)
+    restored.add_document("doc2", ["new chunk"])
+    
+    assert restored.index.ntotal == 31
+    assert restored.search_similar("new chunk", k=1, nprobe=2)[0]["doc_id"] == "doc2"
+
+def test_mmapped_flat_index_is_copied_on_first_write(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha", "beta"])
+    store.save_snapshot()
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    assert isinstance(base_index(restored.index), faiss.IndexFlat)
+    # The flat codes are mapped from the snapshot until something is added
+    assert restored._index_read_only
+    assert restored.search_similar("beta", k=1)[0]["chunk"] == "beta"
+    restored.add_document("doc2", ["gamma"])
+    
+    assert not restored._index_read_only
+    assert restored.index.ntotal == 3
+    assert restored.search_similar("gamma", k=1)[0]["doc_id"] == "doc2"
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["a"])
+    store.save_snapshot()
+    
+    with pytest.raises(ValueError):
+        VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=8), storage_dir=str(tmp_path))
+
+def test_deletes_survive_restart(tmp_path):
+    store = make_store(tmp_path, compaction_threshold=1.0)
+    store.add_document("doc1", ["alpha"])
+    store.add_document("doc2", ["beta"], ttl=3600)
+    store.save_snapshot()
+    store.delete_document("doc1")
+    store.persistence.close()
+    
+    restored = make_store(tmp_path, compaction_threshold=1.0)
+    
+    assert not restored.has_document("doc1")
+    assert restored._tombstones == {0}
+    assert restored.search_similar("alpha", k=2)[0]["doc_id"] == "doc2"
+    assert "doc2" in restored._expires_at
+    restored.add_document("doc3", ["gamma"])
+    assert restored.doc_vector_ids["doc3"].tolist() == [2]
+
+def test_token_counts_survive_restart(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha", "beta gamma delta"])
+    store.save_snapshot()
+    store.add_document("doc2", ["epsilon zeta"])
+    expected = {doc_id: counts.tolist() for doc_id, counts in store.doc_token_counts.items()}
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert {doc_id: counts.tolist() for doc_id, counts in restored.doc_token_counts.items()} == expected
+
+def test_keyword_index_rebuilt_on_restart(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["part AB-12 spec", "other"])
+    store.save_snapshot()
+    store.add_document("doc2", ["invoice 991"])
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert restored.search_lexical("AB-12")[0]["doc_id"] == "doc1"
+    assert restored.search_lexical("invoice 991")[0]["doc_id"] == "doc2"
+
+def test_keyword_index_loaded_from_snapshot(tmp_path, monkeypatch):
+    store = make_store(tmp_path, compaction_threshold=1.0)
+    store.add_document("doc1", ["part AB-12 spec", "other"])
+    store.add_document("doc2", ["part AB-12 draft"])
+    store.delete_document("doc2")
+    store.save_snapshot()
+    expected = store.search_lexical("part AB-12")
+    store.persistence.close()
+    
+    def tokenize_again(self, ids, texts):
+        raise AssertionError("snapshot chunks were re-tokenized")
+    monkeypatch.setattr(BM25Index, "add", tokenize_again)
+    restored = make_store(tmp_path, compaction_threshold=1.0)
+    
+    assert restored.search_lexical("part AB-12") == expected
+    assert [r["doc_id"] for r in expected] == ["doc1"]
+    assert len(restored.lexical_index) == 2
+
+def test_content_hashes_survive_restart(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha"], content_hash="hash1")
+    store.save_snapshot()
+    store.add_document("doc2", ["beta"], content_hash="hash2")
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert restored.find_by_content_hash("hash1") == "doc1"
+    assert restored.find_by_content_hash("hash2") == "doc2"
+
+def test_replaced_document_survives_snapshot(tmp_path):
+    store = make_store(tmp_path)
+    store.add_document("doc1", ["alpha", "beta"])
+    store.add_document("doc2", ["gamma"])
+    store.replace_document("doc1", ["alpha two"])
+    store.save_snapshot()
+    store.persistence.close()
+    
+    restored = make_store(tmp_path)
+    
+    assert restored.doc_chunks == {"doc2": ["gamma"], "doc1": ["alpha two"]}
+    assert restored.chunk_map[3] == ("doc1", 0)
+    assert restored.doc_token_counts["doc1"].tolist() == store.doc_token_counts["doc1"].tolist()
+
+def test_rerank_vectors_memory_mapped_after_snapshot(tmp_path):
+    store = make_store(tmp_path, vector_storage="sq8", train_threshold=10, retrieval_mode="vector")
+    store.add_document("doc1", [f"alpha {i}" for i in range(20)])
+    store.save_snapshot()
+    store.add_document("doc2", ["beta"])
+    assert isinstance(store._exact._head, np.memmap)
+    store.persistence.close()
+    
+    restored = make_store(tmp_path, vector_storage="sq8", train_threshold=10, retrieval_mode="vector")
+    
+    assert len(restored._exact) == 21
+    assert restored.search_similar("alpha 7", k=1)[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert restored.search_similar("beta", k=1)[0]["chunk"] == "beta"
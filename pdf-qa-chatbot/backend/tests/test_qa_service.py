@@ -1,20 +1,24 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock
 from app.services.qa_service import QAService
 
 @pytest.fixture
 def mock_vector_store():
-    return Mock()
+    store = Mock()
+    store.asearch_similar = AsyncMock()
+    return store
 
 @pytest.fixture
 def qa_service(mock_vector_store):
-    with patch('openai.OpenAI'):
-        service = QAService(mock_vector_store)
-        return service
+    client = Mock()
+    client.chat.completions.create = AsyncMock()
+    return QAService(mock_vector_store, client=client)
 
-def test_get_answer_with_context(qa_service, mock_vector_store):
+@pytest.mark.asyncio
+async def test_get_answer_with_context(qa_service, mock_vector_store):
     # Mock vector store response
-    mock_vector_store.search_similar.return_value = [
+    mock_vector_store.asearch_similar.return_value = [
         {"chunk": "Test context 1", "doc_id": "doc1", "distance": 0.1},
         {"chunk": "Test context 2", "doc_id": "doc1", "distance": 0.2}
     ]
@@ -25,7 +29,7 @@ def test_get_answer_with_context(qa_service, mock_vector_store):
     qa_service.client.chat.completions.create.return_value = mock_response
     
     # Test get_answer
-    result = qa_service.get_answer("test question")
+    result = await qa_service.get_answer("test question")
     
     assert isinstance(result, dict)
     assert "answer" in result
@@ -36,12 +40,13 @@ def test_get_answer_with_context(qa_service, mock_vector_store):
     assert isinstance(result["confidence"], float)
     assert 0 <= result["confidence"] <= 1
 
-def test_get_answer_no_context(qa_service, mock_vector_store):
+@pytest.mark.asyncio
+async def test_get_answer_no_context(qa_service, mock_vector_store):
     # Mock vector store with no results
-    mock_vector_store.search_similar.return_value = []
+    mock_vector_store.asearch_similar.return_value = []
     
     # Test get_answer
-    result = qa_service.get_answer("test question")
+    result = await qa_service.get_answer("test question")
     
     assert isinstance(result, dict)
     assert "answer" in result
@@ -51,13 +56,14 @@ def test_get_answer_no_context(qa_service, mock_vector_store):
     assert len(result["context_used"]) == 0
     assert result["confidence"] == 0.0
 
-def test_get_answer_with_max_context_chunks(qa_service, mock_vector_store):
+@pytest.mark.asyncio
+async def test_get_answer_with_max_context_chunks(qa_service, mock_vector_store):
     # Mock vector store response
     mock_chunks = [
         {"chunk": f"Test context {i}", "doc_id": "doc1", "distance": 0.1 * i}
         for i in range(5)
     ]
-    mock_vector_store.search_similar.return_value = mock_chunks
+    mock_vector_store.asearch_similar.return_value = mock_chunks
     
     # Mock OpenAI response
     mock_response = Mock()
@@ -65,14 +71,15 @@ def test_get_answer_with_max_context_chunks(qa_service, mock_vector_store):
     qa_service.client.chat.completions.create.return_value = mock_response
     
     # Test get_answer with max_context_chunks=3
-    result = qa_service.get_answer("test question", max_context_chunks=3)
+    result = await qa_service.get_answer("test question", max_context_chunks=3)
     
     assert len(result["context_used"]) == 3
-    mock_vector_store.search_similar.assert_called_with("test question", k=3)
+    mock_vector_store.asearch_similar.assert_awaited_with("test question", k=3, with_metadata=True)
 
-def test_get_answer_openai_prompt_format(qa_service, mock_vector_store):
+@pytest.mark.asyncio
+async def test_get_answer_openai_prompt_format(qa_service, mock_vector_store):
     # Mock vector store response
-    mock_vector_store.search_similar.return_value = [
+    mock_vector_store.asearch_similar.return_value = [
         {"chunk": "Test context", "doc_id": "doc1", "distance": 0.1}
     ]
     
@@ -82,7 +89,7 @@ def test_get_answer_openai_prompt_format(qa_service, mock_vector_store):
     qa_service.client.chat.completions.create.return_value = mock_response
     
     # Test get_answer
-    qa_service.get_answer("test question")
+    await qa_service.get_answer("test question")
     
     # Verify OpenAI API call
     create_call = qa_service.client.chat.completions.create.call_args
@@ -95,4 +102,219 @@ def test_get_answer_openai_prompt_format(qa_service, mock_vector_store):
     assert kwargs["messages"][0]["role"] == "system"
     assert kwargs["messages"][1]["role"] == "user"
     assert "test question" in kwargs["messages"][1]["content"]
-    assert "Test context" in kwargs["messages"][1]["content"]
\ No newline at end of file
+    assert "Test context" in kwargs["messages"][1]["content"]
+    assert kwargs["timeout"] == qa_service.timeout
+
+@pytest.mark.asyncio
+async def test_get_answer_scoped_to_document(qa_service, mock_vector_store):
+    mock_vector_store.has_document.return_value = True
+    mock_vector_store.asearch_similar.return_value = []
+    
+    await qa_service.get_answer("test question", document_id="doc1")
+    
+    mock_vector_store.asearch_similar.assert_awaited_with(
+        "test question", k=qa_service.context_candidates, doc_ids=["doc1"], with_metadata=True
+    )
+
+@pytest.mark.asyncio
+async def test_get_answer_unknown_document(qa_service, mock_vector_store):
+    mock_vector_store.has_document.return_value = False
+    
+    with pytest.raises(KeyError) as exc_info:
+        await qa_service.get_answer("test question", document_id="missing")
+    assert "Document not found" in str(exc_info.value)
+    assert not mock_vector_store.asearch_similar.called
+
+@pytest.mark.asyncio
+async def test_get_answer_caps_concurrent_requests(mock_vector_store):
+    mock_vector_store.asearch_similar.return_value = [
+        {"chunk": "Test context", "doc_id": "doc1", "distance": 0.1}
+    ]
+    in_flight = 0
+    peak = 0
+    
+    async def slow_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return Mock(choices=[Mock(message=Mock(content="Test answer"))])
+    
+    client = Mock()
+    client.chat.completions.create = slow_create
+    service = QAService(mock_vector_store, client=client, max_concurrent_requests=2)
+    
+    results = await asyncio.gather(*(service.get_answer(f"question {i}") for i in range(6)))
+    
+    assert [r["answer"] for r in results] == ["Test answer"] * 6
+    assert peak == 2
+
+class FakeStream:
+    """Async iterator standing in for an OpenAI streaming response."""
+    
+    def __init__(self, fragments):
+        self.chunks = [Mock(choices=[Mock(delta=Mock(content=text))]) for text in fragments]
+        self.closed = False
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+    
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_stream_answer_sends_context_then_tokens(qa_service, mock_vector_store):
+    mock_vector_store.asearch_similar.return_value = [
+        {"chunk": "Test context", "doc_id": "doc1", "distance": 0.1}
+    ]
+    stream = FakeStream(["Test", " answer", None])
+    qa_service.client.chat.completions.create.return_value = stream
+    
+    events = [event async for event in qa_service.stream_answer("test question")]
+    
+    assert events[0]["type"] == "context"
+    assert events[0]["context_used"] == [{"text": "Test context", "doc_id": "doc1"}]
+    assert [e["content"] for e in events if e["type"] == "token"] == ["Test", " answer"]
+    assert events[-1] == {"type": "done", "answer": "Test answer"}
+    assert qa_service.client.chat.completions.create.call_args[1]["stream"] is True
+    assert stream.closed
+
+@pytest.mark.asyncio
+async def test_stream_answer_without_context(qa_service, mock_vector_store):
+    mock_vector_store.asearch_similar.return_value = []
+    
+    events = [event async for event in qa_service.stream_answer("test question")]
+    
+    assert [e["type"] for e in events] == ["context", "token", "done"]
+    assert "couldn't find any relevant information" in events[-1]["answer"].lower()
+    assert not qa_service.client.chat.completions.create.called
+
+@pytest.mark.asyncio
+async def test_get_answer_reuses_cached_answers(mock_vector_store):
+    from app.services.answer_cache import AnswerCache
+    import numpy as np
+    mock_vector_store.document_version.return_value = 1
+    mock_vector_store.agenerate_embeddings = AsyncMock(side_effect=lambda q: np.array([1.0, 0.1 * len(q)]))
+    mock_vector_store.asearch_similar.return_value = [
+        {"chunk": "Test context", "doc_id": "doc1", "distance": 0.1}
+    ]
+    client = Mock()
+    client.chat.completions.create = AsyncMock(
+        return_value=Mock(choices=[Mock(message=Mock(content="Test answer"))])
+    )
+    service = QAService(mock_vector_store, client=client,
+                        answer_cache=AnswerCache(similarity_threshold=0.99))
+    
+    first = await service.get_answer("What is it?", document_id="doc1")
+    exact = await service.get_answer("what is it", document_id="doc1")
+    # Same length, so the fake embedding is identical
+    similar = await service.get_answer("Whats it???", document_id="doc1")
+    
+    assert first == exact == similar
+    assert client.chat.completions.create.await_count == 1
+    assert service.answer_cache.stats()["exact_hits"] == 1
+    assert service.answer_cache.stats()["semantic_hits"] == 1
+    
+    # A new version of the document must not be answered from the cache
+    mock_vector_store.document_version.return_value = 2
+    await service.get_answer("What is it?", document_id="doc1")
+    assert client.chat.completions.create.await_count == 2
+
+@pytest.mark.asyncio
+async def test_get_answer_fits_context_to_token_budget(mock_vector_store):
+    from app.services.context_builder import ContextBuilder
+    mock_vector_store.asearch_similar.return_value = [
+        {"chunk": f"Passage {i} " + "word " * 50, "doc_id": "doc1", "distance": 0.1 * i,
+         "chunk_index": 2 * i, "tokens": 100}
+        for i in range(8)
+    ]
+    client = Mock()
+    client.chat.completions.create = AsyncMock(
+        return_value=Mock(choices=[Mock(message=Mock(content="Test answer"))])
+    )
+    service = QAService(mock_vector_store, client=client,
+                        context_builder=ContextBuilder(max_context_tokens=350))
+    
+    result = await service.get_answer("test question")
+    
+    assert [c["text"].split()[1] for c in result["context_used"]] == ["0", "1", "2"]
+    assert client.chat.completions.create.call_args[1]["max_tokens"] == 500
+
+def echo_client(delays=None):
+    """Client whose answer repeats the question, optionally slower for some questions."""
+    async def create(**kwargs):
+        question = kwargs["messages"][1]["content"].split("Question: ")[1].split("\n")[0]
+        await asyncio.sleep((delays or {}).get(question, 0))
+        return Mock(choices=[Mock(message=Mock(content=f"About {question}"))])
+    
+    client = Mock()
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    return client
+
+@pytest.mark.asyncio
+async def test_get_answers_searches_once_and_keeps_order(mock_vector_store):
+    questions = ["q0?", "q1?", "q0?", "q2?"]
+    mock_vector_store.asearch_similar_batch = AsyncMock(
+        side_effect=lambda qs, **kwargs: [[{"chunk": f"ctx {q}", "doc_id": "doc1", "distance": 0.1}] for q in qs]
+    )
+    client = echo_client(delays={"q0?": 0.03})
+    service = QAService(mock_vector_store, client=client)
+    
+    results = await service.get_answers(questions, document_id="doc1")
+    
+    assert [r["answer"] for r in results] == ["About q0?", "About q1?", "About q0?", "About q2?"]
+    # One search for the batch and one completion per distinct question
+    mock_vector_store.asearch_similar_batch.assert_awaited_once()
+    assert mock_vector_store.asearch_similar_batch.call_args[0][0] == ["q0?", "q1?", "q2?"]
+    assert client.chat.completions.create.await_count == 3
+
+@pytest.mark.asyncio
+async def test_stream_answers_yields_in_completion_order(mock_vector_store):
+    mock_vector_store.asearch_similar_batch = AsyncMock(
+        side_effect=lambda qs, **kwargs: [[{"chunk": "ctx", "doc_id": "doc1", "distance": 0.1}] for _ in qs]
+    )
+    service = QAService(mock_vector_store, client=echo_client(delays={"slow?": 0.05}))
+    
+    results = [r async for r in service.stream_answers(["slow?", "fast?"])]
+    
+    assert [(r["index"], r["answer"]) for r in results] == [(1, "About fast?"), (0, "About slow?")]
+
+@pytest.mark.asyncio
+async def test_get_answers_caps_batch_concurrency(mock_vector_store):
+    mock_vector_store.asearch_similar_batch = AsyncMock(
+        side_effect=lambda qs, **kwargs: [[{"chunk": "ctx", "doc_id": "doc1", "distance": 0.1}] for _ in qs]
+    )
+    in_flight = 0
+    peak = 0
+    
+    async def slow_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if "q3" in kwargs["messages"][1]["content"]:
+            raise RuntimeError("upstream failed")
+        return Mock(choices=[Mock(message=Mock(content="Test answer"))])
+    
+    client = Mock()
+    client.chat.completions.create = slow_create
+    service = QAService(mock_vector_store, client=client)
+    
+    results = await service.get_answers([f"q{i}" for i in range(8)], max_concurrency=3)
+    
+    assert peak == 3
+    assert results[3] == {"error": "upstream failed"}
+    assert all(r["answer"] == "Test answer" for i, r in enumerate(results) if i != 3)
+
+@pytest.mark.asyncio
+async def test_get_answers_unknown_document(qa_service, mock_vector_store):
+    mock_vector_store.has_document.return_value = False
+    
+    with pytest.raises(KeyError):
+        await qa_service.get_answers(["q?"], document_id="missing")
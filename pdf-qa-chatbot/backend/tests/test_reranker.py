@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+
+from app.services.qa_service import QAService
+from app.services.reranker import FakeRerankScorer, Reranker, create_reranker
+
+CHUNKS = [{"chunk": text, "doc_id": "doc1", "distance": 0.1 * i}
+          for i, text in enumerate(["the weather is mild", "refund policy details",
+                                    "how long does a refund take", "shipping times"])]
+
+def test_rerank_orders_by_score_and_keeps_best():
+    reranker = Reranker(FakeRerankScorer(), keep=2, budget=10)
+    ranked = reranker.rerank("how long does a refund take", CHUNKS)
+
+    assert [chunk["chunk"] for chunk in ranked] == ["how long does a refund take", "refund policy details"]
+    assert ranked[0]["rerank_score"] == 1.0
+    assert ranked[0]["doc_id"] == "doc1" and "rerank_score" not in CHUNKS[2]
+
+def test_scores_are_cached_per_question_and_chunk():
+    scorer = FakeRerankScorer(batch_size=2)
+    reranker = Reranker(scorer, keep=2, budget=10)
+    first = reranker.rerank("refund", CHUNKS)
+    calls = scorer.calls
+
+    assert reranker.rerank("refund", CHUNKS) == first
+    assert scorer.calls == calls == 2
+    reranker.rerank("shipping", CHUNKS)
+    assert scorer.calls == 4
+    assert reranker.stats()["hits"] == 4 and reranker.stats()["misses"] == 8
+
+def test_over_budget_keeps_search_order():
+    scorer = FakeRerankScorer(batch_size=1, latency=0.02)
+    reranker = Reranker(scorer, keep=2, budget=0.03)
+    ranked = reranker.rerank("how long does a refund take", CHUNKS)
+
+    assert ranked == CHUNKS[:2]
+    assert scorer.calls < len(CHUNKS)
+    assert reranker.stats()["fallbacks"] == 1
+    # What was scored in time is reused by the next attempt
+    assert reranker.stats()["items"] == scorer.calls
+
+def test_finished_scoring_is_used_even_over_budget():
+    scorer = FakeRerankScorer(latency=0.05)
+    reranker = Reranker(scorer, keep=2, budget=0.01)
+    ranked = reranker.rerank("how long does a refund take", CHUNKS)
+
+    # The only batch overran the budget, but every candidate has a score
+    assert [chunk["chunk"] for chunk in ranked] == ["how long does a refund take", "refund policy details"]
+    assert reranker.stats()["fallbacks"] == 0
+
+def test_create_reranker_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("RERANKER", raising=False)
+
+    assert create_reranker() is None
+    assert isinstance(create_reranker("fake").scorer, FakeRerankScorer)
+    with pytest.raises(ValueError):
+        create_reranker("bogus")
+
+@pytest.mark.asyncio
+async def test_qa_service_over_fetches_and_reranks_context():
+    store = Mock()
+    store.asearch_similar = AsyncMock(return_value=CHUNKS)
+    client = Mock()
+    client.chat.completions.create = AsyncMock(
+        return_value=Mock(choices=[Mock(message=Mock(content="A few days."))])
+    )
+    reranker = Reranker(FakeRerankScorer(), candidates=20, keep=1, budget=10)
+    service = QAService(store, client=client, reranker=reranker)
+
+    result = await service.get_answer("how long does a refund take")
+
+    store.asearch_similar.assert_awaited_with("how long does a refund take", k=20, with_metadata=True)
+    assert [source["text"] for source in result["context_used"]] == ["how long does a refund take"]
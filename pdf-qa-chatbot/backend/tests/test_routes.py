@@ -1,6 +1,7 @@
 """
 Tests for the FastAPI routes in the PDF QA Chatbot application.
 """
+import json
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import UploadFile
@@ -13,19 +14,42 @@ from app.services.pdf_processor import PDFProcessor
 client = TestClient(app)
 
 def test_upload_valid_pdf(sample_pdf_content):
-    """Test uploading a valid PDF file."""
+    """Test uploading a valid PDF file queues an ingestion job."""
     pdf_file = BytesIO(sample_pdf_content)
     files = {"file": ("test.pdf", pdf_file, "application/pdf")}
+    job = Mock(job_id="test_job_id", document_id="test_file_id", duplicate=False)
+    queue = Mock()
+    queue.submit.return_value = job
     
-    with patch.object(PDFProcessor, 'process_file', return_value="test_file_id"):
+    with patch.object(PDFProcessor, 'save_upload', return_value=("/tmp/test.pdf", "abc123")), \
+            patch('app.api.routes.get_ingestion_queue', return_value=queue):
         response = client.post("/upload", files=files)
     
-    assert response.status_code == 200
+    assert response.status_code == 202
     assert response.json() == {
-        "status": "success",
-        "message": "PDF processed successfully",
+        "status": "queued",
+        "message": "PDF queued for processing",
+        "duplicate": False,
+        "job_id": "test_job_id",
         "file_id": "test_file_id"
     }
+    queue.submit.assert_called_once_with("/tmp/test.pdf", "test.pdf", content_hash="abc123")
+
+def test_upload_duplicate_pdf_returns_existing_document(sample_pdf_content):
+    """Test that re-uploading indexed content returns the existing document at once."""
+    files = {"file": ("copy.pdf", BytesIO(sample_pdf_content), "application/pdf")}
+    job = Mock(job_id="dup_job_id", document_id="existing_file_id", duplicate=True)
+    queue = Mock()
+    queue.submit.return_value = job
+    
+    with patch.object(PDFProcessor, 'save_upload', return_value=("/tmp/copy.pdf", "abc123")), \
+            patch('app.api.routes.get_ingestion_queue', return_value=queue):
+        response = client.post("/upload", files=files)
+    
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["duplicate"] is True
+    assert response.json()["file_id"] == "existing_file_id"
 
 def test_upload_invalid_file_type():
     """Test uploading a non-PDF file."""
@@ -42,7 +66,7 @@ def test_upload_empty_file():
     empty_file = BytesIO(b"")
     files = {"file": ("empty.pdf", empty_file, "application/pdf")}
     
-    with patch.object(PDFProcessor, 'process_file', side_effect=Exception("Empty file")):
+    with patch.object(PDFProcessor, 'save_upload', side_effect=Exception("Empty file")):
         response = client.post("/upload", files=files)
     
     assert response.status_code == 500
@@ -54,7 +78,7 @@ def test_upload_large_file():
     large_file = BytesIO(b"0" * (10 * 1024 * 1024 + 1))  # 10MB + 1 byte
     files = {"file": ("large.pdf", large_file, "application/pdf")}
     
-    with patch.object(PDFProcessor, 'process_file', side_effect=Exception("File too large")):
+    with patch.object(PDFProcessor, 'save_upload', side_effect=Exception("File too large")):
         response = client.post("/upload", files=files)
     
     assert response.status_code == 500
@@ -112,4 +136,159 @@ def test_question_no_context():
         response = client.post("/question", json=question_data)
     
     assert response.status_code == 404
-    assert "No context available" in response.json()["detail"]
\ No newline at end of file
+    assert "No context available" in response.json()["detail"]
+def test_upload_over_size_limit_returns_413(sample_pdf_content):
+    """Test that an upload rejected by the processor maps to 413."""
+    from app.services.pdf_processor import UploadTooLargeError
+    files = {"file": ("test.pdf", BytesIO(sample_pdf_content), "application/pdf")}
+    
+    with patch.object(PDFProcessor, 'save_upload', side_effect=UploadTooLargeError("too big")):
+        response = client.post("/upload", files=files)
+    
+    assert response.status_code == 413
+    assert "too big" in response.json()["detail"]
+
+def test_size_limit_middleware_rejects_before_reading_body():
+    """Test that the middleware refuses bodies over the limit."""
+    from fastapi import FastAPI, Request
+    from app.api.middleware import UploadSizeLimitMiddleware
+    
+    small_app = FastAPI()
+    small_app.add_middleware(UploadSizeLimitMiddleware, max_body_size=100)
+    
+    @small_app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+    
+    small_client = TestClient(small_app)
+    assert small_client.post("/echo", content=b"x" * 100).json() == {"size": 100}
+    
+    response = small_client.post("/echo", content=b"x" * 101)
+    assert response.status_code == 413
+    
+    # Chunked bodies have no Content-Length and are counted as they arrive
+    response = small_client.post("/echo", content=iter([b"x" * 60, b"x" * 60]))
+    assert response.status_code == 413
+
+def test_upload_queue_full_returns_503(sample_pdf_content, tmp_path):
+    """Test that a full ingestion queue refuses the upload and removes the saved file."""
+    from app.services.ingestion import IngestionQueueFullError
+    saved = tmp_path / "upload.pdf"
+    saved.write_bytes(sample_pdf_content)
+    queue = Mock()
+    queue.submit.side_effect = IngestionQueueFullError("Ingestion queue is full")
+    files = {"file": ("test.pdf", BytesIO(sample_pdf_content), "application/pdf")}
+    
+    with patch.object(PDFProcessor, 'save_upload', return_value=(str(saved), "abc123")), \
+            patch('app.api.routes.get_ingestion_queue', return_value=queue):
+        response = client.post("/upload", files=files)
+    
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert not saved.exists()
+
+def test_get_job_status():
+    """Test reporting the progress of a known job."""
+    job = Mock()
+    job.to_dict.return_value = {"job_id": "test_job_id", "status": "running"}
+    queue = Mock()
+    queue.get.return_value = job
+    
+    with patch('app.api.routes.get_ingestion_queue', return_value=queue):
+        response = client.get("/jobs/test_job_id")
+    
+    assert response.status_code == 200
+    assert response.json() == {"job_id": "test_job_id", "status": "running"}
+
+def test_get_job_unknown():
+    """Test looking up a job that does not exist."""
+    queue = Mock()
+    queue.get.return_value = None
+    
+    with patch('app.api.routes.get_ingestion_queue', return_value=queue):
+        response = client.get("/jobs/missing")
+    
+    assert response.status_code == 404
+    assert "Job not found" in response.json()["detail"]
+
+def test_question_stream_sends_sse_events():
+    """Test that streamed answers arrive as Server-Sent Events, citations first."""
+    async def fake_stream(self, question, document_id=None):
+        yield {"type": "context", "context_used": [{"text": "ctx", "doc_id": "test_doc_id"}], "confidence": 0.9}
+        yield {"type": "token", "content": "Hello"}
+        yield {"type": "done", "answer": "Hello"}
+    
+    with patch('app.services.qa_service.QAService.stream_answer', fake_stream):
+        response = client.post("/question/stream", json={"question": "Hi?", "document_id": "test_doc_id"})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in messages] == ["event: context", "event: token", "event: done"]
+    assert json.loads(messages[1][1][len("data: "):]) == {"type": "token", "content": "Hello"}
+
+def test_question_stream_unknown_document():
+    """Test that a missing document is reported before the stream starts."""
+    async def fake_stream(self, question, document_id=None):
+        raise KeyError(f"Document not found: {document_id}")
+        yield
+    
+    with patch('app.services.qa_service.QAService.stream_answer', fake_stream):
+        response = client.post("/question/stream", json={"question": "Hi?", "document_id": "missing"})
+    
+    assert response.status_code == 404
+    assert "Document not found" in response.json()["detail"]
+
+def test_questions_batch_returns_answers_in_order():
+    """Test that batch answers come back in request order."""
+    async def fake_get_answers(self, questions, document_id=None, max_concurrency=None):
+        return [{"answer": f"About {q}", "context_used": [], "confidence": 0.5} for q in questions]
+    
+    with patch('app.services.qa_service.QAService.get_answers', fake_get_answers):
+        response = client.post("/questions/batch",
+                               json={"questions": ["A?", "B?"], "document_id": "test_doc_id"})
+    
+    assert response.status_code == 200
+    assert [a["answer"] for a in response.json()["answers"]] == ["About A?", "About B?"]
+
+def test_questions_batch_streams_as_completed():
+    """Test that streamed batch answers arrive tagged with their question index."""
+    async def fake_stream_answers(self, questions, document_id=None, max_concurrency=None):
+        yield {"index": 1, "answer": "About B?"}
+        yield {"index": 0, "answer": "About A?"}
+    
+    with patch('app.services.qa_service.QAService.stream_answers', fake_stream_answers):
+        response = client.post("/questions/batch",
+                               json={"questions": ["A?", "B?"], "document_id": "test_doc_id", "stream": True})
+    
+    assert response.status_code == 200
+    messages = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in messages] == ["event: answer", "event: answer", "event: done"]
+    assert json.loads(messages[0][1][len("data: "):])["index"] == 1
+
+def test_questions_batch_unknown_document():
+    """Test that a missing document is a 404 for batches too."""
+    async def fake_get_answers(self, questions, document_id=None, max_concurrency=None):
+        raise KeyError(f"Document not found: {document_id}")
+    
+    with patch('app.services.qa_service.QAService.get_answers', fake_get_answers):
+        response = client.post("/questions/batch", json={"questions": ["A?"], "document_id": "missing"})
+    
+    assert response.status_code == 404
+    assert "Document not found" in response.json()["detail"]
+
+def test_questions_batch_rejects_empty_question():
+    """Test that empty questions in a batch are rejected."""
+    response = client.post("/questions/batch", json={"questions": ["A?", " "], "document_id": "test_doc_id"})
+    
+    assert response.status_code == 400
+
+def test_metrics_endpoint_exports_prometheus_text():
+    """Test that /metrics reports request latency and service gauges."""
+    client.get("/")
+    response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE pdfqa_stage_seconds histogram" in response.text
+    assert 'pdfqa_request_seconds_count{method="GET",route="/",status="200"}' in response.text
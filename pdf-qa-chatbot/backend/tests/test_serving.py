@@ -0,0 +1,126 @@
+import json
+import os
+
+import pytest
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.ingestion import IngestionQueue
+from app.services.pdf_processor import PDFProcessor
+from app.services.serving import IngestionInbox, InboxPump, WriterLock
+from app.services.vector_store import VectorStore
+
+def make_store(directory, **kwargs):
+    return VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16),
+                       storage_dir=str(directory), wal_sync=False, **kwargs)
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_reader_hot_swaps_generations(tmp_path, index_type):
+    writer = make_store(tmp_path, index_type=index_type, snapshot_interval=0)
+    writer.add_document("doc1", ["alpha", "beta"])
+    writer.save_snapshot()
+    reader = make_store(tmp_path, read_only=True)
+    assert reader.search_similar("beta", k=1)[0]["chunk"] == "beta"
+    version = reader.document_version()
+
+    writer.add_document("doc2", ["gamma"])
+    # Nothing is visible to readers until the writer publishes a generation
+    assert reader.refresh() is False
+    writer.save_snapshot()
+
+    assert reader.refresh() is True
+    assert reader.refresh() is False
+    assert reader.doc_chunks == {"doc1": ["alpha", "beta"], "doc2": ["gamma"]}
+    assert reader.search_similar("gamma", k=1)[0]["chunk"] == "gamma"
+    assert reader.document_version() != version
+    # Vector ids survive snapshots, so unchanged documents keep their version
+    assert reader.document_version("doc1") == writer.document_version("doc1")
+
+def test_reader_ignores_unpublished_wal(tmp_path):
+    writer = make_store(tmp_path, snapshot_interval=0)
+    writer.add_document("doc1", ["alpha"])
+    writer.save_snapshot()
+    writer.add_document("doc2", ["beta"])
+    reader = make_store(tmp_path, read_only=True)
+
+    # The index stays mapped from the snapshot instead of being copied to apply the log
+    assert reader._index_read_only
+    assert reader.doc_chunks == {"doc1": ["alpha"]}
+    writer.save_snapshot()
+    writer.add_document("doc3", ["gamma"])
+    assert reader.refresh() is True
+    assert reader._index_read_only
+    assert reader.doc_chunks == {"doc1": ["alpha"], "doc2": ["beta"]}
+
+def test_reader_refuses_mutations(tmp_path):
+    writer = make_store(tmp_path)
+    writer.add_document("doc1", ["alpha"])
+    writer.save_snapshot()
+    reader = make_store(tmp_path, read_only=True)
+
+    with pytest.raises(RuntimeError):
+        reader.add_document("doc2", ["beta"])
+    with pytest.raises(RuntimeError):
+        reader.delete_document("doc1")
+    with pytest.raises(RuntimeError):
+        reader.save_snapshot()
+    assert reader.persistence.wal is None
+    assert reader.doc_chunks == {"doc1": ["alpha"]}
+    with pytest.raises(ValueError):
+        VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), read_only=True)
+
+def test_writer_lock_elects_one_process(tmp_path):
+    first, second = WriterLock(str(tmp_path)), WriterLock(str(tmp_path))
+
+    assert first.acquire() is True
+    assert second.acquire() is False
+    first.release()
+    assert second.acquire() is True
+    second.release()
+
+def test_inbox_hands_uploads_to_writer(tmp_path):
+    from benchmarks.synthetic_pdf import make_pdf
+    storage = tmp_path / "store"
+    writer = make_store(storage, snapshot_interval=0)
+    reader = make_store(storage, read_only=True)
+    queue = IngestionQueue(PDFProcessor(), writer, num_workers=1)
+    pump = InboxPump(IngestionInbox(str(storage), writer), queue)
+    inbox = IngestionInbox(str(storage), reader)
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(make_pdf(pages=2, lines_per_page=4))
+
+    job = inbox.submit(str(upload), "upload.pdf", content_hash="abc")
+
+    assert not upload.exists()
+    assert inbox.pending() == 1
+    assert inbox.get(job.job_id).status == "queued"
+    assert pump.pump() == (1, 0)
+    queue.shutdown()
+    assert pump.pump() == (0, 1)
+
+    # The finished job is published after the generation holding the document
+    assert inbox.pending() == 0 and os.listdir(storage / "inbox") == []
+    status = inbox.get(job.job_id)
+    assert status.status == "completed"
+    assert reader.has_document(job.document_id)
+    # The reader now recognises the same content as a duplicate
+    upload.write_bytes(b"%PDF")
+    duplicate = inbox.submit(str(upload), "copy.pdf", content_hash="abc")
+    assert not upload.exists()
+    assert duplicate.duplicate and duplicate.document_id == job.document_id
+
+def test_inbox_reports_completed_only_once_loaded(tmp_path):
+    storage = tmp_path / "store"
+    make_store(storage).save_snapshot()
+    reader = make_store(storage, read_only=True)
+    inbox = IngestionInbox(str(storage), reader)
+    status = {"job_id": "j1", "file_id": "doc9", "filename": "a.pdf", "status": "completed",
+              "duplicate": False, "error": None,
+              "stages": {stage: {"status": "completed", "done": 1, "total": 1}
+                         for stage in ("extract", "chunk", "embed", "index")},
+              "created_at": 0.0, "started_at": 0.0, "finished_at": 1.0}
+    (storage / "jobs" / "j1.json").write_text(json.dumps(status))
+
+    job = inbox.get("j1")
+
+    assert job.status == "running" and job.stages["index"]["status"] == "running"
+    assert inbox.get("missing") is None
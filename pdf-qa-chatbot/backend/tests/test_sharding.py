@@ -0,0 +1,164 @@
+import multiprocessing
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import FakeEmbeddingBackend
+from app.services.sharding import (
+    LocalShard,
+    RemoteShard,
+    ShardedVectorStore,
+    fuse_candidates,
+    merge_results,
+    serve_shard,
+    shard_for,
+)
+from app.services.vector_store import VectorStore
+
+DOCUMENTS = {f"doc{d}": [f"doc{d} passage {i} about topic {(d * 7 + i) % 5}" for i in range(4)]
+             for d in range(8)}
+
+class CountingShard(LocalShard):
+    def __init__(self, store):
+        super().__init__(store)
+        self.calls = []
+
+    def call(self, method, *args, **kwargs):
+        self.calls.append(method)
+        return super().call(method, *args, **kwargs)
+
+def make_store(retrieval_mode="vector", **kwargs):
+    return VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), retrieval_mode=retrieval_mode, **kwargs)
+
+def make_sharded(num_shards=3, retrieval_mode="vector", documents=DOCUMENTS):
+    shards = [CountingShard(make_store(retrieval_mode)) for _ in range(num_shards)]
+    store = ShardedVectorStore(shards, FakeEmbeddingBackend(dimension=16), retrieval_mode=retrieval_mode)
+    for doc_id, chunks in documents.items():
+        store.add_document(doc_id, chunks)
+    return store
+
+def test_shard_for_is_stable_and_spread():
+    owners = [shard_for(f"doc-{i}", 4) for i in range(400)]
+    assert owners == [shard_for(f"doc-{i}", 4) for i in range(400)]
+    assert set(owners) == {0, 1, 2, 3}
+    assert min(np.bincount(owners)) > 60
+
+def test_documents_live_on_their_owner():
+    store = make_sharded()
+    for doc_id in DOCUMENTS:
+        owner = shard_for(doc_id, 3)
+        assert [shard.store.has_document(doc_id) for shard in store.shards] == [n == owner for n in range(3)]
+    assert store.has_document("doc3") and not store.has_document("missing")
+
+def test_scatter_gather_matches_single_store():
+    sharded = make_sharded()
+    single = make_store()
+    for doc_id, chunks in DOCUMENTS.items():
+        single.add_document(doc_id, chunks)
+
+    for query in ["passage 2 about topic 3", "doc5 passage 0"]:
+        expected = [(r["doc_id"], r["chunk"]) for r in single.search_similar(query, k=6)]
+        assert [(r["doc_id"], r["chunk"]) for r in sharded.search_similar(query, k=6)] == expected
+
+def test_hybrid_scatter_gather_matches_single_store():
+    documents = {"manual": ["turbine bearing lubrication schedule", "grease the turbine bearing every month",
+                            "bearing lubrication uses synthetic oil", "inspect the turbine blades yearly"]}
+    documents.update((f"other{i}", [f"quarterly sales report number {i}", f"office party {i} planning notes"])
+                     for i in range(12))
+    sharded = make_sharded(4, "hybrid", documents)
+    single = make_store("hybrid")
+    for doc_id, chunks in documents.items():
+        single.add_document(doc_id, chunks)
+
+    results = sharded.search_similar("turbine bearing lubrication", k=4)
+
+    assert results == single.search_similar("turbine bearing lubrication", k=4)
+    # Shards with nothing relevant don't crowd out the relevant document
+    assert [r["doc_id"] for r in results] == ["manual"] * 4
+    assert (sharded.search_similar("turbine bearing lubrication", k=4, with_metadata=True)
+            == single.search_similar("turbine bearing lubrication", k=4, with_metadata=True))
+
+def test_document_scoped_search_goes_to_owner_only():
+    store = make_sharded()
+    for shard in store.shards:
+        shard.calls.clear()
+
+    results = store.search_similar("passage 1", k=2, doc_ids=["doc4"])
+
+    assert {r["doc_id"] for r in results} == {"doc4"}
+    owner = shard_for("doc4", 3)
+    assert [("search_batch_by_embedding" in shard.calls) for shard in store.shards] == [n == owner for n in range(3)]
+
+def test_mutations_and_versions_route_to_owner():
+    store = make_sharded()
+    store.add_document("hashed", ["some text"], content_hash="abc")
+    version = store.document_version()
+
+    assert store.find_by_content_hash("abc") == "hashed"
+    assert store.delete_document("doc2") is True
+    assert not store.has_document("doc2")
+    assert store.document_version() > version
+    with pytest.raises(KeyError):
+        store.replace_document("doc2", ["gone"])
+    # Chunks already indexed on any shard are not embedded again
+    assert store.indexed_embeddings([DOCUMENTS["doc1"][0], "never seen"])[1] is None
+    assert store.indexed_embeddings([DOCUMENTS["doc1"][0]])[0] is not None
+
+def test_merge_results():
+    a = [{"doc_id": "a", "distance": 0.1}, {"doc_id": "a", "distance": 0.5}]
+    b = [{"doc_id": "b", "distance": 0.3}, {"doc_id": "b", "distance": None}]
+
+    assert [r["distance"] for r in merge_results([a, b], 3)] == [0.1, 0.3, 0.5]
+
+def test_fuse_candidates_ranks_across_shards():
+    def hit(doc_id, index, distance, score=None):
+        result = {"doc_id": doc_id, "chunk": f"{doc_id}{index}", "distance": distance, "chunk_index": index}
+        return result if score is None else dict(result, score=score)
+    a = ([hit("a", 0, 0.1), hit("a", 1, 0.2)], [hit("a", 1, 0.2, score=1.0)])
+    b = ([hit("b", 0, 0.3)], [hit("b", 0, 0.3, score=5.0), hit("b", 1, 0.9, score=4.0)])
+
+    fused = fuse_candidates([a, b], candidates=3, k=3)
+
+    # b0 is third by distance but first by score; b1 is a keyword-only hit
+    assert [r["chunk"] for r in fused] == ["b0", "a1", "a0"]
+    assert all("score" not in r for r in fuse_candidates([a, b], candidates=3, k=4))
+    assert fuse_candidates([(a[0], []), (b[0], [])], candidates=3, k=2) == [a[0][0], a[0][1]]
+
+def test_shard_processes():
+    store = ShardedVectorStore.spawn(2, FakeEmbeddingBackend(dimension=16), retrieval_mode="vector")
+    try:
+        for doc_id, chunks in DOCUMENTS.items():
+            store.add_document(doc_id, chunks)
+
+        assert store.search_similar(DOCUMENTS["doc6"][3], k=1)[0]["chunk"] == DOCUMENTS["doc6"][3]
+        assert store.search_similar("passage 3", k=8, doc_ids=["doc6", "doc1"], with_metadata=True)[0]["tokens"] > 0
+        assert store.has_document("doc7") and not store.has_document("doc9")
+        with pytest.raises(ValueError):
+            store.shards[0].call("add_document", "bad", ["x"], embeddings=np.zeros((2, 16), dtype=np.float32))
+    finally:
+        store.close()
+    assert not any(process.process.is_alive() for process in store.processes)
+
+def test_shard_server_survives_bad_clients():
+    ready = threading.Event()
+    address = []
+    def on_ready(bound):
+        address.append(bound)
+        ready.set()
+    server = threading.Thread(target=serve_shard, args=(make_store(), ("127.0.0.1", 0), b"secret", on_ready),
+                              daemon=True)
+    server.start()
+    assert ready.wait(10)
+
+    with pytest.raises(multiprocessing.AuthenticationError):
+        RemoteShard(address[0], b"wrong").call("stats")
+    # A peer that connects and hangs up without a handshake
+    socket.create_connection(address[0]).close()
+    shard = RemoteShard(address[0], b"secret")
+    assert shard.call("has_document", "doc1") is False
+    shard.call("stop")
+    shard.close()
+    server.join(10)
+    assert not server.is_alive()
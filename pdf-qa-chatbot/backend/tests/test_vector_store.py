@@ -1,11 +1,15 @@
+import time
 import pytest
 import numpy as np
 from unittest.mock import Mock, patch
 from app.services.vector_store import VectorStore
+import faiss
+from app.services.faiss_index import base_index
 
 @pytest.fixture
 def vector_store():
     with patch('faiss.IndexFlatL2') as mock_index, \
+         patch('faiss.IndexIDMap2') as mock_id_map, \
          patch('openai.OpenAI') as mock_openai:
         store = VectorStore()
         # Mock the FAISS index
@@ -38,17 +42,21 @@ def test_add_document_with_chunks(vector_store, mock_embedding):
     doc_id = "test-doc"
     chunks = ["chunk1", "chunk2"]
     
-    with patch.object(vector_store, 'generate_embeddings', return_value=mock_embedding):
+    with patch.object(vector_store, 'embed_texts', return_value=np.stack([mock_embedding] * 2)) as mock_embed:
         vector_store.add_document(doc_id, chunks)
         
+        # Verify all chunks were embedded in one pipeline call
+        mock_embed.assert_called_once_with(chunks)
+        
         # Verify document chunks are stored
         assert doc_id in vector_store.doc_chunks
         assert vector_store.doc_chunks[doc_id] == chunks
         
-        # Verify embeddings were added to FAISS index
-        assert vector_store.index.add.called
-        added_embeddings = vector_store.index.add.call_args[0][0]
+        # Verify embeddings were added to FAISS index under stable ids
+        assert vector_store.index.add_with_ids.called
+        added_embeddings, added_ids = vector_store.index.add_with_ids.call_args[0]
         assert added_embeddings.shape == (2, 1536)
+        assert list(added_ids) == [0, 1]
 
 def test_add_document_empty_chunks(vector_store):
     doc_id = "test-doc"
@@ -56,14 +64,15 @@ def test_add_document_empty_chunks(vector_store):
     
     assert doc_id not in vector_store.doc_chunks
     assert not vector_store.index.add.called
+    assert not vector_store.index.add_with_ids.called
 
 def test_search_similar(vector_store, mock_embedding):
     # Setup test data
     query = "test query"
     doc_id = "test-doc"
     chunks = ["chunk1", "chunk2"]
-    vector_store.doc_chunks[doc_id] = chunks
-    vector_store.chunk_map = {0: (doc_id, 0), 1: (doc_id, 1)}
+    vector_store.chunk_map.add(doc_id, 0, chunks)
+    vector_store.doc_vector_ids[doc_id] = np.arange(2)
     
     # Mock FAISS search results
     distances = np.array([[0.1, 0.2]])
@@ -102,4 +111,256 @@ def test_search_similar_invalid_index(vector_store, mock_embedding):
     
     with patch.object(vector_store, 'generate_embeddings', return_value=mock_embedding):
         results = vector_store.search_similar(query, k=1)
-        assert len(results) == 0
\ No newline at end of file
+        assert len(results) == 0
+
+def test_search_similar_scoped_to_documents():
+    from app.services.embeddings import FakeEmbeddingBackend
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    store.add_document("doc1", ["alpha", "beta", "gamma"])
+    store.add_document("doc2", ["alpha", "delta"])
+    
+    results = store.search_similar("alpha", k=5, doc_ids=["doc2"])
+    
+    assert [r["doc_id"] for r in results] == ["doc2", "doc2"]
+    assert results[0]["chunk"] == "alpha"
+    assert results[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert store.search_similar("alpha", k=5, doc_ids=["missing"]) == []
+
+def test_search_similar_scoped_filtered_index_search():
+    from app.services.embeddings import FakeEmbeddingBackend
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), max_exact_candidates=1)
+    store.add_document("doc1", ["alpha", "beta"])
+    store.add_document("doc2", ["gamma", "delta", "epsilon"])
+    
+    results = store.search_similar("alpha", k=2, doc_ids=["doc2"])
+    
+    assert len(results) == 2
+    assert all(r["doc_id"] == "doc2" for r in results)
+
+@pytest.mark.asyncio
+async def test_asearch_similar_matches_search_similar():
+    from app.services.embeddings import FakeEmbeddingBackend
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    store.add_document("doc1", ["alpha", "beta", "gamma"])
+    store.add_document("doc2", ["alpha", "delta"])
+    
+    assert await store.asearch_similar("beta", k=3) == store.search_similar("beta", k=3)
+    scoped = await store.asearch_similar("alpha", k=5, doc_ids=["doc2"])
+    assert [r["doc_id"] for r in scoped] == ["doc2", "doc2"]
+
+@pytest.mark.asyncio
+async def test_query_embedding_cache_is_used_off_the_event_loop():
+    import threading
+    from app.services.embeddings import FakeEmbeddingBackend
+    store = VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16))
+    loop_thread = threading.get_ident()
+    threads = []
+    for name in ("get", "put", "get_many", "put_many"):
+        method = getattr(store.cache, name)
+        def record(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+        setattr(store.cache, name, record)
+    
+    first = await store.agenerate_embeddings("alpha")
+    await store.agenerate_embeddings_batch(["alpha", "beta"])
+    
+    assert np.array_equal(await store.agenerate_embeddings("alpha"), first)
+    assert threads and loop_thread not in threads
+
+@pytest.fixture
+def fake_store():
+    from app.services.embeddings import FakeEmbeddingBackend
+    def make(**kwargs):
+        kwargs.setdefault("compaction_threshold", 1.0)
+        return VectorStore(embedding_backend=FakeEmbeddingBackend(dimension=16), **kwargs)
+    return make
+
+def test_delete_document_hides_its_chunks(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["alpha", "beta"])
+    store.add_document("doc2", ["alpha two", "gamma"])
+    
+    assert store.delete_document("doc1") is True
+    assert store.delete_document("doc1") is False
+    
+    results = store.search_similar("alpha", k=4)
+    assert {r["doc_id"] for r in results} == {"doc2"}
+    assert len(results) == 2
+    assert not store.has_document("doc1")
+    assert "doc1" not in store.doc_chunks
+    assert all(doc_id == "doc2" for doc_id, _ in store.chunk_map.values())
+
+def test_replace_document(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["old text"])
+    
+    store.replace_document("doc1", ["new text", "more new text"])
+    
+    assert store.doc_chunks["doc1"] == ["new text", "more new text"]
+    assert [r["chunk"] for r in store.search_similar("old text", k=5)] != ["old text"]
+    with pytest.raises(KeyError):
+        store.replace_document("missing", ["text"])
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_compact_removes_tombstones_and_keeps_ids(fake_store, index_type):
+    store = fake_store(index_type=index_type)
+    store.add_document("doc1", ["a", "b", "c"])
+    store.add_document("doc2", ["d", "e"])
+    store.delete_document("doc1")
+    
+    assert store.index.ntotal == 5
+    assert store.compact() == 3
+    assert store.index.ntotal == 2
+    assert store.compact() == 0
+    
+    result = store.search_similar("e", k=1)[0]
+    assert (result["doc_id"], result["chunk"]) == ("doc2", "e")
+
+def test_compaction_runs_in_background_past_threshold(fake_store):
+    store = fake_store(compaction_threshold=0.5)
+    store.add_document("doc1", ["a", "b"])
+    store.add_document("doc2", ["c", "d"])
+    
+    store.delete_document("doc1")
+    store._compaction_thread.join(timeout=5)
+    
+    assert store.index.ntotal == 2
+    assert not store._tombstones
+
+def test_ttl_eviction(fake_store):
+    store = fake_store()
+    store.add_document("anonymous", ["temporary"], ttl=60)
+    store.add_document("kept", ["permanent"])
+    
+    assert store.evict_expired(now=time.time() + 30) == []
+    assert store.evict_expired(now=time.time() + 61) == ["anonymous"]
+    assert not store.has_document("anonymous")
+    assert store.has_document("kept")
+
+def test_document_version_changes_on_replace(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["alpha", "beta"])
+    store_version = store.document_version()
+    version = store.document_version("doc1")
+    
+    store.replace_document("doc1", ["gamma"])
+    
+    assert store.document_version("doc1") != version
+    assert store.document_version() != store_version
+    store.delete_document("doc1")
+    assert store.document_version("doc1") is None
+
+def test_search_with_metadata_reports_position_and_tokens(fake_store):
+    from app.services.tokens import count_tokens
+    store = fake_store()
+    store.add_document("doc1", ["alpha", "beta gamma delta"])
+    
+    result = store.search_similar("beta gamma delta", k=1, with_metadata=True)[0]
+    
+    assert result["chunk_index"] == 1
+    assert result["tokens"] == count_tokens("beta gamma delta")
+
+def test_identifier_query_skips_embedding(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["general terms", "clause 4.2.1 limits liability"])
+    
+    with patch.object(store, "generate_embeddings") as embed:
+        results = store.search_similar("clause 4.2.1", k=1)
+    
+    embed.assert_not_called()
+    assert results[0]["chunk"] == "clause 4.2.1 limits liability"
+    assert results[0]["distance"] is None
+
+def test_identifier_query_matching_only_stopwords_searches_vectors(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["what is covered", "it is what it is", "release 4.2 notes"])
+    
+    with patch.object(store, "generate_embeddings", wraps=store.generate_embeddings) as embed:
+        results = store.search_similar("what is 4.3", k=2)
+    
+    embed.assert_called_once()
+    assert any(result["distance"] is not None for result in results)
+
+def test_hybrid_search_fuses_keyword_matches(fake_store):
+    store = fake_store()
+    chunks = [f"filler paragraph number {i}" for i in range(20)] + ["the indemnity cap is unlimited"]
+    store.add_document("doc1", chunks)
+    
+    hybrid = store.search_similar("what is the indemnity cap", k=3)
+    store.retrieval_mode = "vector"
+    vector = store.search_similar("what is the indemnity cap", k=3)
+    
+    assert hybrid[0]["chunk"] == "the indemnity cap is unlimited"
+    assert all(result["distance"] is not None for result in hybrid)
+    assert len(vector) == 3
+
+def test_deleted_documents_leave_keyword_index(fake_store):
+    store = fake_store()
+    store.add_document("doc1", ["part AB-12"])
+    store.add_document("doc2", ["unrelated"])
+    store.delete_document("doc1")
+    store.compact()
+    
+    assert store.search_lexical("AB-12") == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scoped", [False, True])
+async def test_batch_search_matches_single_searches(fake_store, scoped):
+    store = fake_store()
+    store.add_document("doc1", [f"passage {i} about topic {i % 7}" for i in range(40)])
+    store.add_document("doc2", [f"other text {i}" for i in range(10)])
+    questions = ["topic three details", "what about passage nine", "other text"]
+    doc_ids = ["doc1"] if scoped else None
+    
+    calls = store.embedding_backend.calls
+    batch = await store.asearch_similar_batch(questions, k=4, doc_ids=doc_ids)
+    
+    assert store.embedding_backend.calls == calls + 1
+    singles = [store.search_similar(q, k=4, doc_ids=doc_ids) for q in questions]
+    assert [[r["chunk"] for r in rs] for rs in batch] == [[r["chunk"] for r in rs] for rs in singles]
+    for rs, expected in zip(batch, singles):
+        assert [r["distance"] for r in rs] == pytest.approx([r["distance"] for r in expected], abs=1e-4)
+
+def test_revision_reembeds_only_changed_chunks(fake_store):
+    from app.services.embedding_cache import EmbeddingCache
+    store = fake_store()
+    store.add_document("v1", ["clause one", "clause two", "clause three"], content_hash="h1")
+    embedded = []
+    original = store.embedding_backend.embed
+    # A cold cache, as after a restart, so only the index can supply vectors
+    store.cache = EmbeddingCache()
+    with patch.object(store.embedding_backend, 'embed', side_effect=lambda texts: embedded.extend(texts) or original(texts)):
+        vectors = store.embed_texts(["clause one", "clause  two", "clause four"])
+    
+    assert embedded == ["clause four"]
+    assert np.allclose(vectors[0], original(["clause one"])[0])
+    assert store.find_by_content_hash("h1") == "v1"
+    store.delete_document("v1")
+    assert store.find_by_content_hash("h1") is None
+
+@pytest.mark.parametrize("options", [
+    {"vector_storage": "sq8", "train_threshold": 20},
+    {"vector_storage": "fp16"},
+    # Four of sixteen dimensions keep too little to shortlist well; fetch every candidate
+    {"reduce_dim": 4, "train_threshold": 20, "rerank_factor": 20},
+])
+def test_compressed_storage_reranks_with_exact_vectors(fake_store, options):
+    exact = fake_store(retrieval_mode="vector")
+    store = fake_store(retrieval_mode="vector", **options)
+    chunks = [f"passage {i} on topic {i % 5}" for i in range(60)]
+    for target in (exact, store):
+        target.add_document("doc1", chunks[:30])
+        target.add_document("doc2", chunks[30:])
+    assert not isinstance(base_index(store.index), faiss.IndexFlatL2)
+    
+    for query in ["topic 3", "passage 41"]:
+        expected = exact.search_similar(query, k=3)
+        results = store.search_similar(query, k=3)
+        assert [r["chunk"] for r in results] == [r["chunk"] for r in expected]
+        # Distances come from the float32 vectors, not the compressed codes
+        assert [r["distance"] for r in results] == pytest.approx([r["distance"] for r in expected], rel=1e-5)
+    
+    store.delete_document("doc1")
+    assert store.compact() == 30
+    assert {r["doc_id"] for r in store.search_similar("topic 3", k=5)} == {"doc2"}